@@ -1,16 +1,69 @@
-from openai import OpenAI
-import os
-import json
-from dotenv import load_dotenv
+import time
+from functools import lru_cache
+from typing import Dict, Any, Optional, NamedTuple, Tuple
+from app.core.config import settings
+from app.agents.response_cache import response_cache
+from app.utils.metrics import AGENT_REQUEST_DURATION, AGENT_REQUESTS_IN_FLIGHT, record_tokens
+from app.utils.openai_client import get_openai_client
+from app.utils.tokens import count_tokens
+
+class AgentConfig(NamedTuple):
+    """Immutable agent definition
+
+    Everything here is static across requests, so the system prompt built
+    from it is a stable prefix that provider-side prompt caching can reuse.
+    """
+    name: str
+    system_prompt: str
+    model: str = "gpt-4o"
+    temperature: float = 0.7
+    custom_instructions: str = ""
+    # (input, output) pairs
+    examples: Tuple[Tuple[str, str], ...] = ()
+
+    def with_overrides(self, custom_config: Optional[Dict[str, Any]] = None) -> "AgentConfig":
+        """Derive a config with custom instructions, examples, temperature or model applied"""
+        if not custom_config:
+            return self
+
+        overrides = {}
+        if "instructions" in custom_config:
+            overrides["custom_instructions"] = custom_config["instructions"]
+        if "examples" in custom_config:
+            overrides["examples"] = tuple((example["input"], example["output"]) for example in custom_config["examples"])
+        if "temperature" in custom_config:
+            overrides["temperature"] = custom_config["temperature"]
+        if "model" in custom_config:
+            overrides["model"] = custom_config["model"]
+        return self._replace(**overrides)
+
+@lru_cache(maxsize=256)
+def build_system_prompt(config: AgentConfig) -> str:
+    """Build the static system prompt for a config (persona, custom instructions, examples)"""
+    prompt = config.system_prompt
 
-# Load environment variables
-load_dotenv()
+    if config.custom_instructions:
+        prompt += f"\n\nCustom Instructions:\n{config.custom_instructions}"
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    if config.examples:
+        prompt += "\n\nExamples:"
+        for example_input, example_output in config.examples:
+            prompt += f"\n\nInput: {example_input}\nOutput: {example_output}"
+
+    return prompt
+
+# Token usage across all completions, including prompt tokens served from the provider's prefix cache
+usage_stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+def get_usage_stats() -> Dict[str, Any]:
+    """Token usage counters and the share of prompt tokens served from the prefix cache"""
+    return {
+        **usage_stats,
+        "cached_ratio": round(usage_stats["cached_tokens"] / usage_stats["prompt_tokens"], 4) if usage_stats["prompt_tokens"] else 0.0
+    }
 
 class BaseAgent:
-    def __init__(self, name, system_prompt, model="gpt-4o", temperature=0.7):
+    def __init__(self, name, system_prompt, model="gpt-4o", temperature=0.7, workspace_id=None):
         """Initialize a base agent with common properties
 
         Args:
@@ -18,78 +71,190 @@ class BaseAgent:
             system_prompt: The base system prompt for the agent
             model: The OpenAI model to use
             temperature: Creativity temperature (0.0 to 1.0)
+            workspace_id: Optional workspace the agent works for (scopes cached responses)
         """
-        self.name = name
-        self.base_system_prompt = system_prompt
-        self.model = model
-        self.temperature = temperature
-        self.custom_instructions = ""
+        self.config = AgentConfig(name, system_prompt, model, temperature)
+        self.workspace_id = workspace_id
         self.knowledge_context = ""
-        self.examples = []
+        self.last_usage = None
+
+    @classmethod
+    def from_config(cls, config: AgentConfig, workspace_id=None):
+        """Create an agent from a prebuilt config"""
+        agent = cls.__new__(cls)
+        agent.config = config
+        agent.workspace_id = workspace_id
+        agent.knowledge_context = ""
+        agent.last_usage = None
+        return agent
+
+    @property
+    def name(self):
+        return self.config.name
+
+    @property
+    def model(self):
+        return self.config.model
+
+    @property
+    def temperature(self):
+        return self.config.temperature
 
     def add_custom_instructions(self, instructions):
         """Add custom instructions to the agent"""
-        self.custom_instructions = instructions
+        self.config = self.config.with_overrides({"instructions": instructions})
         return self
 
     def add_knowledge_context(self, context):
-        """Add knowledge context to the agent"""
+        """Add per-request knowledge context to the agent"""
         self.knowledge_context = context
         return self
 
     def add_examples(self, examples):
         """Add few-shot examples to the agent"""
-        self.examples = examples
+        self.config = self.config.with_overrides({"examples": examples})
         return self
 
     def get_full_system_prompt(self):
-        """Generate the complete system prompt with all context"""
-        prompt = self.base_system_prompt
+        """Get the static system prompt; per-request context is sent separately"""
+        return build_system_prompt(self.config)
+
+    def build_messages(self, prompt, conversation_history=None):
+        """Build the chat messages for a prompt
+
+        The static system prompt comes first and per-request knowledge context
+        goes after any conversation history, right before the prompt, so the
+        longest possible prefix is identical across requests.
+        """
+        messages = [{"role": "system", "content": self.get_full_system_prompt()}]
 
-        if self.custom_instructions:
-            prompt += f"\n\nCustom Instructions:\n{self.custom_instructions}"
+        # Add conversation history if provided
+        if conversation_history:
+            messages.extend(conversation_history)
 
         if self.knowledge_context:
-            prompt += f"\n\nKnowledge Context:\n{self.knowledge_context}"
+            messages.append({"role": "system", "content": f"Knowledge Context:\n{self.knowledge_context}"})
 
-        if self.examples:
-            prompt += "\n\nExamples:"
-            for example in self.examples:
-                prompt += f"\n\nInput: {example['input']}\nOutput: {example['output']}"
+        # Add current prompt
+        messages.append({"role": "user", "content": prompt})
+
+        return messages
 
-        return prompt
+    def count_prompt_tokens(self, prompt, conversation_history=None):
+        """Count the tokens the messages for a prompt will use
 
-    async def run(self, prompt, conversation_history=None):
+        Includes the few tokens of framing the chat format adds per message.
+        """
+        messages = self.build_messages(prompt, conversation_history)
+        return sum(count_tokens(message["content"], self.model) + 4 for message in messages) + 3
+
+    def _record_usage(self, usage):
+        """Keep the usage reported for the last completion, including prefix-cached prompt tokens"""
+        if usage is None:
+            self.last_usage = None
+            return
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.last_usage = {
+            "prompt_tokens": usage.prompt_tokens,
+            "cached_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+            "completion_tokens": usage.completion_tokens
+        }
+
+        usage_stats["requests"] += 1
+        for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+            usage_stats[key] += self.last_usage[key]
+        record_tokens(self.model, self.last_usage)
+
+    async def run(self, prompt, conversation_history=None, use_cache=True):
         """Run the agent with a prompt
 
         Args:
             prompt: The user prompt to send to the agent
             conversation_history: Optional list of previous messages
+            use_cache: Whether to serve and store the response in the response cache
 
         Returns:
             The agent's response text
         """
-        messages = [{"role": "system", "content": self.get_full_system_prompt()}]
-
-        # Add conversation history if provided
-        if conversation_history:
-            messages.extend(conversation_history)
-
-        # Add current prompt
-        messages.append({"role": "user", "content": prompt})
+        messages = self.build_messages(prompt, conversation_history)
+        self.last_usage = None
+
+        use_cache = use_cache and settings.AGENT_CACHE_ENABLED
+        if use_cache:
+            cached = await response_cache.get(self.workspace_id, self.model, self.temperature, messages)
+            if cached is not None:
+                return cached
+
+        client = get_openai_client()
+        with AGENT_REQUESTS_IN_FLIGHT.labels(self.model).track_inprogress(), \
+                AGENT_REQUEST_DURATION.labels(self.name, self.model).time():
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature
+            )
+        content = response.choices[0].message.content
+        self._record_usage(response.usage)
+
+        if use_cache and content:
+            await response_cache.set(self.workspace_id, self.model, self.temperature, messages, content)
+
+        return content
+
+    async def run_stream(self, prompt, conversation_history=None, use_cache=True):
+        """Run the agent with a prompt, yielding the response as it is generated
 
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=self.temperature
-        )
-
-        return response.choices[0].message.content
+        Args:
+            prompt: The user prompt to send to the agent
+            conversation_history: Optional list of previous messages
+            use_cache: Whether to serve and store the response in the response cache
 
-# Define specialized agents
-def create_ideation_agent(workspace_id=None, custom_config=None):
-    """Create an agent specialized for content ideation"""
-    base_system_prompt = """
+        Yields:
+            Pieces of the response text; a cached response is yielded in one piece
+        """
+        messages = self.build_messages(prompt, conversation_history)
+        self.last_usage = None
+
+        use_cache = use_cache and settings.AGENT_CACHE_ENABLED
+        if use_cache:
+            cached = await response_cache.get(self.workspace_id, self.model, self.temperature, messages)
+            if cached is not None:
+                yield cached
+                return
+
+        client = get_openai_client()
+        started_at = time.perf_counter()
+        AGENT_REQUESTS_IN_FLIGHT.labels(self.model).inc()
+        parts = []
+        try:
+            stream = await client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+                # The final chunk carries usage and no choices
+                if getattr(chunk, "usage", None):
+                    self._record_usage(chunk.usage)
+        finally:
+            # Timed until the last chunk (or until the consumer stops reading)
+            AGENT_REQUESTS_IN_FLIGHT.labels(self.model).dec()
+            AGENT_REQUEST_DURATION.labels(self.name, self.model).observe(time.perf_counter() - started_at)
+
+        content = "".join(parts)
+        if use_cache and content:
+            await response_cache.set(self.workspace_id, self.model, self.temperature, messages, content)
+
+# Prebuilt agent definitions, keyed by agent kind
+AGENT_REGISTRY: Dict[str, AgentConfig] = {
+    "ideation": AgentConfig("IdeationAgent", """
     You are an expert content ideation specialist. Your role is to generate creative,
     engaging, and original content ideas based on the provided topic and target audience.
 
@@ -104,26 +269,8 @@ def create_ideation_agent(workspace_id=None, custom_config=None):
     2. A brief description (2-3 sentences)
     3. Key points to include
     4. Target keywords
-    """
-
-    agent = BaseAgent("IdeationAgent", base_system_prompt, "gpt-4o")
-
-    # Apply custom configuration if provided
-    if custom_config:
-        if "instructions" in custom_config:
-            agent.add_custom_instructions(custom_config["instructions"])
-        if "examples" in custom_config:
-            agent.add_examples(custom_config["examples"])
-        if "temperature" in custom_config:
-            agent.temperature = custom_config["temperature"]
-        if "model" in custom_config:
-            agent.model = custom_config["model"]
-
-    return agent
-
-def create_research_agent(workspace_id=None, custom_config=None):
-    """Create an agent specialized for content research"""
-    base_system_prompt = """
+    """),
+    "research": AgentConfig("ResearchAgent", """
     You are an expert content researcher. Your role is to gather relevant information,
     facts, statistics, and insights on a given topic to support content creation.
 
@@ -138,26 +285,8 @@ def create_research_agent(workspace_id=None, custom_config=None):
     2. Well-structured and organized
     3. Relevant to the target audience
     4. Comprehensive yet concise
-    """
-
-    agent = BaseAgent("ResearchAgent", base_system_prompt, "gpt-4o")
-
-    # Apply custom configuration if provided
-    if custom_config:
-        if "instructions" in custom_config:
-            agent.add_custom_instructions(custom_config["instructions"])
-        if "examples" in custom_config:
-            agent.add_examples(custom_config["examples"])
-        if "temperature" in custom_config:
-            agent.temperature = custom_config["temperature"]
-        if "model" in custom_config:
-            agent.model = custom_config["model"]
-
-    return agent
-
-def create_content_agent(workspace_id=None, custom_config=None):
-    """Create an agent specialized for content writing"""
-    base_system_prompt = """
+    """),
+    "content": AgentConfig("ContentAgent", """
     You are an expert content writer. Your role is to create high-quality,
     engaging content based on the provided outline and research.
 
@@ -175,26 +304,8 @@ def create_content_agent(workspace_id=None, custom_config=None):
     4. Written in the requested tone and style
 
     Use HTML formatting for structure where appropriate.
-    """
-
-    agent = BaseAgent("ContentAgent", base_system_prompt, "gpt-4o")
-
-    # Apply custom configuration if provided
-    if custom_config:
-        if "instructions" in custom_config:
-            agent.add_custom_instructions(custom_config["instructions"])
-        if "examples" in custom_config:
-            agent.add_examples(custom_config["examples"])
-        if "temperature" in custom_config:
-            agent.temperature = custom_config["temperature"]
-        if "model" in custom_config:
-            agent.model = custom_config["model"]
-
-    return agent
-
-def create_editor_agent(workspace_id=None, custom_config=None):
-    """Create an agent specialized for content editing"""
-    base_system_prompt = """
+    """),
+    "editor": AgentConfig("EditorAgent", """
     You are an expert content editor. Your role is to refine and improve content
     while maintaining the original voice and intent.
 
@@ -212,19 +323,42 @@ def create_editor_agent(workspace_id=None, custom_config=None):
     4. Enhance overall quality and professionalism
 
     Maintain HTML formatting where present.
+    """)
+}
+
+def register_agent(kind: str, config: AgentConfig):
+    """Add or replace an agent definition in the registry"""
+    AGENT_REGISTRY[kind] = config
+
+def create_agent(kind: str, workspace_id=None, custom_config=None) -> BaseAgent:
+    """Create an agent from its registered definition
+
+    Args:
+        kind: Registry key, e.g. "ideation"
+        workspace_id: Optional workspace the agent works for
+        custom_config: Optional instructions, examples, temperature or model overrides
+
+    Returns:
+        A lightweight agent sharing the prebuilt config
     """
+    if kind not in AGENT_REGISTRY:
+        raise ValueError(f"Unknown agent: {kind}")
 
-    agent = BaseAgent("EditorAgent", base_system_prompt, "gpt-4o")
+    return BaseAgent.from_config(AGENT_REGISTRY[kind].with_overrides(custom_config), workspace_id)
 
-    # Apply custom configuration if provided
-    if custom_config:
-        if "instructions" in custom_config:
-            agent.add_custom_instructions(custom_config["instructions"])
-        if "examples" in custom_config:
-            agent.add_examples(custom_config["examples"])
-        if "temperature" in custom_config:
-            agent.temperature = custom_config["temperature"]
-        if "model" in custom_config:
-            agent.model = custom_config["model"]
+# Define specialized agents
+def create_ideation_agent(workspace_id=None, custom_config=None):
+    """Create an agent specialized for content ideation"""
+    return create_agent("ideation", workspace_id, custom_config)
+
+def create_research_agent(workspace_id=None, custom_config=None):
+    """Create an agent specialized for content research"""
+    return create_agent("research", workspace_id, custom_config)
 
-    return agent 
\ No newline at end of file
+def create_content_agent(workspace_id=None, custom_config=None):
+    """Create an agent specialized for content writing"""
+    return create_agent("content", workspace_id, custom_config)
+
+def create_editor_agent(workspace_id=None, custom_config=None):
+    """Create an agent specialized for content editing"""
+    return create_agent("editor", workspace_id, custom_config)
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional
+from app.core.config import settings
+from app.utils.cache import TTLCache
+from app.utils.vector_store import get_embeddings
+
+# Workspace ID used for agents that are not scoped to a workspace
+GLOBAL_SCOPE = "_global"
+
+def _hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+class AgentResponseCache:
+    """Two-tier cache for agent completions, scoped per workspace
+
+    The exact tier is keyed on (model, temperature, system prompt, messages).
+    The optional semantic tier reuses a response when everything but the final
+    user prompt is identical and that prompt's embedding is within the
+    similarity threshold of a cached one. Both tiers are LRU-bounded per
+    workspace, and workspaces themselves are LRU-bounded.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600,
+        max_workspaces: int = 1000,
+        max_entries: int = 200,
+        semantic: bool = False,
+        threshold: float = 0.97
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.threshold = threshold
+        self._exact = TTLCache(max_size=max_workspaces, ttl=ttl)
+        self._semantic = TTLCache(max_size=max_workspaces, ttl=ttl)
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def _keys(model: str, temperature: float, messages: List[Dict[str, str]]):
+        """Exact key over the whole request, and context key over all but the last message"""
+        exact_key = _hash([model, temperature, messages])
+        context_key = _hash([model, temperature, messages[:-1]])
+        return exact_key, context_key
+
+    def _workspace_cache(self, tier: TTLCache, workspace_id: str, create: bool):
+        cache = tier.get(workspace_id)
+        if cache is None and create:
+            cache = TTLCache(max_size=self.max_entries, ttl=self.ttl) if tier is self._exact else []
+            tier.set(workspace_id, cache)
+        return cache
+
+    async def get(self, workspace_id: Optional[str], model: str, temperature: float, messages: List[Dict[str, str]]) -> Optional[str]:
+        """Look up a cached response, trying the exact tier first"""
+        workspace_id = str(workspace_id) if workspace_id else GLOBAL_SCOPE
+        exact_key, context_key = self._keys(model, temperature, messages)
+
+        exact = self._workspace_cache(self._exact, workspace_id, create=False)
+        if exact is not None:
+            response = exact.get(exact_key)
+            if response is not None:
+                self.stats["exact_hits"] += 1
+                return response
+
+        if self.semantic:
+            try:
+                response = await self._get_semantic(workspace_id, context_key, messages[-1]["content"])
+            except Exception as e:
+                print(f"Warning: Semantic cache lookup failed: {str(e)}")
+                response = None
+            if response is not None:
+                self.stats["semantic_hits"] += 1
+                return response
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, workspace_id: Optional[str], model: str, temperature: float, messages: List[Dict[str, str]], response: str):
+        """Store a response in both tiers"""
+        workspace_id = str(workspace_id) if workspace_id else GLOBAL_SCOPE
+        exact_key, context_key = self._keys(model, temperature, messages)
+
+        self._workspace_cache(self._exact, workspace_id, create=True).set(exact_key, response)
+        self.stats["stores"] += 1
+
+        if self.semantic:
+            try:
+                embedding = await self._embed(messages[-1]["content"])
+            except Exception as e:
+                print(f"Warning: Semantic cache store failed: {str(e)}")
+                return
+            entries = self._workspace_cache(self._semantic, workspace_id, create=True)
+            entries.append({
+                "context": context_key,
+                "embedding": embedding,
+                "response": response,
+                "expires_at": time.monotonic() + self.ttl
+            })
+            # Evict the oldest entries once the workspace is full
+            del entries[:-self.max_entries]
+
+    async def _embed(self, text: str) -> np.ndarray:
+        embedding = np.asarray((await get_embeddings([text]))[0], dtype=np.float32)
+        return embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+
+    async def _get_semantic(self, workspace_id: str, context_key: str, prompt: str) -> Optional[str]:
+        entries = self._workspace_cache(self._semantic, workspace_id, create=False)
+        if not entries:
+            return None
+
+        now = time.monotonic()
+        entries[:] = [entry for entry in entries if entry["expires_at"] > now]
+        candidates = [entry for entry in entries if entry["context"] == context_key]
+        if not candidates:
+            return None
+
+        query = await self._embed(prompt)
+        scores = np.stack([entry["embedding"] for entry in candidates]) @ query
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            return candidates[best]["response"]
+
+        return None
+
+    def invalidate(self, workspace_id: Optional[str] = None):
+        """Drop cached responses for a workspace, or for every workspace"""
+        if workspace_id is None:
+            self._exact.clear()
+            self._semantic.clear()
+        else:
+            self._exact.delete(str(workspace_id))
+            self._semantic.delete(str(workspace_id))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the overall hit rate"""
+        lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "workspaces": len(self._exact)
+        }
+
+# Shared cache used by BaseAgent.run
+response_cache = AgentResponseCache(
+    ttl=settings.AGENT_CACHE_TTL,
+    max_workspaces=settings.AGENT_CACHE_MAX_WORKSPACES,
+    max_entries=settings.AGENT_CACHE_MAX_ENTRIES,
+    semantic=settings.AGENT_SEMANTIC_CACHE_ENABLED,
+    threshold=settings.AGENT_SEMANTIC_CACHE_THRESHOLD
+)
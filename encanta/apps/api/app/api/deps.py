@@ -1,49 +1,91 @@
 from fastapi import Depends, HTTPException, status, Header
-from typing import Optional
-import jwt
-import os
-from dotenv import load_dotenv
+from typing import Optional, Dict, Any
+from jose import jwt, JWTError
+import hashlib
+import time
+from app.core.config import settings
+from app.utils.cache import TTLCache
+from app.utils.jwks import jwks_cache, JWKSUnavailable
 
-# Load environment variables
-load_dotenv()
+# Algorithms accepted for Clerk session tokens
+JWT_ALGORITHMS = ["RS256"]
 
-# Clerk webhook secret from environment variables
-CLERK_SECRET_KEY = os.getenv("CLERK_SECRET_KEY")
+# sha256(token) -> user ID for tokens that already passed verification, kept until the token expires
+_token_cache = TTLCache(max_size=settings.AUTH_TOKEN_CACHE_SIZE, ttl=60)
 
-def get_current_user_id(authorization: str = Header(...)) -> str:
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def decode_token(token: str) -> Dict[str, Any]:
+    """Decode a Clerk JWT, verifying its signature against the cached JWKS when enabled
+
+    Raises:
+        JWTError: If the token is malformed, expired or fails verification
+        JWKSUnavailable: If the signing keys can't be loaded
+    """
+    if not settings.AUTH_VERIFY_SIGNATURE:
+        return jwt.get_unverified_claims(token)
+
+    header = jwt.get_unverified_header(token)
+    key = await jwks_cache.get_key(header.get("kid"))
+    if key is None:
+        raise JWTError("Unknown signing key")
+
+    return jwt.decode(
+        token,
+        key,
+        algorithms=JWT_ALGORITHMS,
+        issuer=settings.CLERK_ISSUER or None,
+        # Clerk session tokens carry no audience
+        options={"verify_aud": False}
+    )
+
+async def get_current_user_id(authorization: str = Header(...)) -> str:
     """Extract user ID from the authorization token"""
     if not authorization.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("Invalid authentication credentials")
 
-    token = authorization.replace("Bearer ", "")
+    return await authenticate_token(authorization.replace("Bearer ", ""))
 
-    try:
-        # For JWT tokens from Clerk
-        decoded = jwt.decode(
-            token,
-            options={"verify_signature": False}  # We're not verifying the signature here
-        )
+async def authenticate_token(token: str) -> str:
+    """Get the user ID from a session token
 
-        # Extract the user ID from the token
-        # The actual path depends on your JWT structure from Clerk
-        user_id = decoded.get("sub")
+    Verified tokens are cached by hash until they expire, so repeat requests
+    with the same token skip decoding and verification.
 
-        if not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid user ID in token",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+    Raises:
+        HTTPException: 401 if the token is invalid, 503 if the signing keys can't be loaded
+    """
+    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
 
+    user_id = _token_cache.get(token_hash)
+    if user_id is not None:
         return user_id
 
-    except jwt.PyJWTError:
+    try:
+        decoded = await decode_token(token)
+    except JWTError:
+        raise _unauthorized("Invalid token")
+    except JWKSUnavailable:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
-        ) 
\ No newline at end of file
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is temporarily unavailable"
+        )
+
+    # Extract the user ID from the token
+    # The actual path depends on your JWT structure from Clerk
+    user_id = decoded.get("sub")
+
+    if not user_id:
+        raise _unauthorized("Invalid user ID in token")
+
+    # Only verified tokens with an expiry are cached, and never past that expiry
+    expires_in = decoded.get("exp", 0) - time.time()
+    if settings.AUTH_VERIFY_SIGNATURE and expires_in > 0:
+        _token_cache.set(token_hash, user_id, ttl=expires_in)
+
+    return user_id
@@ -38,4 +38,39 @@ class ContentResponse(BaseModel):
     status: ContentStatus
     created_by: str
     created_at: datetime
-    updated_at: datetime 
\ No newline at end of file
+    updated_at: datetime
+
+class ContentSummary(BaseModel):
+    """Content list item without the content body"""
+    id: UUID
+    workspace_id: UUID
+    title: str
+    content_type: ContentType
+    status: ContentStatus
+    created_by: str
+    created_at: datetime
+    updated_at: datetime
+
+class ContentBulkCreate(BaseModel):
+    items: List[ContentCreate] = Field(..., min_length=1)
+
+class ContentBulkUpdateItem(ContentUpdate):
+    id: UUID
+
+class ContentBulkUpdate(BaseModel):
+    items: List[ContentBulkUpdateItem] = Field(..., min_length=1)
+
+class ContentBulkStatusChange(BaseModel):
+    ids: List[UUID] = Field(..., min_length=1)
+    status: ContentStatus
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[UUID] = None
+    success: bool
+    error: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult]
@@ -1,46 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException, Header, Query, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, BackgroundTasks, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from typing import List, Optional, Dict, Any
 from uuid import UUID, uuid4
-from app.api.models.content import ContentCreate, ContentUpdate, ContentResponse, ContentType, ContentStatus
+from app.api.models.content import (
+    ContentCreate, ContentUpdate, ContentResponse, ContentSummary, ContentType, ContentStatus,
+    ContentBulkCreate, ContentBulkUpdate, ContentBulkStatusChange, BulkResponse
+)
 from app.api.models.common import StandardResponse
-from app.utils.supabase_client import supabase, check_user_workspace_access
-from app.api.deps import get_current_user_id
-from app.workflows.content_workflow import run_content_generation
+from app.utils.supabase_client import check_user_workspace_access
+from app.utils.db import db
+from app.utils.job_queue import get_job_queue
+from app.utils.task_events import get_task_events, publish_task_update, TERMINAL_STATUSES
+from app.utils.pagination import encode_cursor, decode_cursor, keyset_filter, keyset_order
+from app.api.deps import get_current_user_id, authenticate_token
+from app.core.config import settings
+from app.workflows.content_workflow import run_content_generation, EventCallback
+from datetime import datetime, timezone
+import asyncio
+import json
 
 router = APIRouter()
 
-@router.get("/workspace/{workspace_id}", response_model=List[ContentResponse])
+# Columns returned by list views; the content body is only fetched on detail
+SUMMARY_COLUMNS = "id,workspace_id,title,content_type,status,created_by,created_at,updated_at"
+
+# Keyset the list is paginated on, newest first
+PAGE_KEY = ["updated_at", "id"]
+
+@router.get("/workspace/{workspace_id}", response_model=List[ContentSummary])
 async def get_workspace_content(
+    response: Response,
     workspace_id: UUID,
     content_type: Optional[ContentType] = None,
     status: Optional[ContentStatus] = None,
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
     current_user_id: str = Depends(get_current_user_id),
 ):
-    """Get content for a specific workspace with optional filtering"""
+    """Get content summaries for a workspace, most recently updated first
+
+    Paginated by keyset on (updated_at, id): when more rows exist, the
+    X-Next-Cursor response header holds the cursor for the next page.
+    """
     # Check if user has access to this workspace
     has_access = await check_user_workspace_access(current_user_id, workspace_id)
     if not has_access:
         raise HTTPException(status_code=403, detail="You don't have access to this workspace")
 
     # Build the query
-    query = supabase.table("content").select("*").eq("workspace_id", str(workspace_id))
+    query = db.table("content").select(SUMMARY_COLUMNS).eq("workspace_id", str(workspace_id))
 
     # Apply filters if provided
     if content_type:
-        query = query.eq("content_type", content_type)
+        query = query.eq("content_type", content_type.value)
 
     if status:
-        query = query.eq("status", status)
+        query = query.eq("status", status.value)
 
-    # Apply pagination
-    query = query.order("created_at", desc=True).range(offset, offset + limit - 1)
+    # Continue after the last row of the previous page
+    if cursor:
+        try:
+            position = decode_cursor(cursor, len(PAGE_KEY))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query.params = query.params.add("or", keyset_filter(PAGE_KEY, position))
+
+    # Fetch one extra row to tell whether there is a next page
+    query.params = query.params.add("order", keyset_order(PAGE_KEY))
+    query = query.limit(limit + 1)
 
     # Execute the query
-    response = query.execute()
+    result = await query.execute()
+    rows = result.data
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor([rows[-1][column] for column in PAGE_KEY])
 
-    return response.data
+    return rows
+
+@router.get("/{content_id}", response_model=ContentResponse)
+async def get_content(
+    content_id: UUID,
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """Get a single content item including its body"""
+    response = await db.table("content").select("*").eq("id", str(content_id)).limit(1).execute()
+
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    content = response.data[0]
+
+    # Check if user has access to this content's workspace
+    has_access = await check_user_workspace_access(current_user_id, content["workspace_id"])
+    if not has_access:
+        raise HTTPException(status_code=403, detail="You don't have access to this content")
+
+    return content
 
 @router.post("/", response_model=ContentResponse)
 async def create_content(
@@ -61,25 +119,164 @@ async def create_content(
             detail="You don't have permission to create content in this workspace"
         )
 
-    # Prepare the content data
-    content_data = content.dict()
+    # Prepare the content data (UUIDs and enums as JSON values)
+    content_data = jsonable_encoder(content)
     content_data["created_by"] = current_user_id
 
     # Insert the content
-    response = supabase.table("content").insert(content_data).execute()
+    response = await db.table("content").insert(content_data).execute()
 
     if not response.data or len(response.data) == 0:
         raise HTTPException(status_code=500, detail="Failed to create content")
 
     return response.data[0]
 
-@router.post("/generate", response_model=Dict[str, Any])
-async def generate_content(
-    request: Dict[str, Any],
-    background_tasks: BackgroundTasks,
+# Roles allowed to write content
+WRITER_ROLES = ["admin", "content_manager", "content_creator"]
+
+def check_bulk_size(count: int):
+    if count > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BULK_MAX_ITEMS} items can be sent per request")
+
+async def get_writable_workspaces(current_user_id: str, workspace_ids) -> set:
+    """Check write access once per distinct workspace, returning the allowed ones"""
+    workspace_ids = list({str(workspace_id) for workspace_id in workspace_ids})
+    allowed = await asyncio.gather(*[
+        check_user_workspace_access(current_user_id, workspace_id, required_roles=WRITER_ROLES)
+        for workspace_id in workspace_ids
+    ])
+    return {workspace_id for workspace_id, has_access in zip(workspace_ids, allowed) if has_access}
+
+async def get_content_workspaces(ids: List[str]) -> Dict[str, str]:
+    """Map content IDs to their workspace IDs"""
+    workspaces = {}
+    for start in range(0, len(ids), settings.BULK_WRITE_BATCH_SIZE):
+        batch = ids[start:start + settings.BULK_WRITE_BATCH_SIZE]
+        response = await db.table("content").select("id,workspace_id").in_("id", batch).execute()
+        workspaces.update({row["id"]: row["workspace_id"] for row in response.data})
+    return workspaces
+
+def bulk_response(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    results.sort(key=lambda result: result["index"])
+    succeeded = sum(1 for result in results if result["success"])
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_create_content(
+    request: ContentBulkCreate,
     current_user_id: str = Depends(get_current_user_id),
 ):
-    """Generate content using AI"""
+    """Create many content items, checking access once per workspace
+
+    Rows are inserted in batches of BULK_WRITE_BATCH_SIZE; items without
+    access, or in a batch that fails, are reported individually.
+    """
+    check_bulk_size(len(request.items))
+    allowed = await get_writable_workspaces(current_user_id, [item.workspace_id for item in request.items])
+
+    results = []
+    pending = []
+    for index, item in enumerate(request.items):
+        if str(item.workspace_id) not in allowed:
+            results.append({"index": index, "success": False, "error": "You don't have permission to create content in this workspace"})
+        else:
+            pending.append((index, {**jsonable_encoder(item), "created_by": current_user_id}))
+
+    for start in range(0, len(pending), settings.BULK_WRITE_BATCH_SIZE):
+        batch = pending[start:start + settings.BULK_WRITE_BATCH_SIZE]
+        try:
+            response = await db.table("content").insert([row for _, row in batch]).execute()
+            # PostgREST returns inserted rows in request order
+            for (index, _), row in zip(batch, response.data):
+                results.append({"index": index, "id": row["id"], "success": True})
+        except Exception as e:
+            print(f"Error inserting content batch: {str(e)}")
+            results.extend({"index": index, "success": False, "error": "Failed to create content"} for index, _ in batch)
+
+    return bulk_response(results)
+
+@router.patch("/bulk", response_model=BulkResponse)
+async def bulk_update_content(
+    request: ContentBulkUpdate,
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """Update many content items
+
+    Items with identical changes (e.g. the same status) are written with a
+    single UPDATE ... WHERE id IN (...) statement.
+    """
+    check_bulk_size(len(request.items))
+    ids = [str(item.id) for item in request.items]
+    workspaces = await get_content_workspaces(ids)
+    allowed = await get_writable_workspaces(current_user_id, workspaces.values())
+
+    results = []
+    # Serialized changes -> (changes, [(index, id)])
+    groups: Dict[str, Any] = {}
+    for index, item in enumerate(request.items):
+        content_id = str(item.id)
+        changes = {key: value for key, value in jsonable_encoder(item, exclude={"id"}).items() if value is not None}
+        if content_id not in workspaces:
+            results.append({"index": index, "id": content_id, "success": False, "error": "Content not found"})
+        elif workspaces[content_id] not in allowed:
+            results.append({"index": index, "id": content_id, "success": False, "error": "You don't have permission to update this content"})
+        elif not changes:
+            results.append({"index": index, "id": content_id, "success": False, "error": "No fields to update"})
+        else:
+            key = json.dumps(changes, sort_keys=True)
+            groups.setdefault(key, (changes, []))[1].append((index, content_id))
+
+    results.extend(await apply_bulk_updates(list(groups.values())))
+    return bulk_response(results)
+
+@router.post("/bulk/status", response_model=BulkResponse)
+async def bulk_change_status(
+    request: ContentBulkStatusChange,
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """Move many content items to a new status"""
+    check_bulk_size(len(request.ids))
+    ids = [str(content_id) for content_id in request.ids]
+    workspaces = await get_content_workspaces(ids)
+    allowed = await get_writable_workspaces(current_user_id, workspaces.values())
+
+    results = []
+    targets = []
+    for index, content_id in enumerate(ids):
+        if content_id not in workspaces:
+            results.append({"index": index, "id": content_id, "success": False, "error": "Content not found"})
+        elif workspaces[content_id] not in allowed:
+            results.append({"index": index, "id": content_id, "success": False, "error": "You don't have permission to update this content"})
+        else:
+            targets.append((index, content_id))
+
+    if targets:
+        results.extend(await apply_bulk_updates([({"status": request.status.value}, targets)]))
+    return bulk_response(results)
+
+async def apply_bulk_updates(groups: List[Any]) -> List[Dict[str, Any]]:
+    """Apply (changes, [(index, id)]) groups, one batched UPDATE per group and batch of IDs"""
+    updated_at = datetime.now(timezone.utc).isoformat()
+    writes = []
+    for changes, targets in groups:
+        for start in range(0, len(targets), settings.BULK_WRITE_BATCH_SIZE):
+            writes.append(({**changes, "updated_at": updated_at}, targets[start:start + settings.BULK_WRITE_BATCH_SIZE]))
+
+    async def write(changes: Dict[str, Any], batch: List[Any]) -> List[Dict[str, Any]]:
+        try:
+            await db.table("content").update(changes).in_("id", [content_id for _, content_id in batch]).execute()
+            return [{"index": index, "id": content_id, "success": True} for index, content_id in batch]
+        except Exception as e:
+            print(f"Error updating content batch: {str(e)}")
+            return [{"index": index, "id": content_id, "success": False, "error": "Failed to update content"} for index, content_id in batch]
+
+    results = []
+    for batch_results in await asyncio.gather(*[write(changes, batch) for changes, batch in writes]):
+        results.extend(batch_results)
+    return results
+
+async def create_generation_task(request: Dict[str, Any], current_user_id: str) -> str:
+    """Validate a generation request and record its task, returning the task ID"""
     workspace_id = request.get("workspace_id")
 
     if not workspace_id:
@@ -110,98 +307,314 @@ async def generate_content(
     }
 
     # Insert task into database
-    supabase.table("ai_tasks").insert(task).execute()
+    response = await db.table("ai_tasks").insert(task).execute()
+    await publish_task_update(response.data[0] if response.data else None)
+
+    return task_id
 
-    # Run content generation in background
-    background_tasks.add_task(process_content_generation, task_id, request, current_user_id)
+@router.post("/generate", response_model=Dict[str, Any])
+async def generate_content(
+    request: Dict[str, Any],
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """Generate content using AI"""
+    task_id = await create_generation_task(request, current_user_id)
+
+    # Hand the generation to the worker queue (see app/worker.py)
+    await get_job_queue().enqueue("content_generation", {
+        "task_id": task_id,
+        "request": request,
+        "user_id": current_user_id
+    })
 
     return {"task_id": task_id, "status": "pending"}
 
+def format_sse(event: Dict[str, Any]) -> str:
+    """Format an event as a server-sent event frame"""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+# Generation tasks started by streaming requests, kept referenced until they finish
+_streaming_tasks = set()
+
+@router.post("/generate/stream")
+async def generate_content_stream(
+    request: Dict[str, Any],
+    current_user_id: str = Depends(get_current_user_id),
+):
+    """Generate content using AI, streaming progress and tokens as server-sent events
+
+    Emits task_created first, then step_started/token/step_finished for each
+    workflow step, and finally completed or failed. Generation carries on and
+    its task is still updated if the client disconnects.
+    """
+    task_id = await create_generation_task(request, current_user_id)
+    events = asyncio.Queue()
+
+    generation = asyncio.create_task(
+        process_content_generation(task_id, request, current_user_id, on_event=events.put)
+    )
+    _streaming_tasks.add(generation)
+
+    def finished(task: asyncio.Task):
+        _streaming_tasks.discard(task)
+        # Make sure the stream ends even if the task died before emitting a final event
+        if task.cancelled() or task.exception():
+            events.put_nowait({"type": "failed", "task_id": task_id, "error": "Content generation was interrupted"})
+
+    generation.add_done_callback(finished)
+
+    async def event_stream():
+        yield format_sse({"type": "task_created", "task_id": task_id})
+        while True:
+            event = await events.get()
+            yield format_sse(event)
+            if event["type"] in ("completed", "failed"):
+                break
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def load_task(task_id: str) -> Dict[str, Any]:
+    """Get a task's current row, from the shared event bus if it has it, else the database"""
+    try:
+        task = await get_task_events().latest(task_id)
+    except Exception as e:
+        print(f"Warning: Failed to read task from event bus: {str(e)}")
+        task = None
+
+    if task is None:
+        response = await db.table("ai_tasks").select("*").eq("id", task_id).limit(1).execute()
+        task = response.data[0] if response.data else None
+
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    return task
+
+async def wait_for_task_update(task: Dict[str, Any], known_status: str, updates: asyncio.Queue, timeout: float) -> Dict[str, Any]:
+    """Wait until a task leaves known_status or finishes, or the timeout passes
+
+    Args:
+        task: The task's current row
+        known_status: The status the caller already has
+        updates: Subscription queue from the task event bus
+        timeout: Seconds to wait at most
+
+    Returns:
+        The task's latest row
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    while task["status"] == known_status and task["status"] not in TERMINAL_STATUSES:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            task = await asyncio.wait_for(updates.get(), timeout=min(remaining, settings.TASK_WAIT_RECHECK_INTERVAL))
+        except asyncio.TimeoutError:
+            # Catches updates this process can't hear, e.g. from a worker elsewhere without Redis
+            task = await load_task(task["id"])
+
+    return task
+
 @router.get("/task/{task_id}", response_model=Dict[str, Any])
 async def get_task_status(
     task_id: UUID,
+    wait: float = Query(0, ge=0, le=settings.TASK_WAIT_MAX, description="Seconds to hold the request until the status changes"),
+    status: Optional[str] = Query(None, description="Status the client already has (default: the current one)"),
     current_user_id: str = Depends(get_current_user_id),
 ):
-    """Get the status of a content generation task"""
-    # Get task from database
-    response = supabase.table("ai_tasks").select("*").eq("id", str(task_id)).single().execute()
+    """Get the status of a content generation task
 
-    if not response.data:
-        raise HTTPException(status_code=404, detail="Task not found")
+    With wait > 0 this long-polls: the response is held until the task's
+    status differs from `status` or the task finishes, at most wait seconds.
+    Updates are pushed by process_content_generation, so a waiting request
+    doesn't query the database again.
+    """
+    task_id = str(task_id)
 
-    task = response.data
+    # Subscribe before reading so no update between the read and the wait is missed
+    async with get_task_events().subscribe(task_id) as updates:
+        task = await load_task(task_id)
 
-    # Check if user has access to this task's workspace
-    has_access = await check_user_workspace_access(current_user_id, task["workspace_id"])
-    if not has_access:
-        raise HTTPException(status_code=403, detail="You don't have access to this task")
+        # Check if user has access to this task's workspace
+        has_access = await check_user_workspace_access(current_user_id, task["workspace_id"])
+        if not has_access:
+            raise HTTPException(status_code=403, detail="You don't have access to this task")
+
+        if wait:
+            task = await wait_for_task_update(task, status or task["status"], updates, wait)
 
     return task
 
-async def process_content_generation(task_id: str, request: Dict[str, Any], user_id: str):
-    """Background task to process content generation"""
+@router.websocket("/task/{task_id}/ws")
+async def task_status_socket(websocket: WebSocket, task_id: UUID, token: Optional[str] = None):
+    """Push a task's row on connect and after every status change, closing once it finishes
+
+    Browsers can't set headers on WebSockets, so the session token may also
+    be passed as ?token=.
+    """
+    task_id = str(task_id)
+    authorization = websocket.headers.get("authorization", "")
+    token = token or (authorization[len("Bearer "):] if authorization.startswith("Bearer ") else None)
+
     try:
-        # Update task status to processing
-        supabase.table("ai_tasks").update({"status": "processing"}).eq("id", task_id).execute()
+        if not token:
+            raise HTTPException(status_code=401, detail="Missing token")
+        user_id = await authenticate_token(token)
+        async with get_task_events().subscribe(task_id) as updates:
+            task = await load_task(task_id)
+            if not await check_user_workspace_access(user_id, task["workspace_id"]):
+                raise HTTPException(status_code=403, detail="You don't have access to this task")
+
+            await websocket.accept()
+            await websocket.send_json(jsonable_encoder(task))
+
+            # Watch for the client going away while waiting for updates
+            receiver = asyncio.create_task(websocket.receive())
+            waiter = None
+            try:
+                while task["status"] not in TERMINAL_STATUSES:
+                    status = task["status"]
+                    if waiter is None:
+                        waiter = asyncio.create_task(wait_for_task_update(task, status, updates, settings.TASK_WAIT_MAX))
+                    await asyncio.wait([receiver, waiter], return_when=asyncio.FIRST_COMPLETED)
+
+                    if receiver.done():
+                        if receiver.result()["type"] == "websocket.disconnect":
+                            return
+                        # Messages from the client are ignored; the waiter keeps running
+                        receiver = asyncio.create_task(websocket.receive())
+
+                    # Both may have finished together, so an update is never dropped for a message
+                    if waiter.done():
+                        task = waiter.result()
+                        waiter = None
+                        if task["status"] != status:
+                            await websocket.send_json(jsonable_encoder(task))
+            finally:
+                receiver.cancel()
+                if waiter is not None:
+                    waiter.cancel()
+    except HTTPException as e:
+        # Close before accepting, which rejects the handshake
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    except WebSocketDisconnect:
+        return
+
+    await websocket.close()
+
+async def update_task(task_id: str, changes: Dict[str, Any]):
+    """Update a task's row and push the new row to anyone waiting on it"""
+    response = await db.table("ai_tasks").update(changes).eq("id", task_id).execute()
+    await publish_task_update(response.data[0] if response.data else None)
+
+class GenerationFailed(Exception):
+    """Raised when the content workflow reports an unsuccessful run"""
+
+async def process_content_generation(
+    task_id: str,
+    request: Dict[str, Any],
+    user_id: str,
+    on_event: Optional[EventCallback] = None,
+    raise_errors: bool = False,
+    final_attempt: bool = True
+):
+    """Background task to process content generation
+
+    Args:
+        task_id: The ai_tasks row to update
+        request: The generation request
+        user_id: The requesting user
+        on_event: Optional coroutine receiving workflow progress events, then completed or failed
+        raise_errors: Re-raise failures after recording them, so a job queue
+            can retry or dead-letter the job
+        final_attempt: Whether a failure is final; if not, the task goes back
+            to pending with the error instead of being marked failed
+    """
+    async def emit(event: Dict[str, Any]):
+        if on_event:
+            await on_event({**event, "task_id": task_id})
 
-        # Get brand profile for the workspace if it exists
-        brand_response = supabase.table("brand_profiles").select("*").eq("workspace_id", request["workspace_id"]).execute()
-        brand_profile = brand_response.data[0] if brand_response.data else None
+    try:
+        # Update task status to processing
+        await update_task(task_id, {"status": "processing"})
 
-        # Run content generation workflow
+        # Run content generation workflow; it loads the brand profile alongside knowledge retrieval
         result = await run_content_generation({
             "topic": request.get("topic"),
             "content_type": request.get("content_type"),
             "tone": request.get("tone"),
             "target_audience": request.get("target_audience"),
             "key_points": request.get("key_points"),
-            "brand_profile": brand_profile,
-            "workspace_id": request.get("workspace_id")
+            "workspace_id": request.get("workspace_id"),
+            "ideation_variants": request.get("ideation_variants")
+        }, on_event=emit if on_event else None)
+
+        if not result["success"]:
+            raise GenerationFailed(result["error"])
+
+        # Create content entry if requested; keyed by the task, so a retried
+        # job overwrites the draft instead of adding another
+        if request.get("auto_save", False):
+            content = {
+                "id": task_id,
+                "workspace_id": request["workspace_id"],
+                "title": request.get("title", "Generated Content"),
+                "content_type": request.get("content_type"),
+                "content": {
+                    "text": result["content"],
+                    "ideas": result.get("ideas"),
+                    "research": result.get("research"),
+                    "metadata": {
+                        "topic": request.get("topic"),
+                        "target_audience": request.get("target_audience"),
+                        "tone": request.get("tone"),
+                        "key_points": request.get("key_points")
+                    }
+                },
+                "status": "draft",
+                "created_by": user_id
+            }
+
+            await db.table("content").upsert(content).execute()
+
+        # Update task with success result
+        await update_task(task_id, {
+            "status": "completed",
+            "output": {
+                "content": result["content"],
+                "ideas": result.get("ideas"),
+                "research": result.get("research"),
+                "workflow": result.get("workflow"),
+                "step_timings": result.get("step_timings"),
+                "prompt_tokens": result.get("prompt_tokens"),
+                "token_usage": result.get("token_usage")
+            }
         })
 
-        if result["success"]:
-            # Update task with success result
-            supabase.table("ai_tasks").update({
-                "status": "completed",
-                "output": {
-                    "content": result["content"],
-                    "ideas": result.get("ideas"),
-                    "research": result.get("research")
-                }
-            }).eq("id", task_id).execute()
-
-            # Create content entry if requested
-            if request.get("auto_save", False):
-                content = {
-                    "workspace_id": request["workspace_id"],
-                    "title": request.get("title", "Generated Content"),
-                    "content_type": request.get("content_type"),
-                    "content": {
-                        "text": result["content"],
-                        "ideas": result.get("ideas"),
-                        "research": result.get("research"),
-                        "metadata": {
-                            "topic": request.get("topic"),
-                            "target_audience": request.get("target_audience"),
-                            "tone": request.get("tone"),
-                            "key_points": request.get("key_points")
-                        }
-                    },
-                    "status": "draft",
-                    "created_by": user_id
-                }
-
-                supabase.table("content").insert(content).execute()
-        else:
-            # Update task with error
-            supabase.table("ai_tasks").update({
-                "status": "failed",
-                "error": result["error"]
-            }).eq("id", task_id).execute()
+        await emit({"type": "completed", "content": result["content"]})
 
     except Exception as e:
+        if not final_attempt:
+            # Record the error but leave the task open for the retry
+            await update_task(task_id, {"status": "pending", "error": str(e)})
+            if raise_errors:
+                raise
+            return
+
         # Update task with error
-        supabase.table("ai_tasks").update({
+        await update_task(task_id, {
             "status": "failed",
             "error": str(e)
-        }).eq("id", task_id).execute() 
\ No newline at end of file
+        })
+
+        await emit({"type": "failed", "error": str(e)})
+
+        if raise_errors:
+            raise 
\ No newline at end of file
@@ -1,10 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from uuid import UUID, uuid4
 from app.api.models.common import StandardResponse
-from app.utils.supabase_client import supabase, check_user_workspace_access
-from app.utils.storage import get_storage_path, generate_unique_filename, validate_file_type, validate_file_size
+from app.utils.supabase_client import get_supabase, check_user_workspace_access
+from app.utils.db import db
+from app.utils.storage import (
+    get_storage_path, split_storage_path, validate_file_type, upload_stream,
+    UploadReader, FileTooLarge, sniff_mime_type, matches_declared_type
+)
 from app.api.deps import get_current_user_id
+from app.utils.retrieval_cache import bump_knowledge_generation
+from app.utils.vector_store import delete_vectors
+from app.workflows.knowledge_ingestion import run_knowledge_ingestion, previous_vector_ids
+import asyncio
 import json
 
 router = APIRouter()
@@ -12,7 +20,6 @@ router = APIRouter()
 # Define allowed file types and size limits
 ALLOWED_FILE_TYPES = [
     "application/pdf", 
-    "application/msword", 
     "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
     "text/plain", 
     "text/csv", 
@@ -20,6 +27,17 @@ ALLOWED_FILE_TYPES = [
 ]
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Types clients may still send but that text can't be extracted from, with the reason given
+UNSUPPORTED_FILE_TYPES = {
+    "application/msword": "Legacy Word (.doc) files are not supported; save the file as .docx or PDF and upload it again"
+}
+
+# Columns returned by the file list; chunk_manifest can be large and is only needed for ingestion
+FILE_LIST_COLUMNS = (
+    "id,workspace_id,name,description,original_filename,storage_path,file_type,file_size,content_hash,"
+    "is_processed,processing_error,processing_stats,created_by,created_at,updated_at"
+)
+
 @router.get("/workspace/{workspace_id}", response_model=List[Dict[str, Any]])
 async def get_knowledge_files(
     workspace_id: UUID,
@@ -32,10 +50,76 @@ async def get_knowledge_files(
         raise HTTPException(status_code=403, detail="You don't have access to this workspace")
 
     # Get knowledge files
-    response = supabase.table("knowledge_files").select("*").eq("workspace_id", str(workspace_id)).execute()
+    response = await db.table("knowledge_files").select(FILE_LIST_COLUMNS).eq("workspace_id", str(workspace_id)).execute()
 
     return response.data
 
+async def store_uploaded_file(file: UploadFile, object_id: str, user_id: str) -> Tuple[str, UploadReader]:
+    """Validate an uploaded knowledge file and stream it to storage
+
+    The file is piped to storage chunk by chunk; the size limit and content
+    hash are applied to the bytes as they are read.
+
+    Args:
+        file: The uploaded file
+        object_id: Unique name for the stored object (the extension is kept from the upload)
+        user_id: The uploading user
+
+    Returns:
+        The storage path, and the reader holding the file's size and sha256
+    """
+    # Validate file type
+    if file.content_type in UNSUPPORTED_FILE_TYPES:
+        raise HTTPException(status_code=415, detail=UNSUPPORTED_FILE_TYPES[file.content_type])
+
+    if not validate_file_type(file.content_type, ALLOWED_FILE_TYPES):
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_FILE_TYPES)}"
+        )
+
+    reader = UploadReader(file, MAX_FILE_SIZE)
+    too_large = HTTPException(
+        status_code=400,
+        detail=f"File size exceeds the limit of {MAX_FILE_SIZE / (1024 * 1024)}MB"
+    )
+
+    try:
+        head = await reader.read_head()
+    except FileTooLarge:
+        raise too_large
+
+    # Check the content really is what the client says it is
+    if not matches_declared_type(file.content_type, sniff_mime_type(head)):
+        raise HTTPException(status_code=400, detail="File content does not match its declared type")
+
+    # Generate unique filename
+    original_filename = file.filename
+    file_extension = original_filename.split(".")[-1] if "." in original_filename else ""
+    unique_filename = f"{object_id}.{file_extension}"
+
+    # Get storage path
+    storage_path = get_storage_path("KNOWLEDGE_FILES", user_id, unique_filename)
+
+    # Upload file to storage
+    try:
+        bucket, path = split_storage_path(storage_path)
+        await upload_stream(bucket, path, reader.chunks(), file.content_type)
+    except FileTooLarge:
+        raise too_large
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
+
+    return storage_path, reader
+
+async def remove_stored_file(storage_path: str):
+    """Delete a file from storage, logging rather than raising on failure"""
+    try:
+        bucket, path = split_storage_path(storage_path)
+        await asyncio.to_thread(get_supabase().storage.from_(bucket).remove, [path])
+    except Exception as e:
+        print(f"Warning: Failed to delete file from storage: {str(e)}")
+
 @router.post("/upload", response_model=Dict[str, Any])
 async def upload_knowledge_file(
     workspace_id: str = Form(...),
@@ -59,43 +143,8 @@ async def upload_knowledge_file(
             detail="You don't have permission to upload knowledge files to this workspace"
         )
 
-    # Validate file type
-    if not validate_file_type(file.content_type, ALLOWED_FILE_TYPES):
-        raise HTTPException(
-            status_code=400,
-            detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_FILE_TYPES)}"
-        )
-
-    # Read file content to validate size
-    file_content = await file.read()
-    await file.seek(0)  # Reset file position after reading
-
-    # Validate file size
-    if not validate_file_size(len(file_content), MAX_FILE_SIZE):
-        raise HTTPException(
-            status_code=400,
-            detail=f"File size exceeds the limit of {MAX_FILE_SIZE / (1024 * 1024)}MB"
-        )
-
-    # Generate unique filename
     file_id = str(uuid4())
-    original_filename = file.filename
-    file_extension = original_filename.split(".")[-1] if "." in original_filename else ""
-    unique_filename = f"{file_id}.{file_extension}"
-
-    # Get storage path
-    storage_path = get_storage_path("KNOWLEDGE_FILES", current_user_id, unique_filename)
-
-    # Upload file to storage
-    try:
-        # Upload to Supabase Storage
-        supabase.storage.from_("knowledge-files").upload(
-            f"{current_user_id}/{unique_filename}",
-            file_content,
-            {"content-type": file.content_type}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
+    storage_path, reader = await store_uploaded_file(file, file_id, current_user_id)
 
     # Create knowledge file record
     knowledge_file = {
@@ -103,26 +152,128 @@ async def upload_knowledge_file(
         "workspace_id": workspace_id,
         "name": name,
         "description": description,
-        "original_filename": original_filename,
+        "original_filename": file.filename,
         "storage_path": storage_path,
         "file_type": file.content_type,
-        "file_size": len(file_content),
+        "file_size": reader.size,
+        "content_hash": reader.sha256,
         "is_processed": False,
         "created_by": current_user_id
     }
 
     # Insert into database
-    response = supabase.table("knowledge_files").insert(knowledge_file).execute()
+    response = await db.table("knowledge_files").insert(knowledge_file).execute()
 
     if not response.data or len(response.data) == 0:
         raise HTTPException(status_code=500, detail="Failed to create knowledge file record")
 
+    await bump_knowledge_generation(workspace_id)
+
     # Schedule background processing if background_tasks is provided
     if background_tasks:
         background_tasks.add_task(process_knowledge_file, file_id, workspace_id)
 
     return response.data[0]
 
+@router.put("/{file_id}/file", response_model=Dict[str, Any])
+async def replace_knowledge_file(
+    file_id: UUID,
+    file: UploadFile = File(...),
+    current_user_id: str = Depends(get_current_user_id),
+    background_tasks: BackgroundTasks = None,
+):
+    """Replace a knowledge file's content with a new version
+
+    The new version is re-ingested incrementally: only chunks that changed
+    are embedded, and vectors of removed chunks are deleted. Uploading
+    identical content changes nothing.
+    """
+    response = await db.table("knowledge_files").select("*").eq("id", str(file_id)).limit(1).execute()
+
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Knowledge file not found")
+
+    file_data = response.data[0]
+
+    has_access = await check_user_workspace_access(
+        current_user_id,
+        file_data["workspace_id"],
+        required_roles=["admin", "content_manager", "knowledge_manager"]
+    )
+
+    if not has_access:
+        raise HTTPException(
+            status_code=403,
+            detail="You don't have permission to replace knowledge files in this workspace"
+        )
+
+    # Stored under a new name so the current version stays intact until the record points elsewhere
+    storage_path, reader = await store_uploaded_file(file, str(uuid4()), current_user_id)
+
+    if reader.sha256 == file_data.get("content_hash"):
+        await remove_stored_file(storage_path)
+        file_data.pop("chunk_manifest", None)
+        return file_data
+
+    update_response = await db.table("knowledge_files").update({
+        "original_filename": file.filename,
+        "storage_path": storage_path,
+        "file_type": file.content_type,
+        "file_size": reader.size,
+        "content_hash": reader.sha256,
+        "is_processed": False
+    }).eq("id", str(file_id)).execute()
+
+    if not update_response.data:
+        await remove_stored_file(storage_path)
+        raise HTTPException(status_code=500, detail="Failed to update knowledge file record")
+
+    await remove_stored_file(file_data["storage_path"])
+    await bump_knowledge_generation(file_data["workspace_id"])
+
+    if background_tasks:
+        background_tasks.add_task(process_knowledge_file, str(file_id), file_data["workspace_id"])
+
+    updated = update_response.data[0]
+    updated.pop("chunk_manifest", None)
+    return updated
+
+@router.post("/{file_id}/reindex", response_model=StandardResponse)
+async def reindex_knowledge_file(
+    file_id: UUID,
+    current_user_id: str = Depends(get_current_user_id),
+    background_tasks: BackgroundTasks = None,
+):
+    """Re-ingest a knowledge file from its stored content
+
+    Chunks already in the file's manifest are not embedded again, only
+    rewritten to the lexical index, so this is how files ingested before
+    LEXICAL_INDEX_ENABLED was turned on join the BM25 leg.
+    """
+    response = await db.table("knowledge_files").select("id,workspace_id").eq("id", str(file_id)).limit(1).execute()
+
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Knowledge file not found")
+
+    file_data = response.data[0]
+
+    has_access = await check_user_workspace_access(
+        current_user_id,
+        file_data["workspace_id"],
+        required_roles=["admin", "content_manager", "knowledge_manager"]
+    )
+
+    if not has_access:
+        raise HTTPException(
+            status_code=403,
+            detail="You don't have permission to reindex knowledge files in this workspace"
+        )
+
+    if background_tasks:
+        background_tasks.add_task(process_knowledge_file, str(file_id), file_data["workspace_id"])
+
+    return {"success": True, "message": "Knowledge file queued for reindexing"}
+
 @router.delete("/{file_id}", response_model=StandardResponse)
 async def delete_knowledge_file(
     file_id: UUID,
@@ -130,7 +281,7 @@ async def delete_knowledge_file(
 ):
     """Delete a knowledge file"""
     # Get the file to check workspace access
-    response = supabase.table("knowledge_files").select("*").eq("id", str(file_id)).single().execute()
+    response = await db.table("knowledge_files").select("*").eq("id", str(file_id)).single().execute()
 
     if not response.data:
         raise HTTPException(status_code=404, detail="Knowledge file not found")
@@ -151,46 +302,48 @@ async def delete_knowledge_file(
             detail="You don't have permission to delete knowledge files from this workspace"
         )
 
-    # Delete from storage
-    try:
-        # Extract filename from storage path
-        storage_path = file_data["storage_path"]
-        path_parts = storage_path.split("/")
-        bucket = path_parts[0]
-        path = "/".join(path_parts[1:])
-
-        # Delete from Supabase Storage
-        supabase.storage.from_(bucket).remove([path])
-    except Exception as e:
-        # Continue even if storage deletion fails
-        print(f"Warning: Failed to delete file from storage: {str(e)}")
+    # Delete from storage (continue even if it fails)
+    await remove_stored_file(file_data["storage_path"])
+
+    # Delete the file's vectors
+    result = await delete_vectors(previous_vector_ids(file_data), workspace_id)
+    if result["status"] == "error":
+        print(f"Warning: Failed to delete vectors for knowledge file {file_id}: {result['reason']}")
 
     # Delete from database
-    delete_response = supabase.table("knowledge_files").delete().eq("id", str(file_id)).execute()
+    delete_response = await db.table("knowledge_files").delete().eq("id", str(file_id)).execute()
 
     if not delete_response.data or len(delete_response.data) == 0:
         raise HTTPException(status_code=500, detail="Failed to delete knowledge file record")
 
+    await bump_knowledge_generation(workspace_id)
+
     return {"success": True, "message": "Knowledge file deleted successfully"}
 
 async def process_knowledge_file(file_id: str, workspace_id: str):
     """Background task to process a knowledge file for vector storage"""
-    # This is a placeholder for the actual processing logic
-    # In a real implementation, this would:
-    # 1. Download the file from storage
-    # 2. Extract text content
-    # 3. Split into chunks
-    # 4. Generate embeddings
-    # 5. Store in vector database
-    # 6. Update the knowledge_file record with processing status
-
-    # For now, just update the is_processed flag
+    async def save_progress(stats: Dict[str, Any]):
+        await db.table("knowledge_files").update({"processing_stats": stats}).eq("id", file_id).execute()
+
     try:
-        supabase.table("knowledge_files").update({"is_processed": True}).eq("id", file_id).execute()
+        response = await db.table("knowledge_files").select("*").eq("id", file_id).single().execute()
+
+        # Download, extract, chunk, embed and store the file (only chunks not in its manifest)
+        result = await run_knowledge_ingestion(response.data, on_progress=save_progress)
+
+        await db.table("knowledge_files").update({
+            "is_processed": True,
+            "processing_error": None,
+            "processing_stats": result["stats"],
+            "chunk_manifest": result["chunk_manifest"]
+        }).eq("id", file_id).execute()
     except Exception as e:
         print(f"Error processing knowledge file {file_id}: {str(e)}")
         # Update with error status
-        supabase.table("knowledge_files").update({
+        await db.table("knowledge_files").update({
             "is_processed": False,
             "processing_error": str(e)
-        }).eq("id", file_id).execute() 
\ No newline at end of file
+        }).eq("id", file_id).execute()
+    finally:
+        # Even a failed run may have upserted or deleted vectors
+        await bump_knowledge_generation(workspace_id)
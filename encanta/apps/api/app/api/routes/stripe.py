@@ -1,21 +1,27 @@
-import stripe
-from fastapi import APIRouter, Request, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, Request, HTTPException
 from app.core.config import settings
-from app.api.deps import get_db
-from sqlalchemy.orm import Session
-from app.models.profile import Profile
+from app.utils.clients import clients
+from app.utils.db import db
 from typing import Dict, Any
 
-# Initialize Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
+def _create_stripe():
+    # Imported here: the stripe package takes over a second to import, more than the rest of the API
+    import stripe
+
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+clients.register("stripe", _create_stripe)
 
 router = APIRouter()
 
 @router.post("/webhook")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+async def stripe_webhook(request: Request):
     """
     Handle Stripe webhook events
     """
+    stripe = clients.get("stripe")
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
     
@@ -36,17 +42,17 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     
     if event_type == "checkout.session.completed":
         # Handle checkout session completed
-        await handle_checkout_session_completed(data, db)
+        await handle_checkout_session_completed(data)
     elif event_type == "customer.subscription.updated":
         # Handle subscription updated
-        await handle_subscription_updated(data, db)
+        await handle_subscription_updated(data)
     elif event_type == "customer.subscription.deleted":
         # Handle subscription deleted
-        await handle_subscription_deleted(data, db)
+        await handle_subscription_deleted(data)
     
     return {"status": "success"}
 
-async def handle_checkout_session_completed(session: Dict[Any, Any], db: Session):
+async def handle_checkout_session_completed(session: Dict[Any, Any]):
     """
     Handle checkout.session.completed event
     """
@@ -54,18 +60,19 @@ async def handle_checkout_session_completed(session: Dict[Any, Any], db: Session
         customer_id = session["customer"]
         subscription_id = session["subscription"]
         
-        # Get subscription details
-        subscription = stripe.Subscription.retrieve(subscription_id)
+        # Get subscription details (the Stripe SDK is blocking)
+        stripe = clients.get("stripe")
+        subscription = await asyncio.to_thread(stripe.Subscription.retrieve, subscription_id)
         product_id = subscription["items"]["data"][0]["price"]["product"]
         
         # Get product details
-        product = stripe.Product.retrieve(product_id)
+        product = await asyncio.to_thread(stripe.Product.retrieve, product_id)
         membership = product.get("metadata", {}).get("membership", "free")
         
         # Update user profile
-        update_user_subscription(db, customer_id, subscription_id, membership)
+        await update_user_subscription(customer_id, subscription_id, membership)
 
-async def handle_subscription_updated(subscription: Dict[Any, Any], db: Session):
+async def handle_subscription_updated(subscription: Dict[Any, Any]):
     """
     Handle customer.subscription.updated event
     """
@@ -75,13 +82,13 @@ async def handle_subscription_updated(subscription: Dict[Any, Any], db: Session)
         
         # Get product details
         product_id = subscription["items"]["data"][0]["price"]["product"]
-        product = stripe.Product.retrieve(product_id)
+        product = await asyncio.to_thread(clients.get("stripe").Product.retrieve, product_id)
         membership = product.get("metadata", {}).get("membership", "free")
         
         # Update user profile
-        update_user_subscription(db, customer_id, subscription_id, membership)
+        await update_user_subscription(customer_id, subscription_id, membership)
 
-async def handle_subscription_deleted(subscription: Dict[Any, Any], db: Session):
+async def handle_subscription_deleted(subscription: Dict[Any, Any]):
     """
     Handle customer.subscription.deleted event
     """
@@ -90,20 +97,15 @@ async def handle_subscription_deleted(subscription: Dict[Any, Any], db: Session)
         subscription_id = subscription["id"]
         
         # Update user profile to free tier
-        update_user_subscription(db, customer_id, subscription_id, "free")
+        await update_user_subscription(customer_id, subscription_id, "free")
 
-def update_user_subscription(db: Session, customer_id: str, subscription_id: str, membership: str):
+async def update_user_subscription(customer_id: str, subscription_id: str, membership: str) -> bool:
     """
-    Update user subscription status in database
+    Update the subscription of the profile with the given Stripe customer ID
     """
-    # Find user profile by Stripe customer ID
-    profile = db.query(Profile).filter(Profile.stripe_customer_id == customer_id).first()
-    
-    if profile:
-        # Update subscription details
-        profile.stripe_subscription_id = subscription_id
-        profile.membership = membership
-        db.commit()
-        return True
+    response = await db.table("profiles").update({
+        "stripe_subscription_id": subscription_id,
+        "membership": membership
+    }).eq("stripe_customer_id", customer_id).execute()
     
-    return False 
\ No newline at end of file
+    return bool(response.data)
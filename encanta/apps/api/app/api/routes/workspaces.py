@@ -3,7 +3,8 @@ from typing import List, Optional
 from uuid import UUID
 from app.api.models.workspace import WorkspaceCreate, WorkspaceUpdate, WorkspaceResponse
 from app.api.models.common import StandardResponse
-from app.utils.supabase_client import supabase, get_user_workspaces, get_workspace_by_id, check_user_workspace_access
+from app.utils.db import db
+from app.utils.supabase_client import get_user_workspaces, get_workspace_by_id, check_user_workspace_access, invalidate_workspace_access
 from app.api.deps import get_current_user_id
 
 router = APIRouter()
@@ -24,7 +25,7 @@ async def create_workspace(
     """Create a new workspace"""
     # Insert the workspace
     workspace_data = workspace.dict()
-    response = supabase.table("workspaces").insert(workspace_data).execute()
+    response = await db.table("workspaces").insert(workspace_data).execute()
 
     if not response.data or len(response.data) == 0:
         raise HTTPException(status_code=500, detail="Failed to create workspace")
@@ -38,7 +39,8 @@ async def create_workspace(
         "role": "admin"
     }
 
-    supabase.table("workspace_members").insert(member_data).execute()
+    await db.table("workspace_members").insert(member_data).execute()
+    await invalidate_workspace_access(new_workspace["id"], current_user_id)
 
     return new_workspace
 
@@ -83,7 +85,7 @@ async def update_workspace(
     update_data = {k: v for k, v in workspace.dict().items() if v is not None}
     update_data["updated_at"] = "NOW()"
 
-    response = supabase.table("workspaces").update(update_data).eq("id", str(workspace_id)).execute()
+    response = await db.table("workspaces").update(update_data).eq("id", str(workspace_id)).execute()
 
     if not response.data or len(response.data) == 0:
         raise HTTPException(status_code=404, detail="Workspace not found")
@@ -110,9 +112,12 @@ async def delete_workspace(
         )
 
     # Delete the workspace
-    response = supabase.table("workspaces").delete().eq("id", str(workspace_id)).execute()
+    response = await db.table("workspaces").delete().eq("id", str(workspace_id)).execute()
 
     if not response.data or len(response.data) == 0:
         raise HTTPException(status_code=404, detail="Workspace not found")
 
+    # Members are removed with the workspace, so drop their cached roles
+    await invalidate_workspace_access(workspace_id)
+
     return {"success": True, "message": "Workspace deleted successfully"} 
\ No newline at end of file
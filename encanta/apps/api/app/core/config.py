@@ -12,6 +12,8 @@ class Settings(BaseSettings):
     # API settings
     API_PREFIX: str = "/api"
     DEBUG: bool = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
+    # Serve Prometheus metrics at /metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() in ("true", "1", "t")
     
     # CORS settings
     CORS_ORIGINS: List[str] = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
@@ -22,25 +24,128 @@ class Settings(BaseSettings):
     # Supabase settings
     SUPABASE_URL: str = os.getenv("SUPABASE_URL", "")
     SUPABASE_KEY: str = os.getenv("SUPABASE_KEY", "")
+
+    # Async PostgREST settings (defaults to the Supabase REST endpoint)
+    POSTGREST_URL: str = os.getenv("POSTGREST_URL", "")
+    DB_POOL_MAX_CONNECTIONS: int = int(os.getenv("DB_POOL_MAX_CONNECTIONS", "50"))
+    DB_POOL_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("DB_POOL_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    DB_TIMEOUT: float = float(os.getenv("DB_TIMEOUT", "10"))
+    # Bulk content endpoints: items per request, and rows per insert statement
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", "500"))
+    BULK_WRITE_BATCH_SIZE: int = int(os.getenv("BULK_WRITE_BATCH_SIZE", "100"))
     
     # OpenAI settings
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_ORGANIZATION: str = os.getenv("OPENAI_ORGANIZATION", "")
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "200"))
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "50"))
+    OPENAI_KEEPALIVE_EXPIRY: float = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", "120"))
+    OPENAI_CONNECT_TIMEOUT: float = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+    
+    # Agent response cache
+    AGENT_CACHE_ENABLED: bool = os.getenv("AGENT_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    AGENT_CACHE_TTL: float = float(os.getenv("AGENT_CACHE_TTL", "3600"))
+    AGENT_CACHE_MAX_WORKSPACES: int = int(os.getenv("AGENT_CACHE_MAX_WORKSPACES", "1000"))
+    AGENT_CACHE_MAX_ENTRIES: int = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "200"))
+    AGENT_SEMANTIC_CACHE_ENABLED: bool = os.getenv("AGENT_SEMANTIC_CACHE_ENABLED", "False").lower() in ("true", "1", "t")
+    AGENT_SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("AGENT_SEMANTIC_CACHE_THRESHOLD", "0.97"))
+
+    # Agent prompt budgets (tokens)
+    AGENT_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("AGENT_CONTEXT_TOKEN_BUDGET", "3000"))
+    AGENT_STEP_INPUT_TOKEN_BUDGET: int = int(os.getenv("AGENT_STEP_INPUT_TOKEN_BUDGET", "1500"))
+    AGENT_KNOWLEDGE_TOP_K: int = int(os.getenv("AGENT_KNOWLEDGE_TOP_K", "8"))
+    # Retrieval searches the topic plus key points and audience, weighting the extra queries' matches
+    AGENT_KNOWLEDGE_MAX_QUERIES: int = int(os.getenv("AGENT_KNOWLEDGE_MAX_QUERIES", "6"))
+    AGENT_KNOWLEDGE_SECONDARY_WEIGHT: float = float(os.getenv("AGENT_KNOWLEDGE_SECONDARY_WEIGHT", "0.5"))
     
     # Pinecone settings
     PINECONE_API_KEY: str = os.getenv("PINECONE_API_KEY", "")
     PINECONE_ENVIRONMENT: str = os.getenv("PINECONE_ENVIRONMENT", "")
     PINECONE_INDEX: str = os.getenv("PINECONE_INDEX", "encanta-knowledge")
+
+    # Vector store backend: "pinecone" or "local" (memory-mapped NumPy indexes)
+    VECTOR_STORE_BACKEND: str = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+    LOCAL_VECTOR_STORE_PATH: str = os.getenv("LOCAL_VECTOR_STORE_PATH", ".cache/vectors")
+    LOCAL_VECTOR_QUANTIZE: bool = os.getenv("LOCAL_VECTOR_QUANTIZE", "False").lower() in ("true", "1", "t")
+    LOCAL_VECTOR_IVF_THRESHOLD: int = int(os.getenv("LOCAL_VECTOR_IVF_THRESHOLD", "20000"))
+    LOCAL_VECTOR_IVF_NPROBE: int = int(os.getenv("LOCAL_VECTOR_IVF_NPROBE", "8"))
+
+    # Knowledge retrieval: "vector", "lexical" (BM25) or "hybrid" (both, fused by reciprocal rank)
+    RETRIEVAL_MODE: str = os.getenv("RETRIEVAL_MODE", "hybrid")
+    RETRIEVAL_HYBRID_CANDIDATES: int = int(os.getenv("RETRIEVAL_HYBRID_CANDIDATES", "20"))
+    RETRIEVAL_RRF_K: int = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+    # Retrieval result cache, versioned by a per-workspace knowledge generation
+    # (kept in Redis when REDIS_URL is set, otherwise in a local SQLite file)
+    RETRIEVAL_CACHE_ENABLED: bool = os.getenv("RETRIEVAL_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+    RETRIEVAL_CACHE_TTL: float = float(os.getenv("RETRIEVAL_CACHE_TTL", "3600"))
+    RETRIEVAL_CACHE_MAX_WORKSPACES: int = int(os.getenv("RETRIEVAL_CACHE_MAX_WORKSPACES", "1000"))
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "200"))
+    KNOWLEDGE_GENERATION_PATH: str = os.getenv("KNOWLEDGE_GENERATION_PATH", ".cache/knowledge_generations.sqlite3")
+    # Per-workspace BM25 indexes (SQLite FTS5 files) built during ingestion
+    # Node-local files, so on by default only with the (equally node-local) local vector store;
+    # enable it with a shared backend only if LEXICAL_INDEX_PATH is on storage every API and worker node shares
+    LEXICAL_INDEX_ENABLED: bool = os.getenv(
+        "LEXICAL_INDEX_ENABLED", str(os.getenv("VECTOR_STORE_BACKEND", "pinecone") == "local")
+    ).lower() in ("true", "1", "t")
+    LEXICAL_INDEX_PATH: str = os.getenv("LEXICAL_INDEX_PATH", ".cache/lexical")
+
+    # Embedding cache (SQLite file; empty disables caching)
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+    
+    # Knowledge ingestion settings
+    INGEST_CHUNK_SIZE: int = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+    INGEST_CHUNK_OVERLAP: int = int(os.getenv("INGEST_CHUNK_OVERLAP", "150"))
+    INGEST_EMBED_BATCH_SIZE: int = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+    INGEST_QUEUE_SIZE: int = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+    INGEST_PROGRESS_INTERVAL: float = float(os.getenv("INGEST_PROGRESS_INTERVAL", "2"))
+    # PDF/Word text extraction process pool
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+    EXTRACTION_TIMEOUT: float = float(os.getenv("EXTRACTION_TIMEOUT", "120"))
+    EXTRACTION_PAGES_PER_TASK: int = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "8"))
+    
+    # Redis settings (optional shared cache/queue backend)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+
+    # Job queue and workers ("redis" or "sqlite"; defaults to redis when REDIS_URL is set)
+    JOB_QUEUE_BACKEND: str = os.getenv("JOB_QUEUE_BACKEND", "")
+    JOB_QUEUE_SQLITE_PATH: str = os.getenv("JOB_QUEUE_SQLITE_PATH", ".cache/jobs.sqlite3")
+    JOB_VISIBILITY_TIMEOUT: float = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF: float = float(os.getenv("JOB_RETRY_BACKOFF", "10"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", "8"))
+
+    # Task status push (long-poll and WebSocket); shared through Redis when REDIS_URL is set
+    TASK_EVENTS_TTL: float = float(os.getenv("TASK_EVENTS_TTL", "3600"))
+    TASK_WAIT_MAX: float = float(os.getenv("TASK_WAIT_MAX", "60"))
+    TASK_WAIT_RECHECK_INTERVAL: float = float(os.getenv("TASK_WAIT_RECHECK_INTERVAL", "5"))
+
+    # Workspace membership cache
+    MEMBERSHIP_CACHE_TTL: float = float(os.getenv("MEMBERSHIP_CACHE_TTL", "60"))
+    MEMBERSHIP_CACHE_SIZE: int = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "10000"))
     
     # Storage bucket names
     # Note: Bucket names use hyphens while database references use underscores
     BUCKET_BRAND_ASSETS: str = "brand-assets"
     BUCKET_CONTENT_MEDIA: str = "content-media"
     BUCKET_KNOWLEDGE_FILES: str = "knowledge-files"
+    # Pooled HTTP client for streaming objects to and from Supabase Storage
+    STORAGE_TIMEOUT: float = float(os.getenv("STORAGE_TIMEOUT", "60"))
+    STORAGE_MAX_CONNECTIONS: int = int(os.getenv("STORAGE_MAX_CONNECTIONS", "20"))
     
     # Authentication
     CLERK_SECRET_KEY: str = os.getenv("CLERK_SECRET_KEY", "")
     CLERK_PUBLISHABLE_KEY: str = os.getenv("CLERK_PUBLISHABLE_KEY", "")
+    # Session token verification against Clerk's JWKS, on unless explicitly disabled (CLERK_JWKS_PATH serves keys from a file, for tests)
+    AUTH_VERIFY_SIGNATURE: bool = os.getenv("AUTH_VERIFY_SIGNATURE", "True").lower() in ("true", "1", "t")
+    CLERK_JWKS_URL: str = os.getenv("CLERK_JWKS_URL", "")
+    CLERK_JWKS_PATH: str = os.getenv("CLERK_JWKS_PATH", "")
+    CLERK_ISSUER: str = os.getenv("CLERK_ISSUER", "")
+    JWKS_CACHE_TTL: float = float(os.getenv("JWKS_CACHE_TTL", "3600"))
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
 
     # Stripe settings
     STRIPE_SECRET_KEY: str = os.getenv("STRIPE_SECRET_KEY", "")
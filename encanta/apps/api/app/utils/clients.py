@@ -0,0 +1,113 @@
+import asyncio
+import inspect
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+class ClientRegistry:
+    """Lazily created, shared clients for external services
+
+    Modules register a factory (plus optional close and health-check
+    callables) at import time, which is free; the client itself is only
+    built on the first get(). The app lifespan closes every warm client on
+    shutdown, and the readiness probe reports which ones are warm.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, Dict[str, Any]] = {}
+        self._clients: Dict[str, Any] = {}
+        self._init_ms: Dict[str, float] = {}
+        # Clients are also requested from worker threads (storage, ingestion);
+        # reentrant because some factories build on other clients
+        self._lock = threading.RLock()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        close: Optional[Callable[[Any], Any]] = None,
+        check: Optional[Callable[[Any], Any]] = None
+    ):
+        """Register a client factory
+
+        Args:
+            name: Client name, e.g. "openai"
+            factory: Builds the client; may return None when the service isn't configured
+            close: Releases the client; may be a coroutine function
+            check: Health check run by the readiness probe; may be a coroutine function.
+                The probe creates clients that have one, so their factory must not
+                provision anything (create indexes, start processes)
+        """
+        self._specs[name] = {"factory": factory, "close": close, "check": check}
+
+    def get(self, name: str) -> Any:
+        """Get a client, creating it on first use
+
+        A factory that raises is retried on the next call.
+        """
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                started_at = time.monotonic()
+                client = self._specs[name]["factory"]()
+                if client is not None:
+                    self._clients[name] = client
+                    self._init_ms[name] = round((time.monotonic() - started_at) * 1000, 1)
+            return client
+
+    def is_warm(self, name: str) -> bool:
+        return name in self._clients
+
+    async def close(self, name: str):
+        """Close a client if it has been created"""
+        with self._lock:
+            client = self._clients.pop(name, None)
+            self._init_ms.pop(name, None)
+
+        close = self._specs.get(name, {}).get("close")
+        if client is not None and close is not None:
+            result = close(client)
+            if inspect.isawaitable(result):
+                await result
+
+    async def close_all(self):
+        """Close every warm client, in reverse registration order"""
+        for name in reversed(list(self._specs)):
+            try:
+                await self.close(name)
+            except Exception as e:
+                print(f"Warning: Failed to close {name} client: {str(e)}")
+
+    async def check(self, name: str, timeout: float = 5) -> Dict[str, Any]:
+        """Create a client if needed and run its health check
+
+        Clients registered without a health check are left alone, never created.
+        """
+        check = self._specs[name]["check"]
+        if check is None:
+            return {"ok": True, "checked": False}
+
+        try:
+            client = await asyncio.to_thread(self.get, name)
+            if client is None:
+                return {"ok": True, "configured": False}
+            result = check(client)
+            if inspect.isawaitable(result):
+                await asyncio.wait_for(result, timeout=timeout)
+            return {"ok": True, "checked": True}
+        except Exception as e:
+            return {"ok": False, "error": str(e) or type(e).__name__}
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Which registered clients are warm, and how long each took to create"""
+        return {
+            name: {"warm": name in self._clients, "init_ms": self._init_ms.get(name)}
+            for name in self._specs
+        }
+
+# Shared registry used by every client module
+clients = ClientRegistry()
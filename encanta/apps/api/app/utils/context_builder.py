@@ -0,0 +1,81 @@
+import re
+from typing import List, Dict, Any
+from app.utils.tokens import count_tokens, truncate_to_tokens
+
+KNOWLEDGE_HEADER = "Relevant information from knowledge base:"
+
+# Don't bother including a truncated snippet shorter than this
+MIN_SNIPPET_TOKENS = 64
+
+TRUNCATION_MARKER = "\n[...truncated]"
+
+def rank_snippets(snippets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order knowledge snippets by retrieval score, dropping duplicates
+
+    Args:
+        snippets: Dicts with "text" and an optional "score"
+
+    Returns:
+        The distinct snippets, best first
+    """
+    seen = set()
+    ranked = []
+    for snippet in sorted(snippets, key=lambda s: s.get("score") or 0, reverse=True):
+        key = re.sub(r"\s+", " ", snippet["text"]).strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            ranked.append(snippet)
+    return ranked
+
+def fit_to_budget(text: str, max_tokens: int, model: str) -> str:
+    """Truncate text to a token budget, marking it if anything was cut"""
+    if not text or count_tokens(text, model) <= max_tokens:
+        return text or ""
+
+    marker_tokens = count_tokens(TRUNCATION_MARKER, model)
+    return truncate_to_tokens(text, max(max_tokens - marker_tokens, 0), model) + TRUNCATION_MARKER
+
+def pack_snippets(snippets: List[Dict[str, Any]], max_tokens: int, model: str) -> str:
+    """Pack ranked snippets into a knowledge section within a token budget
+
+    Snippets are added best first; the first one that doesn't fit is
+    truncated to the remaining budget (if that leaves a useful amount) and
+    the rest are dropped.
+    """
+    if not snippets or max_tokens <= 0:
+        return ""
+
+    section = f"{KNOWLEDGE_HEADER}\n\n"
+    remaining = max_tokens - count_tokens(section, model)
+    for i, snippet in enumerate(snippets):
+        entry = f"Document {i+1}:\n{snippet['text']}\n\n"
+        tokens = count_tokens(entry, model)
+        if tokens <= remaining:
+            section += entry
+            remaining -= tokens
+            continue
+
+        if remaining >= MIN_SNIPPET_TOKENS:
+            section += fit_to_budget(entry, remaining, model)
+        break
+
+    return section if section != f"{KNOWLEDGE_HEADER}\n\n" else ""
+
+def build_agent_context(brand_context: str, snippets: List[Dict[str, Any]], max_tokens: int, model: str) -> str:
+    """Assemble an agent's knowledge context within a token budget
+
+    Brand context is kept first in priority (up to half the budget) and
+    ranked knowledge snippets fill what is left.
+
+    Args:
+        brand_context: Brand guidelines text
+        snippets: Ranked knowledge snippets (see rank_snippets)
+        max_tokens: Token budget for the whole context
+        model: Model the context is for, used to pick the tokenizer
+
+    Returns:
+        The context text
+    """
+    brand_context = fit_to_budget(brand_context.strip(), max_tokens // 2, model)
+    knowledge_context = pack_snippets(snippets, max_tokens - count_tokens(brand_context, model), model)
+    return f"{knowledge_context}\n{brand_context}".strip()
@@ -0,0 +1,76 @@
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from typing import Dict, Optional, Union
+from app.core.config import settings
+from app.utils.clients import clients
+from app.utils.metrics import InstrumentedTransport
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client backed by a bounded, keep-alive connection pool"""
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=InstrumentedTransport(httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=settings.DB_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.DB_POOL_MAX_KEEPALIVE_CONNECTIONS
+                )
+            ))
+        )
+
+def get_rest_url() -> str:
+    """Get the PostgREST base URL
+
+    POSTGREST_URL points the API at a plain PostgREST server (e.g. a local
+    stand-in for tests); otherwise the Supabase REST endpoint is used.
+    """
+    if settings.POSTGREST_URL:
+        return settings.POSTGREST_URL.rstrip("/")
+    return f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1"
+
+def _create_db_client() -> PooledPostgrestClient:
+    headers = dict(DEFAULT_POSTGREST_CLIENT_HEADERS)
+    if settings.SUPABASE_KEY:
+        headers["apikey"] = settings.SUPABASE_KEY
+        headers["Authorization"] = f"Bearer {settings.SUPABASE_KEY}"
+
+    return PooledPostgrestClient(
+        get_rest_url(),
+        headers=headers,
+        timeout=settings.DB_TIMEOUT
+    )
+
+async def _check_db_client(client: PooledPostgrestClient):
+    # Any table will do; this only proves PostgREST answers with our credentials
+    await client.table("workspaces").select("id").limit(1).execute()
+
+clients.register("db", _create_db_client, close=lambda client: client.aclose(), check=_check_db_client)
+
+def get_db_client() -> PooledPostgrestClient:
+    """Get the shared async PostgREST client"""
+    return clients.get("db")
+
+async def close_db_client():
+    """Close the shared database client and its connection pool"""
+    await clients.close("db")
+
+class _Database:
+    """Module-level handle that resolves the shared client on each call"""
+
+    def table(self, table: str):
+        return get_db_client().table(table)
+
+    async def rpc(self, func: str, params: dict):
+        return await get_db_client().rpc(func, params)
+
+# Usage: `await db.table("content").select("*").eq("id", content_id).execute()`
+db = _Database()
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+def text_hash(text: str) -> str:
+    """Hash text for use as an embedding cache key"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model, sha256(text))
+
+    Embeddings are stored as packed float32 blobs in a local SQLite file, so
+    identical text is only ever embedded once per model. Calls are blocking;
+    run them in a worker thread from async code.
+    """
+
+    def __init__(self, path: str):
+        """Initialize the cache
+
+        Args:
+            path: Location of the SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, "
+            "text_hash TEXT NOT NULL, "
+            "embedding BLOB NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Look up cached embeddings
+
+        Args:
+            model: The embedding model name
+            hashes: Text hashes to look up
+
+        Returns:
+            Mapping of text hash to embedding for the hashes that were found
+        """
+        found = {}
+        # Stay well under SQLite's bound parameter limit
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" for _ in batch)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT text_hash, embedding FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+
+            for hash_, blob in rows:
+                found[hash_] = array("f", blob).tolist()
+
+        return found
+
+    def put_many(self, model: str, embeddings: Dict[str, List[float]]):
+        """Store embeddings keyed by text hash"""
+        rows = [
+            (model, hash_, array("f", embedding).tobytes())
+            for hash_, embedding in embeddings.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, embedding) VALUES (?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+# Shared cache, opened on first use
+_cache: Optional[EmbeddingCache] = None
+
+def get_embedding_cache(path: str) -> Optional[EmbeddingCache]:
+    """Get the shared embedding cache, or None if caching is disabled
+
+    Args:
+        path: Location of the SQLite file; an empty path disables the cache
+    """
+    global _cache
+
+    if not path:
+        return None
+
+    if _cache is None:
+        _cache = EmbeddingCache(path)
+
+    return _cache
@@ -0,0 +1,301 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from uuid import uuid4
+from app.core.config import settings
+from app.utils.clients import clients
+from app.utils.redis_client import get_redis
+
+class JobQueue:
+    """Interface for durable job queues
+
+    Jobs are dicts with id, type, payload, attempts and max_attempts. A
+    reserved job stays invisible to other workers until its visibility
+    timeout passes; if it is not acked by then it is handed out again. A job
+    that fails (or times out) max_attempts times is moved to the dead-letter
+    list. When a reservation on the last attempt times out (its worker died),
+    reserve() dead-letters the job and returns it once with dead=True so
+    the caller can clean up after it; it is not run again.
+    """
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> str:
+        raise NotImplementedError()
+
+    async def reserve(self, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError()
+
+    async def extend(self, job: Dict[str, Any], visibility_timeout: float):
+        raise NotImplementedError()
+
+    async def ack(self, job: Dict[str, Any]):
+        raise NotImplementedError()
+
+    async def fail(self, job: Dict[str, Any], error: str, retry_delay: float = 0):
+        raise NotImplementedError()
+
+    async def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        raise NotImplementedError()
+
+    async def close(self):
+        pass
+
+def _new_job(job_type: str, payload: Dict[str, Any], max_attempts: Optional[int]) -> Dict[str, Any]:
+    return {
+        "id": str(uuid4()),
+        "type": job_type,
+        "payload": payload,
+        "attempts": 0,
+        "max_attempts": max_attempts or settings.JOB_MAX_ATTEMPTS,
+        "error": None,
+        "created_at": time.time()
+    }
+
+# Pops a job, marks it in flight until ARGV[1] and counts the attempt.
+# Jobs already out of attempts go to the dead-letter list and are returned
+# flagged, so the caller can clean up after them.
+_RESERVE_SCRIPT = """
+while true do
+    local id = redis.call('RPOP', KEYS[1])
+    if not id then return nil end
+    local raw = redis.call('HGET', KEYS[3], id)
+    if raw then
+        local attempts = tonumber(redis.call('HGET', KEYS[5], id) or '0')
+        local max_attempts = tonumber(redis.call('HGET', KEYS[6], id) or '1')
+        if attempts >= max_attempts then
+            redis.call('LPUSH', KEYS[4], id)
+            return {raw, attempts, 1}
+        else
+            redis.call('HSET', KEYS[5], id, attempts + 1)
+            redis.call('ZADD', KEYS[2], ARGV[1], id)
+            return {raw, attempts + 1}
+        end
+    end
+end
+"""
+
+# Returns jobs whose visibility timeout has passed to the pending list
+_REQUEUE_SCRIPT = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('LPUSH', KEYS[1], id)
+end
+return #ids
+"""
+
+class RedisJobQueue(JobQueue):
+    """Job queue shared by every API and worker node through Redis"""
+
+    def __init__(self, redis, name: str = "jobs"):
+        self.redis = redis
+        prefix = f"encanta:queue:{name}"
+        self.pending_key = f"{prefix}:pending"
+        self.processing_key = f"{prefix}:processing"
+        self.jobs_key = f"{prefix}:jobs"
+        self.dead_key = f"{prefix}:dead"
+        self.attempts_key = f"{prefix}:attempts"
+        self.limits_key = f"{prefix}:max_attempts"
+        self._reserve = redis.register_script(_RESERVE_SCRIPT)
+        self._requeue = redis.register_script(_REQUEUE_SCRIPT)
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> str:
+        job = _new_job(job_type, payload, max_attempts)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.jobs_key, job["id"], json.dumps(job))
+            pipe.hset(self.limits_key, job["id"], job["max_attempts"])
+            pipe.lpush(self.pending_key, job["id"])
+            await pipe.execute()
+        return job["id"]
+
+    async def reserve(self, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        await self._requeue(keys=[self.pending_key, self.processing_key], args=[now])
+        result = await self._reserve(
+            keys=[self.pending_key, self.processing_key, self.jobs_key, self.dead_key, self.attempts_key, self.limits_key],
+            args=[now + visibility_timeout]
+        )
+        if not result:
+            return None
+
+        raw, attempts, *dead = result
+        job = {**json.loads(raw), "attempts": int(attempts)}
+        if dead:
+            job["dead"] = True
+        return job
+
+    async def extend(self, job: Dict[str, Any], visibility_timeout: float):
+        await self.redis.zadd(self.processing_key, {job["id"]: time.time() + visibility_timeout}, xx=True)
+
+    async def ack(self, job: Dict[str, Any]):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.processing_key, job["id"])
+            pipe.hdel(self.jobs_key, job["id"])
+            pipe.hdel(self.attempts_key, job["id"])
+            pipe.hdel(self.limits_key, job["id"])
+            await pipe.execute()
+
+    async def fail(self, job: Dict[str, Any], error: str, retry_delay: float = 0):
+        job = {**job, "error": error}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self.jobs_key, job["id"], json.dumps(job))
+            if job["attempts"] >= job["max_attempts"]:
+                pipe.zrem(self.processing_key, job["id"])
+                pipe.lpush(self.dead_key, job["id"])
+            else:
+                # Keep the job in flight until the delay passes; the requeue sweep then retries it
+                pipe.zadd(self.processing_key, {job["id"]: time.time() + retry_delay})
+            await pipe.execute()
+
+    async def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        ids = await self.redis.lrange(self.dead_key, 0, limit - 1)
+        if not ids:
+            return []
+        jobs = await self.redis.hmget(self.jobs_key, ids)
+        attempts = await self.redis.hmget(self.attempts_key, ids)
+        return [
+            {**json.loads(job), "attempts": int(count or 0)}
+            for job, count in zip(jobs, attempts) if job
+        ]
+
+class SQLiteJobQueue(JobQueue):
+    """Single-node job queue in a SQLite file, or in memory for tests
+
+    A job row is reservable while its status is pending or processing and
+    visible_at has passed, so expired reservations are retried automatically.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, "
+            "job TEXT NOT NULL, "
+            "status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "max_attempts INTEGER NOT NULL, "
+            "visible_at REAL NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, visible_at)")
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _enqueue(self, job: Dict[str, Any]):
+        self._execute(
+            "INSERT INTO jobs (id, job, status, attempts, max_attempts, visible_at, created_at) VALUES (?, ?, 'pending', 0, ?, ?, ?)",
+            (job["id"], json.dumps(job), job["max_attempts"], job["created_at"], job["created_at"])
+        )
+
+    def _reserve(self, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A reservation that ran out of attempts is dead-lettered and handed back flagged
+                row = self._conn.execute(
+                    "SELECT id, job, attempts FROM jobs WHERE status = 'processing' AND visible_at <= ? AND attempts >= max_attempts "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE jobs SET status = 'dead' WHERE id = ?", (row[0],))
+                    self._conn.execute("COMMIT")
+                    return {**json.loads(row[1]), "attempts": row[2], "dead": True}
+
+                row = self._conn.execute(
+                    "SELECT id, job, attempts FROM jobs WHERE status IN ('pending', 'processing') AND visible_at <= ? "
+                    "ORDER BY created_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                job = {**json.loads(row[1]), "attempts": row[2] + 1}
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'processing', attempts = ?, visible_at = ?, job = ? WHERE id = ?",
+                    (job["attempts"], now + visibility_timeout, json.dumps(job), job["id"])
+                )
+                self._conn.execute("COMMIT")
+                return job
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _fail(self, job: Dict[str, Any], error: str, retry_delay: float):
+        job = {**job, "error": error}
+        status = "dead" if job["attempts"] >= job["max_attempts"] else "pending"
+        self._execute(
+            "UPDATE jobs SET status = ?, visible_at = ?, job = ? WHERE id = ?",
+            (status, time.time() + retry_delay, json.dumps(job), job["id"])
+        )
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> str:
+        job = _new_job(job_type, payload, max_attempts)
+        await asyncio.to_thread(self._enqueue, job)
+        return job["id"]
+
+    async def reserve(self, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._reserve, visibility_timeout)
+
+    async def extend(self, job: Dict[str, Any], visibility_timeout: float):
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE jobs SET visible_at = ? WHERE id = ? AND status = 'processing'",
+            (time.time() + visibility_timeout, job["id"])
+        )
+
+    async def ack(self, job: Dict[str, Any]):
+        await asyncio.to_thread(self._execute, "DELETE FROM jobs WHERE id = ?", (job["id"],))
+
+    async def fail(self, job: Dict[str, Any], error: str, retry_delay: float = 0):
+        await asyncio.to_thread(self._fail, job, error, retry_delay)
+
+    async def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT job FROM jobs WHERE status = 'dead' ORDER BY created_at LIMIT ?",
+            (limit,)
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+def _create_job_queue() -> JobQueue:
+    backend = settings.JOB_QUEUE_BACKEND or ("redis" if settings.REDIS_URL else "sqlite")
+    if backend == "redis":
+        redis = get_redis()
+        if redis is None:
+            raise ValueError("The redis job queue backend requires REDIS_URL")
+        return RedisJobQueue(redis)
+    if backend == "sqlite":
+        return SQLiteJobQueue(settings.JOB_QUEUE_SQLITE_PATH)
+    raise ValueError(f"Unknown job queue backend: {backend}")
+
+clients.register("job_queue", _create_job_queue, close=lambda queue: queue.close())
+
+def get_job_queue() -> JobQueue:
+    """Get the configured job queue
+
+    JOB_QUEUE_BACKEND selects "redis" or "sqlite"; when unset, Redis is used
+    if REDIS_URL is configured and a local SQLite file otherwise.
+    """
+    return clients.get("job_queue")
+
+async def close_job_queue():
+    """Close the shared job queue"""
+    await clients.close("job_queue")
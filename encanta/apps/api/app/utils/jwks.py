@@ -0,0 +1,107 @@
+import asyncio
+import json
+import time
+import httpx
+from typing import Dict, Any, Optional
+from app.core.config import settings
+from app.utils.clients import clients
+
+clients.register(
+    "jwks_http",
+    lambda: httpx.AsyncClient(timeout=10, limits=httpx.Limits(max_connections=4)),
+    close=lambda client: client.aclose()
+)
+
+class JWKSUnavailable(Exception):
+    """Raised when no signing keys have ever been loaded and the JWKS can't be fetched"""
+
+class JWKSCache:
+    """Signing keys from a JSON Web Key Set, fetched once and kept in memory
+
+    Keys are refreshed when the cache is older than ttl, or when a token
+    names a key ID we don't have (the issuer rotated its keys). Refreshes
+    triggered by unknown key IDs are rate-limited so garbage tokens can't
+    hammer the JWKS endpoint, and concurrent refreshes are collapsed into
+    one request. A failed refresh keeps the keys already loaded, and retries
+    wait at least min_refresh_interval.
+    """
+
+    def __init__(self, url: str = "", path: str = "", ttl: float = 3600, min_refresh_interval: float = 30):
+        """Initialize the cache
+
+        Args:
+            url: JWKS endpoint, e.g. https://<clerk-frontend-api>/.well-known/jwks.json
+            path: Local JWKS file, used instead of the URL when set (for tests)
+            ttl: Seconds before keys are refetched
+            min_refresh_interval: Minimum seconds between refreshes for unknown key IDs, and after a failed fetch
+        """
+        self.url = url
+        self.path = path
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at = 0.0
+        self._failed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _fetch(self) -> Dict[str, Any]:
+        if self.path:
+            with open(self.path) as f:
+                return json.load(f)
+
+        if not self.url:
+            raise ValueError("No JWKS source configured; set CLERK_JWKS_URL or CLERK_JWKS_PATH")
+
+        response = await clients.get("jwks_http").get(self.url)
+        response.raise_for_status()
+        return response.json()
+
+    def _recently_attempted(self) -> bool:
+        last_attempt = max(self._fetched_at, self._failed_at)
+        return bool(last_attempt) and time.monotonic() - last_attempt < self.min_refresh_interval
+
+    async def refresh(self):
+        """Refetch the key set unless another caller just tried
+
+        Raises:
+            JWKSUnavailable: If the fetch failed and no keys were ever loaded
+        """
+        attempted_at = (self._fetched_at, self._failed_at)
+        async with self._lock:
+            # Someone else refreshed (or failed to) while we waited for the lock
+            if (self._fetched_at, self._failed_at) != attempted_at or self._recently_attempted():
+                if not self._keys:
+                    raise JWKSUnavailable("JWKS fetch failed recently")
+                return
+
+            try:
+                jwks = await self._fetch()
+                keys = {key["kid"]: key for key in jwks.get("keys", []) if "kid" in key}
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                print(f"Warning: Failed to refresh JWKS: {str(e)}")
+                if not self._keys:
+                    raise JWKSUnavailable(str(e))
+                return
+
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+
+    async def get_key(self, kid: str) -> Optional[Dict[str, Any]]:
+        """Get the JWK for a key ID, refreshing the set if it is stale or the ID is unknown
+
+        Raises:
+            JWKSUnavailable: If no keys are loaded and the JWKS can't be fetched
+        """
+        stale = not self._fetched_at or time.monotonic() - self._fetched_at > self.ttl
+        if stale or kid not in self._keys:
+            await self.refresh()
+
+        return self._keys.get(kid)
+
+# Shared cache, configured from settings
+jwks_cache = JWKSCache(
+    url=settings.CLERK_JWKS_URL,
+    path=settings.CLERK_JWKS_PATH,
+    ttl=settings.JWKS_CACHE_TTL
+)
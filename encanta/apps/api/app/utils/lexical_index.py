@@ -0,0 +1,173 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional
+from app.core.config import settings
+from app.utils.clients import clients
+from app.utils.local_vector_store import _matches_filter, _workspace_from_filter
+
+# Longest query, in terms, sent to the full-text index
+MAX_QUERY_TERMS = 32
+
+def build_match_query(query: str) -> str:
+    """Turn free text into an FTS5 query matching any of its words
+
+    Each whitespace-separated word becomes a quoted phrase, so punctuated
+    identifiers like SKU-1234 or v2.1 match as an exact token sequence and
+    FTS5 operators in user text are never interpreted.
+    """
+    words = [word for word in query.split() if re.search(r"\w", word)][:MAX_QUERY_TERMS]
+    return " OR ".join('"' + word.replace('"', '""') + '"' for word in words)
+
+class WorkspaceLexicalIndex:
+    """BM25 full-text index of one workspace's chunks in a SQLite FTS5 file
+
+    Keeping one file per workspace gives each workspace its own term
+    statistics, and queries never touch other workspaces' postings.
+    """
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5("
+            "text, metadata UNINDEXED, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        # FTS5 can't index its UNINDEXED columns, so vector IDs map to rowids here
+        self.conn.execute("CREATE TABLE IF NOT EXISTS chunk_ids (id TEXT PRIMARY KEY, chunk_rowid INTEGER NOT NULL)")
+        self.conn.commit()
+
+    def _delete(self, ids: List[str]):
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" for _ in batch)
+            rowids = [row[0] for row in self.conn.execute(
+                f"SELECT chunk_rowid FROM chunk_ids WHERE id IN ({placeholders})", batch
+            )]
+            if rowids:
+                self.conn.execute(f"DELETE FROM chunks WHERE rowid IN ({','.join('?' for _ in rowids)})", rowids)
+            self.conn.execute(f"DELETE FROM chunk_ids WHERE id IN ({placeholders})", batch)
+
+    def upsert(self, records: List[Dict[str, Any]]):
+        """Index {"id", "text", "metadata"} records, replacing any with the same ID"""
+        with self.lock:
+            self._delete([record["id"] for record in records])
+            for record in records:
+                cursor = self.conn.execute(
+                    "INSERT INTO chunks (text, metadata) VALUES (?, ?)",
+                    (record["text"], json.dumps(record["metadata"]))
+                )
+                self.conn.execute("INSERT INTO chunk_ids (id, chunk_rowid) VALUES (?, ?)", (record["id"], cursor.lastrowid))
+            self.conn.commit()
+
+    def delete(self, ids: List[str]):
+        with self.lock:
+            self._delete(ids)
+            self.conn.commit()
+
+    def search(self, query: str, top_k: int, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Rank chunks by BM25 against the query's words
+
+        Returns:
+            {"id", "score", "metadata"} matches, best first; higher scores are better
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        # Overfetch when a filter beyond the workspace has to be applied afterwards
+        limit = top_k * 4 if filter else top_k
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT chunk_ids.id, bm25(chunks), chunks.metadata FROM chunks "
+                "JOIN chunk_ids ON chunk_ids.chunk_rowid = chunks.rowid "
+                "WHERE chunks MATCH ? ORDER BY bm25(chunks) LIMIT ?",
+                (match, limit)
+            ).fetchall()
+
+        matches = []
+        for id_, rank, metadata in rows:
+            metadata = json.loads(metadata)
+            if _matches_filter(metadata, filter):
+                # FTS5 reports BM25 negated so that ascending order is best first
+                matches.append({"id": id_, "score": -rank, "metadata": metadata})
+        return matches[:top_k]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class LexicalIndex:
+    """Per-workspace BM25 indexes kept alongside the vector store
+
+    Records are partitioned by their metadata workspace_id. Calls are
+    blocking; run them in a worker thread from async code.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._indexes: Dict[str, WorkspaceLexicalIndex] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _index(self, workspace_id: str) -> WorkspaceLexicalIndex:
+        with self._lock:
+            if workspace_id not in self._indexes:
+                self._indexes[workspace_id] = WorkspaceLexicalIndex(os.path.join(self.path, f"{workspace_id}.sqlite3"))
+            return self._indexes[workspace_id]
+
+    def _workspaces(self) -> List[str]:
+        return [name[:-len(".sqlite3")] for name in os.listdir(self.path) if name.endswith(".sqlite3")]
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        """Index vector records by the text preview in their metadata"""
+        by_workspace: Dict[str, List[Dict[str, Any]]] = {}
+        for vector in vectors:
+            metadata = vector.get("metadata") or {}
+            if metadata.get("workspace_id") and metadata.get("text"):
+                by_workspace.setdefault(str(metadata["workspace_id"]), []).append(
+                    {"id": vector["id"], "text": metadata["text"], "metadata": metadata}
+                )
+
+        for workspace_id, records in by_workspace.items():
+            self._index(workspace_id).upsert(records)
+
+    def delete(self, ids: List[str], workspace_id: Optional[str] = None):
+        workspaces = [str(workspace_id)] if workspace_id else self._workspaces()
+        for workspace in workspaces:
+            self._index(workspace).delete(ids)
+
+    def search(self, query: str, top_k: int, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        workspace_id = _workspace_from_filter(filter)
+        if workspace_id:
+            filter = {key: value for key, value in filter.items() if key != "workspace_id"}
+            if not os.path.exists(os.path.join(self.path, f"{workspace_id}.sqlite3")):
+                return []
+            return self._index(workspace_id).search(query, top_k, filter)
+
+        # BM25 scores from different workspaces aren't strictly comparable, but close enough to merge
+        matches = []
+        for workspace in self._workspaces():
+            matches.extend(self._index(workspace).search(query, top_k, filter))
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        return matches[:top_k]
+
+    def close(self):
+        with self._lock:
+            for index in self._indexes.values():
+                index.close()
+            self._indexes.clear()
+
+def _create_lexical_index() -> Optional[LexicalIndex]:
+    if not settings.LEXICAL_INDEX_ENABLED:
+        return None
+    return LexicalIndex(settings.LEXICAL_INDEX_PATH)
+
+clients.register("lexical_index", _create_lexical_index, close=lambda index: index.close())
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    """Get the shared lexical index, or None if it is disabled"""
+    return clients.get("lexical_index")
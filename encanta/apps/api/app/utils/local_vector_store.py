@@ -0,0 +1,503 @@
+import asyncio
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+# Row changes kept in each index's change log; a process further behind reloads in full
+CHANGE_LOG_SIZE = 100000
+
+def _matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone-style metadata filter ($eq, $ne, $in, $nin or a plain value)"""
+    if not filter:
+        return True
+
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            for op, expected in condition.items():
+                if op == "$eq" and value != expected:
+                    return False
+                if op == "$ne" and value == expected:
+                    return False
+                if op == "$in" and value not in expected:
+                    return False
+                if op == "$nin" and value in expected:
+                    return False
+        elif value != condition:
+            return False
+
+    return True
+
+def _workspace_from_filter(filter: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Extract an exact workspace_id from a filter, if it pins one"""
+    if not filter or "workspace_id" not in filter:
+        return None
+
+    condition = filter["workspace_id"]
+    if isinstance(condition, dict):
+        condition = condition.get("$eq")
+    return str(condition) if condition is not None else None
+
+class WorkspaceVectorIndex:
+    """Memory-mapped vector index for a single workspace
+
+    Vectors are L2-normalized on insert so cosine similarity is a dot product.
+    They are stored as float32, or as int8 with a per-row float32 scale when
+    quantized. Large indexes are searched through an inverted-file (IVF)
+    partition built lazily with k-means; small ones are scanned exhaustively.
+    Record IDs and metadata live in a SQLite table keyed by row, written
+    per batch; state.json only holds the header.
+
+    API and worker processes on the same node share the files. Writes hold
+    an exclusive file lock and reads a shared one, and every write appends
+    the rows it touched to a change log, so each process catches up on
+    other processes' writes (rather than reloading) before it reads or
+    allocates rows.
+    """
+
+    def __init__(self, directory: str, quantize: bool = False, ivf_threshold: int = 20000, nprobe: int = 8):
+        self.directory = directory
+        self.quantize = quantize
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.lock = threading.Lock()
+
+        self.dimension = 0
+        self.count = 0
+        self.capacity = 0
+        self.records: List[Optional[Dict[str, Any]]] = []
+        self.positions: Dict[str, int] = {}
+        self.free: List[int] = []
+        self.vectors = None
+        self.scales = None
+        self.alive = np.zeros(0, dtype=bool)
+
+        # IVF cluster of each row (-1: unassigned), and writes since the last k-means build
+        self.centroids = None
+        self.clusters = np.zeros(0, dtype=np.int32)
+        self.ivf_count = 0
+        self.mutations = 0
+        # (dimension, count, capacity) last written to state.json
+        self._saved_header = None
+        # Last change log entry applied to the in-memory state
+        self._seq = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(self._path("records.sqlite3"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS records (position INTEGER PRIMARY KEY, id TEXT NOT NULL, metadata TEXT NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, position INTEGER NOT NULL)")
+        self.db.commit()
+        self._lock_file = open(self._path("index.lock"), "a")
+        with self.lock, self._file_lock(exclusive=True):
+            self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Hold the lock shared with other processes using this index"""
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Lock the index against other threads and processes, with its state brought up to date"""
+        with self.lock, self._file_lock(exclusive):
+            self._refresh()
+            yield
+
+    def _last_seq(self) -> int:
+        return self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def _read_header(self) -> Dict[str, Any]:
+        with open(self._path("state.json")) as f:
+            return json.load(f)
+
+    def _load(self):
+        """Load state and map existing vector files, replacing anything held in memory"""
+        self._seq = self._last_seq()
+        self.records = []
+        self.positions = {}
+        self.free = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.centroids = None
+        self.clusters = np.zeros(0, dtype=np.int32)
+        self.ivf_count = 0
+        self.mutations = 0
+        if not os.path.exists(self._path("state.json")):
+            return
+
+        state = self._read_header()
+
+        self.dimension = state["dimension"]
+        self.count = state["count"]
+        self.quantize = state["quantize"]
+
+        if "records" in state:
+            # Older indexes kept every record in state.json; move them to SQLite once
+            self._write_records({i: record for i, record in enumerate(state["records"])})
+            self._write_header(state["capacity"])
+
+        self.records = [None] * self.count
+        for position, id_, metadata in self.db.execute("SELECT position, id, metadata FROM records WHERE position < ?", (self.count,)):
+            self.records[position] = {"id": id_, "metadata": json.loads(metadata)}
+        self.free = [i for i, record in enumerate(self.records) if record is None]
+        self.positions = {record["id"]: i for i, record in enumerate(self.records) if record is not None}
+        self._map(max(state["capacity"], 1))
+        self.alive[list(self.positions.values())] = True
+        self._saved_header = (self.dimension, self.count, self.capacity)
+
+    def _refresh(self):
+        """Apply the writes other processes made since this one last looked"""
+        seq = self._last_seq()
+        if seq == self._seq:
+            return
+
+        oldest = self.db.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+        if not self.dimension or oldest > self._seq + 1:
+            # Nothing loaded yet, or the log no longer reaches back far enough
+            self._load()
+            return
+
+        positions = [row[0] for row in self.db.execute(
+            "SELECT DISTINCT position FROM changes WHERE seq > ?", (self._seq,)
+        )]
+        state = self._read_header()
+        if state["capacity"] > self.capacity:
+            self._map(state["capacity"])
+        self.records.extend([None] * (state["count"] - self.count))
+        self.count = state["count"]
+
+        fetched = {}
+        for start in range(0, len(positions), 500):
+            batch = positions[start:start + 500]
+            for position, id_, metadata in self.db.execute(
+                f"SELECT position, id, metadata FROM records WHERE position IN ({','.join('?' for _ in batch)})", batch
+            ):
+                fetched[position] = {"id": id_, "metadata": json.loads(metadata)}
+
+        for position in positions:
+            previous = self.records[position]
+            # The ID may already have been moved to a row applied earlier
+            if previous is not None and self.positions.get(previous["id"]) == position:
+                del self.positions[previous["id"]]
+            record = fetched.get(position)
+            self.records[position] = record
+            self.alive[position] = record is not None
+            self.clusters[position] = -1
+            if record is not None:
+                self.positions[record["id"]] = position
+        self.free = [i for i, record in enumerate(self.records) if record is None]
+
+        if self.centroids is not None and fetched:
+            rows = np.fromiter(fetched, dtype=np.int64, count=len(fetched))
+            self.clusters[rows] = np.argmax(self._rows(rows) @ self.centroids.T, axis=1)
+        self.mutations += len(positions)
+        self._saved_header = (self.dimension, self.count, self.capacity)
+        self._seq = seq
+
+    def _write_records(self, changed: Dict[int, Optional[Dict[str, Any]]]):
+        """Write the records at the given rows (None deletes) and log them, in one transaction"""
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO records (position, id, metadata) VALUES (?, ?, ?)",
+                [(position, record["id"], json.dumps(record["metadata"])) for position, record in changed.items() if record is not None]
+            )
+            self.db.executemany(
+                "DELETE FROM records WHERE position = ?",
+                [(position,) for position, record in changed.items() if record is None]
+            )
+            self.db.executemany("INSERT INTO changes (position) VALUES (?)", [(position,) for position in changed])
+            self.db.execute("DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?", (CHANGE_LOG_SIZE,))
+        # Writers hold the exclusive lock, so the log holds nothing this process hasn't applied
+        self._seq = self._last_seq()
+
+    def _write_header(self, capacity: int):
+        """Atomically rewrite the small state file"""
+        state = {
+            "dimension": self.dimension,
+            "count": self.count,
+            "capacity": capacity,
+            "quantize": self.quantize
+        }
+        tmp_path = self._path("state.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self._path("state.json"))
+
+    def _save(self, changed: Dict[int, Optional[Dict[str, Any]]]):
+        """Flush vectors, then persist only the changed records (and the header if it moved)"""
+        self.vectors.flush()
+        if self.scales is not None:
+            self.scales.flush()
+
+        # Header first: rows it covers without a record are just free
+        header = (self.dimension, self.count, self.capacity)
+        if header != self._saved_header:
+            self._write_header(self.capacity)
+            self._saved_header = header
+        self._write_records(changed)
+
+    def _map(self, capacity: int):
+        """(Re)map the vector files with room for capacity rows"""
+        dtype = np.int8 if self.quantize else np.float32
+        vector_path = self._path("vectors.i8" if self.quantize else "vectors.f32")
+
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        self._resize_file(vector_path, capacity * self.dimension * np.dtype(dtype).itemsize)
+        self.vectors = np.memmap(vector_path, dtype=dtype, mode="r+", shape=(capacity, self.dimension))
+
+        if self.quantize:
+            if self.scales is not None:
+                self.scales.flush()
+                del self.scales
+            self._resize_file(self._path("scales.f32"), capacity * 4)
+            self.scales = np.memmap(self._path("scales.f32"), dtype=np.float32, mode="r+", shape=(capacity,))
+
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive[:capacity]
+        self.alive = alive
+        clusters = np.full(capacity, -1, dtype=np.int32)
+        clusters[:len(self.clusters)] = self.clusters[:capacity]
+        self.clusters = clusters
+        self.capacity = capacity
+
+    @staticmethod
+    def _resize_file(path: str, size: int):
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+
+    def _allocate(self) -> int:
+        """Get a free row, growing the files geometrically when full"""
+        if self.free:
+            return self.free.pop()
+
+        if self.count >= self.capacity:
+            self._map(max(self.capacity * 2, 1024))
+
+        self.count += 1
+        self.records.append(None)
+        return self.count - 1
+
+    def upsert(self, vectors: List[Dict[str, Any]]):
+        """Insert or replace vectors given as {"id", "values", "metadata"} dicts"""
+        with self._locked(exclusive=True):
+            if not self.dimension:
+                self.dimension = len(vectors[0]["values"])
+                self._map(1024)
+
+            values = np.asarray([vector["values"] for vector in vectors], dtype=np.float32)
+            norms = np.linalg.norm(values, axis=1, keepdims=True)
+            values = values / np.maximum(norms, 1e-12)
+
+            changed = {}
+            for vector, row in zip(vectors, values):
+                position = self.positions.get(vector["id"])
+                if position is None:
+                    position = self._allocate()
+                    self.positions[vector["id"]] = position
+                changed[position] = None
+
+                if self.quantize:
+                    scale = max(float(np.abs(row).max()) / 127.0, 1e-12)
+                    self.vectors[position] = np.round(row / scale).astype(np.int8)
+                    self.scales[position] = scale
+                else:
+                    self.vectors[position] = row
+
+                self.records[position] = {"id": vector["id"], "metadata": vector.get("metadata", {})}
+                self.alive[position] = True
+                changed[position] = self.records[position]
+
+            # New and rewritten rows join their nearest cluster straight away
+            if self.centroids is not None:
+                positions = np.fromiter(changed, dtype=np.int64, count=len(changed))
+                self.clusters[positions] = np.argmax(self._rows(positions) @ self.centroids.T, axis=1)
+            self.mutations += len(changed)
+
+            self._save(changed)
+
+    def delete(self, ids: List[str]):
+        """Remove vectors by ID"""
+        with self._locked(exclusive=True):
+            changed = {}
+            for id_ in ids:
+                position = self.positions.pop(id_, None)
+                if position is not None:
+                    self.records[position] = None
+                    self.alive[position] = False
+                    self.clusters[position] = -1
+                    self.free.append(position)
+                    changed[position] = None
+            self.mutations += len(changed)
+
+            if self.vectors is not None and changed:
+                self._save(changed)
+
+    def _rows(self, rows) -> np.ndarray:
+        """Dequantize the given rows into float32"""
+        if self.quantize:
+            return self.vectors[rows].astype(np.float32) * self.scales[rows, None]
+        return self.vectors[rows]
+
+    def _score(self, rows, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of the query against the given rows"""
+        if self.quantize:
+            # Scale after the product to avoid dequantizing the whole block
+            return (self.vectors[rows] @ query) * self.scales[rows]
+        return self.vectors[rows] @ query
+
+    def _build_ivf(self):
+        """Partition live rows into k-means clusters for approximate search"""
+        live = np.flatnonzero(self.alive[:self.count])
+        data = self._rows(live)
+        nlist = max(int(np.sqrt(len(live))), 1)
+
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(len(live), nlist, replace=False)]
+        sample = data[rng.choice(len(live), min(len(live), nlist * 64), replace=False)]
+        for _ in range(10):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignment == c]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        self.centroids = centroids
+        self.clusters[:] = -1
+        self.clusters[live] = np.argmax(data @ centroids.T, axis=1)
+        self.ivf_count = len(live)
+        self.mutations = 0
+
+    def _search(self, query: np.ndarray):
+        """Score candidate rows: a full scan for small indexes, the nearest IVF lists otherwise"""
+        live_count = len(self.positions)
+        if live_count < self.ivf_threshold:
+            rows = np.flatnonzero(self.alive[:self.count])
+            scores = self._score(slice(0, self.count), query)[rows]
+            return rows, scores
+
+        # Rows written since the build are already assigned, but the centroids
+        # go stale; rebuild once writes reach 20% of the indexed rows
+        if self.centroids is None or self.mutations > 0.2 * self.ivf_count:
+            self._build_ivf()
+
+        nearest = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        # Deleted rows are unassigned, so only live rows match
+        rows = np.flatnonzero(np.isin(self.clusters[:self.count], nearest))
+        return rows, self._score(rows, query)
+
+    def query(self, vector: List[float], top_k: int, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return the top_k most similar vectors as {"id", "score", "metadata"} dicts"""
+        with self._locked(exclusive=False):
+            if not self.positions:
+                return []
+
+            query = np.asarray(vector, dtype=np.float32)
+            query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+            rows, scores = self._search(query)
+            if filter:
+                keep = np.fromiter(
+                    (_matches_filter(self.records[row]["metadata"], filter) for row in rows),
+                    dtype=bool,
+                    count=len(rows)
+                )
+                rows, scores = rows[keep], scores[keep]
+            if not len(rows):
+                return []
+
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            return [
+                {
+                    "id": self.records[rows[i]]["id"],
+                    "score": float(scores[i]),
+                    "metadata": self.records[rows[i]]["metadata"]
+                }
+                for i in top
+            ]
+
+class LocalVectorStore:
+    """Vector store backed by per-workspace memory-mapped NumPy indexes
+
+    Vectors are partitioned by their metadata workspace_id, so a query that
+    filters on a workspace only ever touches that workspace's files. Every
+    process on the node opening the same path sees the others' writes.
+    """
+
+    def __init__(self, path: str, quantize: bool = False, ivf_threshold: int = 20000, nprobe: int = 8):
+        self.path = path
+        self.quantize = quantize
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._indexes: Dict[str, WorkspaceVectorIndex] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _index(self, workspace_id: str) -> WorkspaceVectorIndex:
+        with self._lock:
+            if workspace_id not in self._indexes:
+                self._indexes[workspace_id] = WorkspaceVectorIndex(
+                    os.path.join(self.path, workspace_id),
+                    quantize=self.quantize,
+                    ivf_threshold=self.ivf_threshold,
+                    nprobe=self.nprobe
+                )
+            return self._indexes[workspace_id]
+
+    def _workspaces(self) -> List[str]:
+        return [name for name in os.listdir(self.path) if os.path.isdir(os.path.join(self.path, name))]
+
+    def _upsert(self, vectors: List[Dict[str, Any]]):
+        by_workspace: Dict[str, List[Dict[str, Any]]] = {}
+        for vector in vectors:
+            workspace_id = str(vector.get("metadata", {}).get("workspace_id", "_default"))
+            by_workspace.setdefault(workspace_id, []).append(vector)
+
+        for workspace_id, workspace_vectors in by_workspace.items():
+            self._index(workspace_id).upsert(workspace_vectors)
+
+    def _query(self, vector: List[float], top_k: int, filter: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        workspace_id = _workspace_from_filter(filter)
+        workspaces = [workspace_id] if workspace_id else self._workspaces()
+        if workspace_id:
+            # The partition already applies the workspace condition
+            filter = {key: value for key, value in filter.items() if key != "workspace_id"}
+
+        matches = []
+        for workspace in workspaces:
+            matches.extend(self._index(workspace).query(vector, top_k, filter))
+
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        return matches[:top_k]
+
+    def _delete(self, ids: List[str], workspace_id: Optional[str]):
+        workspaces = [str(workspace_id)] if workspace_id else self._workspaces()
+        for workspace in workspaces:
+            self._index(workspace).delete(ids)
+
+    async def upsert(self, vectors: List[Dict[str, Any]]):
+        await asyncio.to_thread(self._upsert, vectors)
+
+    async def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._query, vector, top_k, filter)
+
+    async def delete(self, ids: List[str], workspace_id: Optional[str] = None):
+        await asyncio.to_thread(self._delete, ids, workspace_id)
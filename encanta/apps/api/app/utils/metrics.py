@@ -0,0 +1,164 @@
+import httpx
+import os
+import time
+from typing import Dict, Any
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+
+# Latency buckets (seconds) for fast backend calls and for slow LLM calls
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SLOW_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "encanta_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=FAST_BUCKETS + (30, 60, 120)
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("encanta_http_requests_in_flight", "HTTP requests being served")
+
+WORKFLOW_STEP_DURATION = Histogram(
+    "encanta_workflow_step_duration_seconds",
+    "Workflow step latency",
+    ["workflow", "step", "outcome"],
+    buckets=SLOW_BUCKETS
+)
+WORKFLOW_STEPS_IN_FLIGHT = Gauge("encanta_workflow_steps_in_flight", "Workflow steps running", ["step"])
+
+AGENT_REQUEST_DURATION = Histogram(
+    "encanta_agent_request_duration_seconds",
+    "Chat completion latency per agent (cache hits excluded)",
+    ["agent", "model"],
+    buckets=SLOW_BUCKETS
+)
+AGENT_REQUESTS_IN_FLIGHT = Gauge("encanta_agent_requests_in_flight", "Chat completions in flight", ["model"])
+LLM_TOKENS = Counter("encanta_llm_tokens_total", "Tokens reported by the model provider", ["model", "type"])
+
+EMBEDDING_REQUEST_DURATION = Histogram(
+    "encanta_embedding_request_duration_seconds",
+    "Embedding request latency (one provider request per batch)",
+    ["model"],
+    buckets=FAST_BUCKETS
+)
+VECTOR_OPERATION_DURATION = Histogram(
+    "encanta_vector_operation_duration_seconds",
+    "Vector store operation latency",
+    ["backend", "operation"],
+    buckets=FAST_BUCKETS
+)
+RETRIEVAL_LEG_DURATION = Histogram(
+    "encanta_retrieval_leg_duration_seconds",
+    "Knowledge retrieval latency per leg (vector includes the query embedding unless it was batched into the embedding leg)",
+    ["mode", "leg"],
+    buckets=FAST_BUCKETS
+)
+RETRIEVAL_CACHE_REQUESTS = Counter(
+    "encanta_retrieval_cache_requests_total",
+    "Knowledge retrieval cache lookups",
+    ["result"]
+)
+
+DB_OPERATION_DURATION = Histogram(
+    "encanta_db_operation_duration_seconds",
+    "PostgREST request latency by table and operation",
+    ["table", "operation", "status"],
+    buckets=FAST_BUCKETS
+)
+DB_REQUESTS_IN_FLIGHT = Gauge("encanta_db_requests_in_flight", "PostgREST requests in flight")
+
+# HTTP method -> PostgREST operation
+DB_OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "PUT": "upsert", "DELETE": "delete"}
+
+def record_tokens(model: str, usage: Dict[str, Any]):
+    """Count provider-reported prompt, cached and completion tokens"""
+    for key in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+        if usage.get(key):
+            LLM_TOKENS.labels(model, key[:-len("_tokens")]).inc(usage[key])
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper timing PostgREST requests by table and operation
+
+    Timing stops when response headers arrive, which for PostgREST's small
+    JSON bodies is nearly the whole request.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # Paths look like /rest/v1/<table> or /rest/v1/rpc/<function>
+        parts = request.url.path.rstrip("/").rsplit("/", 2)
+        if len(parts) == 3 and parts[1] == "rpc":
+            table, operation = parts[2], "rpc"
+        else:
+            table, operation = parts[-1], DB_OPERATIONS.get(request.method, request.method.lower())
+
+        started_at = time.perf_counter()
+        status = "error"
+        DB_REQUESTS_IN_FLIGHT.inc()
+        try:
+            response = await self.transport.handle_async_request(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            DB_REQUESTS_IN_FLIGHT.dec()
+            DB_OPERATION_DURATION.labels(table, operation, status).observe(time.perf_counter() - started_at)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route template
+
+    Plain ASGI rather than BaseHTTPMiddleware so streaming responses pass
+    through untouched and are timed until their last byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            # The router stores the matched route; unmatched paths share one label
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status)
+            ).observe(time.perf_counter() - started_at)
+
+def render_metrics():
+    """Render all metrics in the Prometheus text format
+
+    With PROMETHEUS_MULTIPROC_DIR set (several uvicorn/gunicorn workers),
+    samples from every worker process are aggregated.
+
+    Returns:
+        (body, content type)
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
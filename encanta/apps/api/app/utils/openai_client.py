@@ -0,0 +1,44 @@
+import httpx
+from typing import TYPE_CHECKING
+from app.core.config import settings
+from app.utils.clients import clients
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+def _create_openai_client() -> "AsyncOpenAI":
+    # Imported here: the openai package takes a sizeable share of API start-up to import
+    from openai import AsyncOpenAI
+
+    timeout = httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY
+        ),
+        timeout=timeout
+    )
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        timeout=timeout,
+        max_retries=settings.OPENAI_MAX_RETRIES,
+        http_client=http_client
+    )
+
+clients.register("openai", _create_openai_client, close=lambda client: client.close())
+
+def get_openai_client() -> "AsyncOpenAI":
+    """Get the shared async OpenAI client
+
+    All callers share one pooled HTTP client, so concurrent agent calls reuse
+    keep-alive connections instead of opening a new one per request.
+
+    Returns:
+        The AsyncOpenAI client
+    """
+    return clients.get("openai")
+
+async def close_openai_client():
+    """Close the shared OpenAI client and its connection pool"""
+    await clients.close("openai")
@@ -0,0 +1,49 @@
+import base64
+import json
+from typing import List, Any
+
+def encode_cursor(values: List[Any]) -> str:
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor made by encode_cursor
+
+    Args:
+        cursor: The opaque cursor token
+        size: Number of sort key values the cursor must hold
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+
+    return values
+
+def keyset_filter(columns: List[str], values: List[Any], desc: bool = True) -> str:
+    """Build a PostgREST "or" filter selecting rows after a keyset position
+
+    For columns (a, b) and descending order this is
+    (a.lt.x,and(a.eq.x,b.lt.y)). Values are double-quoted so timestamps
+    and other reserved characters survive the logic-tree syntax.
+    """
+    operator = "lt" if desc else "gt"
+    values = [str(value).replace("\\", "\\\\").replace('"', '\\"') for value in values]
+    conditions = []
+    for i, column in enumerate(columns):
+        equal = [f'{columns[j]}.eq."{values[j]}"' for j in range(i)]
+        after = f'{column}.{operator}."{values[i]}"'
+        conditions.append(f"and({','.join(equal + [after])})" if equal else after)
+    return f"({','.join(conditions)})"
+
+def keyset_order(columns: List[str], desc: bool = True) -> str:
+    """Build a PostgREST order parameter sorting on every keyset column"""
+    return ",".join(f"{column}.desc" if desc else column for column in columns)
@@ -0,0 +1,28 @@
+import redis.asyncio as redis
+from typing import Optional
+from app.core.config import settings
+from app.utils.clients import clients
+
+def _create_redis() -> Optional[redis.Redis]:
+    if not settings.REDIS_URL:
+        return None
+
+    return redis.from_url(
+        settings.REDIS_URL,
+        decode_responses=True,
+        max_connections=settings.REDIS_MAX_CONNECTIONS
+    )
+
+clients.register("redis", _create_redis, close=lambda client: client.close(), check=lambda client: client.ping())
+
+def get_redis() -> Optional[redis.Redis]:
+    """Get the shared Redis client
+
+    Returns:
+        The client, or None if REDIS_URL is not configured
+    """
+    return clients.get("redis")
+
+async def close_redis():
+    """Close the shared Redis client and its connection pool"""
+    await clients.close("redis")
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional
+from app.core.config import settings
+from app.utils.cache import TTLCache
+from app.utils.clients import clients
+from app.utils.metrics import RETRIEVAL_CACHE_REQUESTS
+from app.utils.redis_client import get_redis
+
+def _generation_key(workspace_id: str) -> str:
+    """Redis key holding a workspace's knowledge generation"""
+    return f"encanta:knowledge_generation:{workspace_id}"
+
+class GenerationCounter:
+    """Per-workspace knowledge generations in a SQLite file
+
+    Used when Redis isn't configured. API and worker processes on the same
+    node share the file, so a bump in one is seen by the next lookup in the
+    other.
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS generations (workspace_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+
+    def get(self, workspace_id: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT generation FROM generations WHERE workspace_id = ?", (workspace_id,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, workspace_id: str) -> int:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO generations (workspace_id, generation) VALUES (?, 1) "
+                "ON CONFLICT (workspace_id) DO UPDATE SET generation = generation + 1",
+                (workspace_id,)
+            )
+            return self._conn.execute("SELECT generation FROM generations WHERE workspace_id = ?", (workspace_id,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+clients.register(
+    "knowledge_generations",
+    lambda: GenerationCounter(settings.KNOWLEDGE_GENERATION_PATH),
+    close=lambda counter: counter.close()
+)
+
+async def get_knowledge_generation(workspace_id: str) -> Optional[int]:
+    """Current knowledge generation of a workspace, or None if it can't be read
+
+    Read from Redis when configured (shared by every node), otherwise from
+    the local SQLite counter.
+    """
+    workspace_id = str(workspace_id)
+    redis = get_redis()
+    try:
+        if redis is not None:
+            return int(await redis.get(_generation_key(workspace_id)) or 0)
+        return clients.get("knowledge_generations").get(workspace_id)
+    except Exception as e:
+        print(f"Warning: Failed to read knowledge generation: {str(e)}")
+        return None
+
+async def bump_knowledge_generation(workspace_id: str):
+    """Advance a workspace's knowledge generation after its knowledge changed
+
+    Every retrieval cached under an earlier generation stops matching, in
+    this process and in every other one sharing the counter.
+    """
+    workspace_id = str(workspace_id)
+    redis = get_redis()
+    try:
+        if redis is not None:
+            await redis.incr(_generation_key(workspace_id))
+        else:
+            await asyncio.to_thread(clients.get("knowledge_generations").bump, workspace_id)
+    except Exception as e:
+        print(f"Warning: Failed to bump knowledge generation: {str(e)}")
+
+    # Local entries can go now rather than waiting to miss
+    retrieval_cache.invalidate(workspace_id)
+
+def retrieval_cache_key(query: str, top_k: int, filter: Optional[Dict[str, Any]], mode: str) -> str:
+    """Cache key for a search; queries differing only in case or whitespace share it"""
+    normalized = " ".join(query.split()).lower()
+    return hashlib.sha256(json.dumps([normalized, top_k, filter, mode], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class RetrievalCache:
+    """In-process cache of knowledge search results, scoped per workspace
+
+    Each workspace's entries are tagged with the knowledge generation they
+    were computed under; a lookup under any other generation misses and
+    drops them. Entries and workspaces are both LRU-bounded.
+    """
+
+    def __init__(self, ttl: float = 3600, max_workspaces: int = 1000, max_entries: int = 200):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._workspaces = TTLCache(max_size=max_workspaces, ttl=ttl)
+
+    def get(self, workspace_id: str, generation: int, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Look up cached matches computed under the given generation"""
+        entry = self._workspaces.get(str(workspace_id))
+        matches = None
+        if entry is not None and entry[0] == generation:
+            matches = entry[1].get(key)
+        RETRIEVAL_CACHE_REQUESTS.labels("hit" if matches is not None else "miss").inc()
+        return matches
+
+    def set(self, workspace_id: str, generation: int, key: str, matches: List[Dict[str, Any]]):
+        """Store matches, discarding the workspace's entries from other generations"""
+        workspace_id = str(workspace_id)
+        entry = self._workspaces.get(workspace_id)
+        if entry is None or entry[0] != generation:
+            entry = (generation, TTLCache(max_size=self.max_entries, ttl=self.ttl))
+            self._workspaces.set(workspace_id, entry)
+        entry[1].set(key, matches)
+
+    def invalidate(self, workspace_id: Optional[str] = None):
+        """Drop cached matches for a workspace, or for every workspace"""
+        if workspace_id is None:
+            self._workspaces.clear()
+        else:
+            self._workspaces.delete(str(workspace_id))
+
+# Shared cache used by search_similar_documents
+retrieval_cache = RetrievalCache(
+    ttl=settings.RETRIEVAL_CACHE_TTL,
+    max_workspaces=settings.RETRIEVAL_CACHE_MAX_WORKSPACES,
+    max_entries=settings.RETRIEVAL_CACHE_MAX_ENTRIES
+)
@@ -1,5 +1,9 @@
 from app.core.config import settings
-from typing import Dict, Literal, Optional
+from app.utils.clients import clients
+from app.utils.text_extraction import detect_text_encoding
+from typing import AsyncIterator, Dict, Literal, Optional, Tuple
+import hashlib
+import httpx
 import os
 import uuid
 
@@ -13,6 +17,19 @@ BUCKET_NAMES: Dict[BucketType, str] = {
     "KNOWLEDGE_FILES": settings.BUCKET_KNOWLEDGE_FILES
 }
 
+def _create_storage_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=f"{settings.SUPABASE_URL.rstrip('/')}/storage/v1",
+        headers={
+            "apikey": settings.SUPABASE_KEY,
+            "Authorization": f"Bearer {settings.SUPABASE_KEY}"
+        },
+        timeout=settings.STORAGE_TIMEOUT,
+        limits=httpx.Limits(max_connections=settings.STORAGE_MAX_CONNECTIONS)
+    )
+
+clients.register("storage", _create_storage_client, close=lambda client: client.aclose())
+
 def get_bucket_name(bucket_type: BucketType) -> str:
     """
     Get the actual bucket name (with hyphens) from the bucket type (with underscores)
@@ -45,6 +62,156 @@ def get_storage_path(bucket_type: BucketType, user_id: str, file_name: str, fold
     else:
         return f"{bucket_name}/{user_id}/{file_name}"
 
+def split_storage_path(storage_path: str) -> Tuple[str, str]:
+    """
+    Split a storage path into its bucket name and the object path inside the bucket
+    
+    Args:
+        storage_path: A path built by get_storage_path
+        
+    Returns:
+        A (bucket_name, object_path) tuple
+    """
+    bucket, _, path = storage_path.partition("/")
+    return bucket, path
+
+async def download_to_file(bucket_name: str, path: str, file_obj, chunk_size: int = 64 * 1024) -> int:
+    """
+    Stream an object from Supabase Storage into a file without buffering it in memory
+    
+    Args:
+        bucket_name: The bucket name (with hyphens)
+        path: The object path inside the bucket
+        file_obj: A writable binary file object
+        chunk_size: Size of the chunks read from the response
+        
+    Returns:
+        The number of bytes written
+    """
+    size = 0
+    async with clients.get("storage").stream("GET", f"/object/{bucket_name}/{path}") as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(chunk_size):
+            file_obj.write(chunk)
+            size += len(chunk)
+    
+    return size
+
+async def upload_stream(bucket_name: str, path: str, chunks: AsyncIterator[bytes], content_type: str):
+    """
+    Stream an object into Supabase Storage without buffering it in memory
+    
+    The body is sent with chunked transfer encoding as chunks are produced.
+    If the iterator raises, the request is aborted and no object is created.
+    
+    Args:
+        bucket_name: The bucket name (with hyphens)
+        path: The object path inside the bucket
+        chunks: The object's content
+        content_type: MIME type stored with the object
+    """
+    response = await clients.get("storage").post(
+        f"/object/{bucket_name}/{path}",
+        content=chunks,
+        headers={"Content-Type": content_type}
+    )
+    response.raise_for_status()
+
+class FileTooLarge(Exception):
+    """Raised when an upload grows past its size limit"""
+
+class UploadReader:
+    """
+    Read an uploaded file in chunks, counting and hashing bytes as they go
+    
+    Only one chunk is held at a time. The size limit is enforced on the
+    bytes actually read, not on any declared length.
+    """
+    
+    def __init__(self, file, max_size: int, chunk_size: int = 64 * 1024):
+        """
+        Args:
+            file: An UploadFile (or anything with an async read(size))
+            max_size: Maximum allowed size in bytes
+            chunk_size: Size of the chunks read from the file
+        """
+        self.file = file
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.head = b""
+        self._sha256 = hashlib.sha256()
+    
+    async def _read(self) -> bytes:
+        chunk = await self.file.read(self.chunk_size)
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise FileTooLarge(f"File size exceeds the limit of {self.max_size} bytes")
+        self._sha256.update(chunk)
+        return chunk
+    
+    async def read_head(self) -> bytes:
+        """Read the first chunk, for content sniffing; it is still yielded by chunks()"""
+        self.head = await self._read()
+        return self.head
+    
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """Yield the file's content, starting with the head if it was read"""
+        if self.head:
+            yield self.head
+        while True:
+            chunk = await self._read()
+            if not chunk:
+                break
+            yield chunk
+    
+    @property
+    def sha256(self) -> str:
+        """Hex digest of the bytes read so far"""
+        return self._sha256.hexdigest()
+
+# Leading bytes of the binary file types we accept
+FILE_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    # DOCX is a ZIP container
+    (b"PK\x03\x04", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    # Legacy .doc is an OLE compound file
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),
+]
+
+TEXT_TYPES = ["text/plain", "text/csv", "text/markdown"]
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """
+    Detect a file's type from its first bytes
+    
+    Args:
+        head: The first bytes of the file
+        
+    Returns:
+        The MIME type for a known signature, "text/plain" for text in any
+        encoding extraction can decode, or None
+    """
+    for signature, mime_type in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    
+    if detect_text_encoding(head) is not None:
+        return "text/plain"
+    
+    return None
+
+def matches_declared_type(declared_type: str, sniffed_type: Optional[str]) -> bool:
+    """
+    Check that a file's content agrees with its declared MIME type
+    
+    Text formats (plain, CSV, markdown) can't be told apart by content, so
+    any of them is accepted for text.
+    """
+    if sniffed_type == "text/plain":
+        return declared_type in TEXT_TYPES
+    return sniffed_type is not None and sniffed_type == declared_type
+
 def generate_unique_filename(original_filename: str) -> str:
     """
     Generate a unique filename by adding a UUID to prevent collisions
@@ -1,20 +1,26 @@
-import os
-from supabase import create_client
-from dotenv import load_dotenv
+import time
 from typing import List, Dict, Any, Optional
 from uuid import UUID
+from app.core.config import settings
+from app.utils.cache import TTLCache
+from app.utils.clients import clients
+from app.utils.db import db
+from app.utils.redis_client import get_redis
 
-# Load environment variables
-load_dotenv()
+def _create_supabase():
+    # Imported here: the supabase package is slow to import and only storage needs it
+    from supabase import create_client
+    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 
-# Initialize Supabase client
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
-supabase = create_client(supabase_url, supabase_key)
+clients.register("supabase", _create_supabase)
+
+def get_supabase():
+    """Get the shared Supabase client (used for storage; table access goes through app.utils.db)"""
+    return clients.get("supabase")
 
 async def get_user_workspaces(user_id: str) -> List[Dict[str, Any]]:
     """Get all workspaces for a user and their role in each workspace"""
-    response = supabase.table("workspace_members").select(
+    response = await db.table("workspace_members").select(
         "workspace_id, role, workspaces(*)"
     ).eq("user_id", user_id).execute()
 
@@ -26,7 +32,8 @@ async def get_user_workspaces(user_id: str) -> List[Dict[str, Any]]:
                 "description": item["workspaces"]["description"],
                 "industry": item["workspaces"]["industry"],
                 "role": item["role"],
-                "created_at": item["workspaces"]["created_at"]
+                "created_at": item["workspaces"]["created_at"],
+                "updated_at": item["workspaces"]["updated_at"]
             }
             for item in response.data
         ]
@@ -35,21 +42,113 @@ async def get_user_workspaces(user_id: str) -> List[Dict[str, Any]]:
 
 async def get_workspace_by_id(workspace_id: UUID) -> Optional[Dict[str, Any]]:
     """Get workspace details by ID"""
-    response = supabase.table("workspaces").select("*").eq("id", str(workspace_id)).single().execute()
+    response = await db.table("workspaces").select("*").eq("id", str(workspace_id)).single().execute()
     return response.data
 
+# Cached workspace roles keyed by (user_id, workspace_id); "" marks a non-member
+_membership_cache = TTLCache(max_size=settings.MEMBERSHIP_CACHE_SIZE, ttl=settings.MEMBERSHIP_CACHE_TTL)
+NOT_A_MEMBER = ""
+
+def _roles_key(workspace_id: str) -> str:
+    """Redis hash holding the cached roles of a workspace, keyed by user ID
+
+    Each field is "<expires_at>:<role>". The hash's own expiry is refreshed on
+    every write, so it only cleans up idle workspaces; entries are expired
+    individually on read.
+    """
+    return f"encanta:workspace_roles:{workspace_id}"
+
+async def _get_shared_role(user_id: str, workspace_id: str) -> Optional[str]:
+    """Read a cached role from Redis, if configured and not yet expired"""
+    redis = get_redis()
+    if redis is None:
+        return None
+
+    try:
+        value = await redis.hget(_roles_key(workspace_id), user_id)
+        if value is None:
+            return None
+
+        expires_at, _, role = value.partition(":")
+        if not expires_at.isdigit() or int(expires_at) <= time.time():
+            await redis.hdel(_roles_key(workspace_id), user_id)
+            return None
+        return role
+    except Exception as e:
+        print(f"Warning: Failed to read membership cache: {str(e)}")
+        return None
+
+async def _set_shared_role(user_id: str, workspace_id: str, role: str):
+    """Write a role to Redis, if configured"""
+    redis = get_redis()
+    if redis is None:
+        return
+
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hset(_roles_key(workspace_id), user_id, f"{int(time.time() + settings.MEMBERSHIP_CACHE_TTL)}:{role}")
+            pipe.expire(_roles_key(workspace_id), int(settings.MEMBERSHIP_CACHE_TTL))
+            await pipe.execute()
+    except Exception as e:
+        print(f"Warning: Failed to write membership cache: {str(e)}")
+
+async def get_user_workspace_role(user_id: str, workspace_id: UUID) -> Optional[str]:
+    """Get the user's role in a workspace, or None if they are not a member
+
+    Roles are served from the in-process cache, then Redis, and only fall back
+    to a workspace_members query on a miss.
+    """
+    workspace_id = str(workspace_id)
+    key = (user_id, workspace_id)
+
+    role = _membership_cache.get(key)
+    if role is None:
+        role = await _get_shared_role(user_id, workspace_id)
+
+        if role is None:
+            response = await db.table("workspace_members").select("role").eq("user_id", user_id).eq("workspace_id", workspace_id).execute()
+            role = response.data[0]["role"] if response.data else NOT_A_MEMBER
+            await _set_shared_role(user_id, workspace_id, role)
+
+        _membership_cache.set(key, role)
+
+    return role or None
+
 async def check_user_workspace_access(user_id: str, workspace_id: UUID, required_roles: List[str] = None) -> bool:
     """Check if user has access to the workspace with the required role"""
-    query = supabase.table("workspace_members").select("role").eq("user_id", user_id).eq("workspace_id", str(workspace_id))
-
-    response = query.execute()
+    user_role = await get_user_workspace_role(user_id, workspace_id)
 
-    if not response.data:
+    if user_role is None:
         return False
 
     if required_roles is None:
         # If no specific roles required, just check if user is a member
         return True
 
-    user_role = response.data[0]["role"]
-    return user_role in required_roles 
\ No newline at end of file
+    return user_role in required_roles
+
+async def invalidate_workspace_access(workspace_id: UUID, user_id: Optional[str] = None):
+    """Drop cached roles after a write to workspace_members
+
+    Args:
+        workspace_id: The workspace whose membership changed
+        user_id: The affected member, or None to drop every member of the workspace
+    """
+    workspace_id = str(workspace_id)
+
+    if user_id is None:
+        _membership_cache.delete_where(lambda key: key[1] == workspace_id)
+    else:
+        _membership_cache.delete((user_id, workspace_id))
+
+    redis = get_redis()
+    if redis is None:
+        return
+
+    try:
+        if user_id is None:
+            await redis.delete(_roles_key(workspace_id))
+        else:
+            await redis.hdel(_roles_key(workspace_id), user_id)
+    except Exception as e:
+        print(f"Warning: Failed to invalidate membership cache: {str(e)}")
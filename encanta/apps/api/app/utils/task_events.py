@@ -0,0 +1,154 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, Set, AsyncIterator
+from app.core.config import settings
+from app.utils.clients import clients
+from app.utils.redis_client import get_redis
+
+# Statuses after which a task never changes again
+TERMINAL_STATUSES = ("completed", "failed")
+
+def _channel(task_id: str) -> str:
+    """Redis channel a task's updates are published on"""
+    return f"encanta:task_events:{task_id}"
+
+def _latest_key(task_id: str) -> str:
+    """Redis key holding a task's latest row"""
+    return f"encanta:task_latest:{task_id}"
+
+class TaskEventBus:
+    """In-process pub/sub of ai_tasks rows, published on every status change
+
+    Subscribers only hear updates published in this process, which covers
+    streaming generations and single-process deployments. Tasks run by
+    workers in other processes need the Redis bus; without it, waiters fall
+    back to rereading the database every TASK_WAIT_RECHECK_INTERVAL.
+    """
+
+    # Whether every process sees every update, so latest() is authoritative
+    shared = False
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def _deliver(self, task: Dict[str, Any]):
+        for queue in self._subscribers.get(str(task["id"]), ()):
+            queue.put_nowait(task)
+
+    async def publish(self, task: Dict[str, Any]):
+        """Send a task's current row to its subscribers"""
+        self._deliver(task)
+
+    async def latest(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """The task's last published row, if the bus knows it for certain
+
+        Always None in process: a worker elsewhere may have moved the task on.
+        """
+        return None
+
+    @asynccontextmanager
+    async def subscribe(self, task_id: str) -> AsyncIterator[asyncio.Queue]:
+        """Receive a task's rows on a queue for the duration of the block"""
+        task_id = str(task_id)
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers[task_id]
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[task_id]
+
+    async def close(self):
+        pass
+
+class RedisTaskEventBus(TaskEventBus):
+    """Task updates shared by every API and worker process through Redis
+
+    Each update is stored as the task's latest row (so status reads skip the
+    database) and published on the task's channel. One pattern subscription
+    per process, opened with the first subscriber, fans the messages out to
+    local subscribers.
+    """
+
+    shared = True
+
+    def __init__(self, redis, ttl: float = 3600):
+        super().__init__()
+        self.redis = redis
+        self.ttl = ttl
+        self._listener: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    async def publish(self, task: Dict[str, Any]):
+        payload = json.dumps(task, default=str)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(_latest_key(task["id"]), payload, ex=int(self.ttl))
+            pipe.publish(_channel(task["id"]), payload)
+            await pipe.execute()
+
+    async def latest(self, task_id: str) -> Optional[Dict[str, Any]]:
+        payload = await self.redis.get(_latest_key(str(task_id)))
+        return json.loads(payload) if payload else None
+
+    async def _listen(self):
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.psubscribe(_channel("*"))
+            self._ready.set()
+            async for message in pubsub.listen():
+                if message["type"] == "pmessage":
+                    self._deliver(json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The next subscriber restarts the listener; waiters recheck latest() meanwhile
+            print(f"Warning: Task event listener stopped: {str(e)}")
+        finally:
+            self._ready.clear()
+            await pubsub.close()
+
+    @asynccontextmanager
+    async def subscribe(self, task_id: str) -> AsyncIterator[asyncio.Queue]:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        try:
+            # Don't let a publish slip in before the pattern subscription is live
+            await asyncio.wait_for(self._ready.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            print("Warning: Task event listener not ready; relying on rechecks")
+
+        async with super().subscribe(task_id) as queue:
+            yield queue
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+
+def _create_task_events() -> TaskEventBus:
+    redis = get_redis()
+    if redis is None:
+        return TaskEventBus()
+    return RedisTaskEventBus(redis, ttl=settings.TASK_EVENTS_TTL)
+
+clients.register("task_events", _create_task_events, close=lambda bus: bus.close())
+
+def get_task_events() -> TaskEventBus:
+    """Get the shared task event bus (Redis-backed when REDIS_URL is set)"""
+    return clients.get("task_events")
+
+async def publish_task_update(task: Optional[Dict[str, Any]]):
+    """Publish an ai_tasks row after a status change; failures only delay waiters until their next recheck"""
+    if not task:
+        return
+
+    try:
+        await get_task_events().publish(task)
+    except Exception as e:
+        print(f"Warning: Failed to publish task update: {str(e)}")
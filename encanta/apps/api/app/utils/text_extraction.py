@@ -0,0 +1,206 @@
+import asyncio
+import codecs
+import concurrent.futures
+import multiprocessing
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Dict, Any, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.utils.clients import clients
+
+# Size of the blocks read from plain-text files
+TEXT_BLOCK_SIZE = 64 * 1024
+
+PLAIN_TEXT_TYPES = ["text/plain", "text/csv", "text/markdown"]
+PDF_TYPES = ["application/pdf"]
+DOCX_TYPES = ["application/vnd.openxmlformats-officedocument.wordprocessingml.document"]
+
+def detect_text_encoding(head: bytes) -> Optional[str]:
+    """Guess a text file's encoding from its first bytes, or None if it looks binary
+
+    Byte order marks identify UTF-8 and UTF-16, and so does BOM-less UTF-16
+    by its NUL bytes all falling on one side of each character. Any other
+    NUL byte means binary content. Otherwise UTF-8 is tried, then
+    Windows-1252 (a superset of Latin-1's printable characters).
+    """
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    if b"\x00" in head:
+        even, odd = head[0::2], head[1::2]
+        if odd.count(0) >= 0.9 * len(odd) and even.count(0) <= 0.1 * len(even):
+            return "utf-16-le"
+        if even.count(0) >= 0.9 * len(even) and odd.count(0) <= 0.1 * len(odd):
+            return "utf-16-be"
+        return None
+
+    # The head may end in the middle of a multi-byte character
+    for cut in range(4):
+        try:
+            head[:len(head) - cut].decode("utf-8")
+            return "utf-8"
+        except UnicodeDecodeError:
+            continue
+
+    return "cp1252"
+
+def iter_plain_text(path: str) -> Iterator[str]:
+    """Yield decoded text from a plain-text file one block at a time, in its detected encoding"""
+    decoder = None
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(TEXT_BLOCK_SIZE)
+            if not block:
+                break
+            if decoder is None:
+                encoding = detect_text_encoding(block) or "utf-8"
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            text = decoder.decode(block)
+            if text:
+                yield text
+
+    tail = decoder.decode(b"", final=True) if decoder else ""
+    if tail:
+        yield tail
+
+class ExtractionTimeout(Exception):
+    """Raised when extracting a file takes longer than its time budget"""
+
+# Documents opened by this worker process, kept so consecutive page windows
+# of the same file don't reparse it; (path, file_type) -> parsed document
+_worker_documents: Dict[Tuple[str, str], Any] = {}
+WORKER_DOCUMENT_CACHE_SIZE = 2
+
+def _open_document(path: str, file_type: str):
+    key = (path, file_type)
+    if key not in _worker_documents:
+        if len(_worker_documents) >= WORKER_DOCUMENT_CACHE_SIZE:
+            _worker_documents.pop(next(iter(_worker_documents)))
+        if file_type in PDF_TYPES:
+            from pypdf import PdfReader
+            _worker_documents[key] = PdfReader(path)
+        else:
+            from docx import Document
+            _worker_documents[key] = Document(path)
+    return _worker_documents[key]
+
+def _extract_window(path: str, file_type: str, start: int, count: int) -> Tuple[List[str], int, bool]:
+    """Extract pages [start, start + count) of a document; runs in a worker process
+
+    PDFs are windowed by page. A Word document has no reliable page
+    boundaries, so its paragraphs are extracted in a single window.
+
+    Returns:
+        (text pieces, pages processed, whether the document is finished)
+    """
+    document = _open_document(path, file_type)
+
+    if file_type in PDF_TYPES:
+        pages = document.pages[start:start + count]
+        pieces = [text + "\n\n" for text in (page.extract_text() or "" for page in pages) if text.strip()]
+        done = start + len(pages) >= len(document.pages)
+        if done:
+            _worker_documents.pop((path, file_type), None)
+        return pieces, len(pages), done
+
+    _worker_documents.pop((path, file_type), None)
+    pieces = [paragraph.text + "\n\n" for paragraph in document.paragraphs if paragraph.text.strip()]
+    return pieces, 1, True
+
+def _create_extraction_pool() -> concurrent.futures.ProcessPoolExecutor:
+    # Spawned rather than forked: the API process has threads and open sockets
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=settings.EXTRACTION_WORKERS,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+def _close_extraction_pool(pool: concurrent.futures.ProcessPoolExecutor):
+    # A worker stuck on a pathological file never returns, so kill them outright
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+clients.register("extraction_pool", _create_extraction_pool, close=_close_extraction_pool)
+
+async def _recycle_pool(pool: concurrent.futures.ProcessPoolExecutor):
+    """Replace the shared pool, unless someone already has"""
+    if clients.get("extraction_pool") is pool:
+        await clients.close("extraction_pool")
+
+async def _run_window(path: str, file_type: str, start: int, timeout: float) -> Tuple[List[str], int, bool]:
+    """Run one extraction window in the pool, retrying once if the pool was recycled under us"""
+    for attempt in range(2):
+        pool = clients.get("extraction_pool")
+        try:
+            future = pool.submit(_extract_window, path, file_type, start, settings.EXTRACTION_PAGES_PER_TASK)
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except BrokenProcessPool:
+            # Another file's timeout killed the workers
+            await _recycle_pool(pool)
+            if attempt:
+                raise
+        except asyncio.TimeoutError:
+            await _recycle_pool(pool)
+            raise ExtractionTimeout(f"Text extraction exceeded {settings.EXTRACTION_TIMEOUT}s")
+
+async def extract_text(path: str, file_type: str, stats: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Yield the text of a file page by page without blocking the event loop
+
+    PDF and Word parsing is CPU-bound, so it runs in a bounded process pool,
+    a window of pages per task with the next window prefetched while the
+    current one is consumed. Plain text only needs decoding and is read in a
+    thread. The whole file must finish within EXTRACTION_TIMEOUT.
+
+    Args:
+        path: Local path of the file
+        file_type: The MIME type of the file
+        stats: Optional dict updated with pages_extracted and extraction_seconds
+            (time spent extracting, excluding time the consumer held us up)
+
+    Raises:
+        ExtractionTimeout: If extraction runs past its time budget
+        ValueError: If the file type is not supported
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("pages_extracted", 0)
+    stats.setdefault("extraction_seconds", 0.0)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.EXTRACTION_TIMEOUT
+
+    if file_type in PLAIN_TEXT_TYPES:
+        blocks = iter_plain_text(path)
+        while True:
+            started_at = time.monotonic()
+            block = await asyncio.to_thread(next, blocks, None)
+            stats["extraction_seconds"] += time.monotonic() - started_at
+            if block is None:
+                return
+            if loop.time() > deadline:
+                raise ExtractionTimeout(f"Text extraction exceeded {settings.EXTRACTION_TIMEOUT}s")
+            # Plain text has no pages; count each block as one
+            stats["pages_extracted"] += 1
+            yield block
+
+    if file_type not in PDF_TYPES and file_type not in DOCX_TYPES:
+        raise ValueError(f"Text extraction is not supported for file type: {file_type}")
+
+    start = 0
+    started_at = time.monotonic()
+    pending = asyncio.create_task(_run_window(path, file_type, start, deadline - loop.time()))
+    try:
+        while pending is not None:
+            pieces, processed, done = await pending
+            stats["extraction_seconds"] += time.monotonic() - started_at
+            stats["pages_extracted"] += processed
+            start += processed
+
+            started_at = time.monotonic()
+            pending = None if done else asyncio.create_task(_run_window(path, file_type, start, deadline - loop.time()))
+
+            for piece in pieces:
+                yield piece
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -0,0 +1,46 @@
+import tiktoken
+from functools import lru_cache
+from typing import Optional
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Rough characters-per-token ratio used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """Get the tiktoken encoding for a model, falling back to cl100k_base
+
+    Returns None if the encoding cannot be loaded (e.g. the BPE file cannot be
+    downloaded), in which case token counts are estimated from length.
+    """
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        print(f"Warning: Failed to load tokenizer for {model}, estimating token counts: {str(e)}")
+        return None
+
+def count_tokens(text: str, model: str) -> int:
+    """Count the tokens in text for a model"""
+    if not text:
+        return 0
+
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    """Truncate text to at most max_tokens tokens for a model"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -1,22 +1,47 @@
-import os
-from pinecone import Pinecone
-from openai import OpenAI
-from dotenv import load_dotenv
+import asyncio
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from app.core.config import settings
+from app.utils.clients import clients
+from app.utils.embedding_cache import get_embedding_cache, text_hash
+from app.utils.lexical_index import get_lexical_index
+from app.utils.local_vector_store import LocalVectorStore, _workspace_from_filter
+from app.utils.metrics import EMBEDDING_REQUEST_DURATION, RETRIEVAL_LEG_DURATION, VECTOR_OPERATION_DURATION
+from app.utils.openai_client import get_openai_client
+from app.utils.retrieval_cache import get_knowledge_generation, retrieval_cache, retrieval_cache_key
+from app.utils.tokens import count_tokens, truncate_to_tokens
 
-# Load environment variables
-load_dotenv()
+EMBEDDING_MODEL = "text-embedding-3-small"
 
-# Initialize OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# OpenAI embedding request limits
+EMBEDDING_MAX_INPUTS = 2048  # Inputs per request
+EMBEDDING_MAX_INPUT_TOKENS = 8191  # Tokens per input
+EMBEDDING_MAX_REQUEST_TOKENS = 300000  # Tokens across all inputs of a request
 
-# Initialize Pinecone client
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index_name = os.getenv("PINECONE_INDEX", "encanta-knowledge")
+class VectorStore:
+    """Interface implemented by vector index backends
 
-# Get or create the index
-def initialize_vector_store():
-    """Initialize the vector store, creating the index if it doesn't exist"""
-    try:
+    Vectors are {"id", "values", "metadata"} dicts and matches are
+    {"id", "score", "metadata"} dicts, whatever the backend.
+    """
+
+    async def upsert(self, vectors: List[Dict[str, Any]]):
+        raise NotImplementedError()
+
+    async def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError()
+
+    async def delete(self, ids: List[str], workspace_id: Optional[str] = None):
+        raise NotImplementedError()
+
+class PineconeVectorStore(VectorStore):
+    """Vector store backed by a Pinecone index"""
+
+    def __init__(self, api_key: str, index_name: str):
+        """Connect to the index, creating it if it doesn't exist"""
+        from pinecone import Pinecone
+
+        pc = Pinecone(api_key=api_key)
         existing_indexes = [index.name for index in pc.list_indexes()]
         if index_name not in existing_indexes:
             pc.create_index(
@@ -24,70 +49,465 @@ def initialize_vector_store():
                 dimension=1536,  # OpenAI embedding dimension
                 metric="cosine"
             )
-        
-        # Get the index
-        return pc.Index(index_name)
-    except Exception as e:
-        print(f"Error initializing vector store: {str(e)}")
-        # Return None if initialization fails
-        return None
 
-# Get the index
-index = initialize_vector_store()
+        self.index = pc.Index(index_name)
+
+    # The Pinecone client is synchronous, so calls run in a worker thread
+    async def upsert(self, vectors: List[Dict[str, Any]]):
+        await asyncio.to_thread(self.index.upsert, vectors=vectors)
+
+    async def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        results = await asyncio.to_thread(
+            self.index.query,
+            vector=vector,
+            top_k=top_k,
+            filter=filter,
+            include_metadata=True
+        )
+        return [
+            {"id": match.id, "score": match.score, "metadata": match.metadata or {}}
+            for match in results.matches
+        ]
+
+    async def delete(self, ids: List[str], workspace_id: Optional[str] = None):
+        if ids:
+            await asyncio.to_thread(self.index.delete, ids=ids)
+
+def _create_vector_store() -> VectorStore:
+    if settings.VECTOR_STORE_BACKEND == "local":
+        return LocalVectorStore(
+            settings.LOCAL_VECTOR_STORE_PATH,
+            quantize=settings.LOCAL_VECTOR_QUANTIZE,
+            ivf_threshold=settings.LOCAL_VECTOR_IVF_THRESHOLD,
+            nprobe=settings.LOCAL_VECTOR_IVF_NPROBE
+        )
+    if settings.VECTOR_STORE_BACKEND == "pinecone":
+        return PineconeVectorStore(settings.PINECONE_API_KEY, settings.PINECONE_INDEX)
+    raise ValueError(f"Unknown vector store backend: {settings.VECTOR_STORE_BACKEND}")
 
-def get_embedding(text):
+clients.register("vector_store", _create_vector_store)
+
+def get_vector_store() -> VectorStore:
+    """Get the configured vector store backend
+
+    Raises if the backend cannot be initialized; a failed attempt is not
+    cached, so the next call retries.
+    """
+    return clients.get("vector_store")
+
+async def get_embedding(text):
     """Generate embedding for text using OpenAI"""
     if not text or not text.strip():
         return []
 
-    response = openai_client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
-    return response.data[0].embedding
+    embeddings = await get_embeddings([text])
+    return embeddings[0]
+
+def pack_embedding_requests(texts: List[str]) -> List[List[str]]:
+    """Group texts into request batches within the provider's item and token limits
+
+    Inputs longer than the per-input token limit are truncated.
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+
+    for text in texts:
+        tokens = count_tokens(text, EMBEDDING_MODEL)
+        if tokens > EMBEDDING_MAX_INPUT_TOKENS:
+            text = truncate_to_tokens(text, EMBEDDING_MAX_INPUT_TOKENS, EMBEDDING_MODEL)
+            tokens = EMBEDDING_MAX_INPUT_TOKENS
+
+        if batch and (len(batch) >= EMBEDDING_MAX_INPUTS or batch_tokens + tokens > EMBEDDING_MAX_REQUEST_TOKENS):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+
+        batch.append(text)
+        batch_tokens += tokens
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+async def _embed_batch(texts: List[str]) -> List[List[float]]:
+    """Embed one packed batch with a single OpenAI request"""
+    client = get_openai_client()
+    with EMBEDDING_REQUEST_DURATION.labels(EMBEDDING_MODEL).time():
+        response = await client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts
+        )
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+async def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Generate embeddings for many texts with as few OpenAI requests as possible
+
+    Embeddings are cached by (model, sha256(text)) in a local store, so text
+    that has been embedded before is never sent again. Remaining texts are
+    deduplicated and packed into requests up to the provider's limits.
+
+    Args:
+        texts: Non-empty texts to embed
+
+    Returns:
+        One embedding per text, in input order
+    """
+    if not texts:
+        return []
+
+    hashes = [text_hash(text) for text in texts]
+    cache = get_embedding_cache(settings.EMBEDDING_CACHE_PATH)
+    embeddings = {}
+    if cache:
+        embeddings = await asyncio.to_thread(cache.get_many, EMBEDDING_MODEL, list(set(hashes)))
+
+    # Embed each distinct uncached text once
+    missing = {}
+    for hash_, text in zip(hashes, texts):
+        if hash_ not in embeddings:
+            missing[hash_] = text
+
+    if missing:
+        missing_hashes = list(missing)
+        batches = pack_embedding_requests(list(missing.values()))
+        results = await asyncio.gather(*[_embed_batch(batch) for batch in batches])
+        new_embeddings = dict(zip(missing_hashes, [embedding for result in results for embedding in result]))
+
+        if cache:
+            await asyncio.to_thread(cache.put_many, EMBEDDING_MODEL, new_embeddings)
+        embeddings.update(new_embeddings)
+
+    return [embeddings[hash_] for hash_ in hashes]
+
+def build_vector(text: str, embedding: List[float], metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a vector record for a document chunk"""
+    return {
+        "id": metadata["id"],
+        "values": embedding,
+        "metadata": {
+            **metadata,
+            "text": text[:1000]  # Store preview of text in metadata
+        }
+    }
+
+async def upsert_vectors(vectors: List[Dict[str, Any]]):
+    """Upsert a batch of prebuilt vector records in one vector store call"""
+    if not vectors:
+        return {"status": "skipped", "reason": "no vectors"}
+
+    try:
+        store = get_vector_store()
+    except Exception as e:
+        return {"status": "error", "reason": f"vector store not initialized: {str(e)}"}
+
+    with VECTOR_OPERATION_DURATION.labels(settings.VECTOR_STORE_BACKEND, "upsert").time():
+        await store.upsert(vectors)
+
+    # Keep the BM25 index in step; vector search still works if it falls behind
+    await index_lexical(vectors)
+
+    return {"status": "stored", "count": len(vectors)}
+
+async def index_lexical(vectors: List[Dict[str, Any]]):
+    """Write vector records (only their IDs and metadata are used) to the BM25 index, if enabled
+
+    Failures are logged, not raised.
+    """
+    lexical_index = get_lexical_index()
+    if lexical_index is None or not vectors:
+        return
+
+    try:
+        with VECTOR_OPERATION_DURATION.labels("lexical", "upsert").time():
+            await asyncio.to_thread(lexical_index.upsert, vectors)
+    except Exception as e:
+        print(f"Warning: lexical indexing failed: {str(e)}")
+
+# Pinecone accepts at most 1000 IDs per delete
+VECTOR_DELETE_BATCH_SIZE = 1000
+
+async def delete_vectors(ids: List[str], workspace_id: Optional[str] = None):
+    """Delete vectors by ID in batches
+
+    Args:
+        ids: Vector IDs to delete; unknown IDs are ignored
+        workspace_id: The workspace the vectors belong to, if known (lets partitioned backends skip a scan)
+    """
+    if not ids:
+        return {"status": "skipped", "reason": "no ids"}
+
+    try:
+        store = get_vector_store()
+    except Exception as e:
+        return {"status": "error", "reason": f"vector store not initialized: {str(e)}"}
+
+    with VECTOR_OPERATION_DURATION.labels(settings.VECTOR_STORE_BACKEND, "delete").time():
+        for start in range(0, len(ids), VECTOR_DELETE_BATCH_SIZE):
+            await store.delete(ids[start:start + VECTOR_DELETE_BATCH_SIZE], workspace_id)
+
+    lexical_index = get_lexical_index()
+    if lexical_index is not None:
+        try:
+            with VECTOR_OPERATION_DURATION.labels("lexical", "delete").time():
+                await asyncio.to_thread(lexical_index.delete, ids, workspace_id)
+        except Exception as e:
+            print(f"Warning: lexical index delete failed: {str(e)}")
+
+    return {"status": "deleted", "count": len(ids)}
 
 async def store_document_chunk(text, metadata):
     """Store a document chunk in the vector database"""
     if not text or not text.strip():
         return {"status": "skipped", "reason": "empty text"}
 
-    if not index:
-        return {"status": "error", "reason": "vector store not initialized"}
+    result = await store_document_chunks([{"text": text, "metadata": metadata}])
+    if result["status"] == "error":
+        return result
 
-    # Generate embedding
-    embedding = get_embedding(text)
+    return {"id": metadata["id"], "status": "stored"}
 
-    # Store in Pinecone
-    index.upsert(
-        vectors=[{
-            "id": metadata["id"],
-            "values": embedding,
-            "metadata": {
-                **metadata,
-                "text": text[:1000]  # Store preview of text in metadata
-            }
-        }]
-    )
+async def store_document_chunks(chunks: List[Dict[str, Any]]):
+    """Store a batch of document chunks with one embedding request and one upsert
 
-    return {"id": metadata["id"], "status": "stored"}
+    Args:
+        chunks: List of {"text": ..., "metadata": {...}} dicts; metadata must include "id"
+
+    Returns:
+        Status dictionary with the number of vectors stored
+    """
+    chunks = [chunk for chunk in chunks if chunk["text"] and chunk["text"].strip()]
+    if not chunks:
+        return {"status": "skipped", "reason": "empty text"}
+
+    embeddings = await get_embeddings([chunk["text"] for chunk in chunks])
+    vectors = [
+        build_vector(chunk["text"], embedding, chunk["metadata"])
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+
+    return await upsert_vectors(vectors)
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], top_k: int, k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Merge ranked match lists by reciprocal rank fusion
+
+    Each match scores the sum of 1 / (k + rank) over the lists it appears in,
+    so only ranks matter and cosine and BM25 scores never need calibrating
+    against each other.
+
+    Args:
+        result_lists: {"id", "score", "metadata"} match lists, each best first
+        top_k: Number of fused matches to return
+        k: Damping constant; larger values flatten the gap between top ranks
 
-async def search_similar_documents(query, filter=None, top_k=5):
-    """Search for similar documents in the vector database"""
+    Returns:
+        Fused match dicts, best first, with "score" set to the fused score
+    """
+    k = settings.RETRIEVAL_RRF_K if k is None else k
+    fused: Dict[str, Dict[str, Any]] = {}
+    for matches in result_lists:
+        for rank, match in enumerate(matches, start=1):
+            entry = fused.setdefault(match["id"], {**match, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+
+    return sorted(fused.values(), key=lambda match: match["score"], reverse=True)[:top_k]
+
+def merge_matches(result_lists: List[List[Dict[str, Any]]], top_k: int, weights: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+    """Merge match lists from several queries, deduplicating by ID
+
+    A match's score is the weighted sum of its scores across the lists, so
+    chunks relevant to several queries rise above those matching only one.
+
+    Args:
+        result_lists: {"id", "score", "metadata"} match lists, one per query
+        top_k: Number of merged matches to return
+        weights: Per-list score weights (default 1.0 each)
+
+    Returns:
+        New match dicts, best first, with "score" set to the aggregate score
+    """
+    weights = weights or [1.0] * len(result_lists)
+    merged: Dict[str, Dict[str, Any]] = {}
+    for matches, weight in zip(result_lists, weights):
+        for match in matches:
+            entry = merged.setdefault(match["id"], {**match, "score": 0.0})
+            entry["score"] += weight * (match.get("score") or 0.0)
+
+    return sorted(merged.values(), key=lambda match: match["score"], reverse=True)[:top_k]
+
+def _resolve_mode(mode: Optional[str]) -> str:
+    mode = mode or settings.RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    # Without a lexical index, every mode degrades to plain vector search
+    if get_lexical_index() is None:
+        return "vector"
+    return mode
+
+async def _cache_generation(filter) -> Tuple[Optional[str], Optional[int]]:
+    """The workspace a search is pinned to and its knowledge generation, if it can be cached"""
+    workspace_id = _workspace_from_filter(filter)
+    if not settings.RETRIEVAL_CACHE_ENABLED or not workspace_id:
+        return workspace_id, None
+    return workspace_id, await get_knowledge_generation(workspace_id)
+
+# The legs return None when they fail, so a degraded result isn't cached
+async def _vector_search(query: str, filter, top_k: int, mode: str, embedding: Optional[List[float]] = None) -> Optional[List[Dict[str, Any]]]:
+    started_at = time.perf_counter()
+    try:
+        store = get_vector_store()
+    except Exception as e:
+        print(f"Error initializing vector store: {str(e)}")
+        return None
+
+    # Generate query embedding, unless it was batched with other queries'
+    if embedding is None:
+        embedding = await get_embedding(query)
+
+    with VECTOR_OPERATION_DURATION.labels(settings.VECTOR_STORE_BACKEND, "query").time():
+        matches = await store.query(embedding, top_k=top_k, filter=filter)
+
+    RETRIEVAL_LEG_DURATION.labels(mode, "vector").observe(time.perf_counter() - started_at)
+    return matches
+
+async def _lexical_search(query: str, filter, top_k: int, mode: str) -> Optional[List[Dict[str, Any]]]:
+    lexical_index = get_lexical_index()
+    if lexical_index is None:
+        return []
+
+    started_at = time.perf_counter()
+    try:
+        return await asyncio.to_thread(lexical_index.search, query, top_k, filter)
+    except Exception as e:
+        print(f"Warning: lexical search failed: {str(e)}")
+        return None
+    finally:
+        RETRIEVAL_LEG_DURATION.labels(mode, "lexical").observe(time.perf_counter() - started_at)
+
+async def _search(query: str, filter, top_k: int, mode: str, embedding: Optional[List[float]] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    """Run one uncached search
+
+    Returns:
+        (matches, whether every leg succeeded)
+    """
+    started_at = time.perf_counter()
+    if mode == "vector":
+        results = [await _vector_search(query, filter, top_k, mode, embedding)]
+        matches = results[0] or []
+    elif mode == "lexical":
+        results = [await _lexical_search(query, filter, top_k, mode)]
+        matches = results[0] or []
+    else:
+        # Each leg returns a deeper candidate list so fusion can promote
+        # matches that only one leg ranked highly
+        candidates = max(top_k, settings.RETRIEVAL_HYBRID_CANDIDATES)
+        results = await asyncio.gather(
+            _vector_search(query, filter, candidates, mode, embedding),
+            _lexical_search(query, filter, candidates, mode)
+        )
+        matches = reciprocal_rank_fusion([result or [] for result in results], top_k)
+
+    RETRIEVAL_LEG_DURATION.labels(mode, "total").observe(time.perf_counter() - started_at)
+    return matches, None not in results
+
+async def search_similar_documents(query, filter=None, top_k=5, mode=None):
+    """Search the knowledge index for documents relevant to a query
+
+    Args:
+        query: Search text
+        filter: Metadata filter, usually {"workspace_id": ...}
+        top_k: Number of matches to return
+        mode: "vector" (embedding similarity), "lexical" (BM25) or "hybrid"
+            (both legs run concurrently and are fused by reciprocal rank);
+            defaults to RETRIEVAL_MODE
+
+    Searches pinned to one workspace are cached until that workspace's
+    knowledge generation changes (see app/utils/retrieval_cache.py).
+
+    Returns:
+        List of {"id", "score", "metadata"} match dicts, best first; cached
+        lists are shared, so callers must not modify them
+    """
     if not query or not query.strip():
         return []
 
-    if not index:
+    mode = _resolve_mode(mode)
+
+    # The generation is read before searching, so results racing with a
+    # knowledge change are stored under the old generation and never served
+    workspace_id, generation = await _cache_generation(filter)
+    if generation is not None:
+        cache_key = retrieval_cache_key(query, top_k, filter, mode)
+        matches = retrieval_cache.get(workspace_id, generation, cache_key)
+        if matches is not None:
+            return matches
+
+    matches, complete = await _search(query, filter, top_k, mode)
+
+    if generation is not None and complete:
+        retrieval_cache.set(workspace_id, generation, cache_key, matches)
+
+    return matches
+
+async def search_similar_documents_multi(
+    queries: List[str],
+    filter=None,
+    top_k: int = 5,
+    mode: Optional[str] = None,
+    weights: Optional[List[float]] = None
+) -> List[Dict[str, Any]]:
+    """Search with several queries at once and merge their matches
+
+    Uncached queries are embedded together in one batched request and
+    searched concurrently, so retrieval takes about as long as for a single
+    query. Each query's results are cached the same way as
+    search_similar_documents'.
+
+    Args:
+        queries: Search texts; blank and repeated ones are skipped
+        filter: Metadata filter, usually {"workspace_id": ...}
+        top_k: Matches fetched per query, and merged matches returned
+        mode: Retrieval mode, as for search_similar_documents
+        weights: Per-query score weights (default 1.0 each)
+
+    Returns:
+        List of {"id", "score", "metadata"} match dicts, best first, deduplicated by ID
+    """
+    weights = weights or [1.0] * len(queries)
+    weighted: Dict[str, float] = {}
+    for query, weight in zip(queries, weights):
+        if query and query.strip():
+            query = " ".join(query.split())
+            weighted.setdefault(query, weight)
+    if not weighted:
         return []
 
-    # Generate query embedding
-    embedding = get_embedding(query)
+    mode = _resolve_mode(mode)
+    workspace_id, generation = await _cache_generation(filter)
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    if generation is not None:
+        for query in weighted:
+            matches = retrieval_cache.get(workspace_id, generation, retrieval_cache_key(query, top_k, filter, mode))
+            if matches is not None:
+                results[query] = matches
+
+    pending = [query for query in weighted if query not in results]
+    embeddings: Dict[str, List[float]] = {}
+    if pending and mode != "lexical":
+        started_at = time.perf_counter()
+        embeddings = dict(zip(pending, await get_embeddings(pending)))
+        RETRIEVAL_LEG_DURATION.labels(mode, "embedding").observe(time.perf_counter() - started_at)
 
-    # Search Pinecone
-    results = index.query(
-        vector=embedding,
-        top_k=top_k,
-        filter=filter,
-        include_metadata=True
-    )
+    searched = await asyncio.gather(*[
+        _search(query, filter, top_k, mode, embeddings.get(query)) for query in pending
+    ])
+    for query, (matches, complete) in zip(pending, searched):
+        results[query] = matches
+        if generation is not None and complete:
+            retrieval_cache.set(workspace_id, generation, retrieval_cache_key(query, top_k, filter, mode), matches)
 
-    return results.matches 
\ No newline at end of file
+    return merge_matches([results[query] for query in weighted], top_k, list(weighted.values()))
@@ -0,0 +1,133 @@
+import asyncio
+import signal
+import traceback
+from typing import Dict, Any, Callable, Awaitable
+from app.api.routes.content import process_content_generation, load_task, update_task
+from app.core.config import settings
+from app.utils.clients import clients
+from app.utils.job_queue import get_job_queue
+from app.utils.task_events import TERMINAL_STATUSES
+
+# Handlers get the payload and the reserved job (for its attempt counts); raising marks the attempt failed
+JobHandler = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[None]]
+
+async def handle_content_generation(payload: Dict[str, Any], job: Dict[str, Any]):
+    """Run a queued content generation task
+
+    Failures are re-raised so the queue retries them and dead-letters the
+    job after its last attempt; the task is only marked failed on that one.
+    """
+    # Redelivered after a run that finished but wasn't acked
+    task = await load_task(payload["task_id"])
+    if task["status"] in TERMINAL_STATUSES:
+        return
+
+    await process_content_generation(
+        payload["task_id"],
+        payload["request"],
+        payload["user_id"],
+        raise_errors=True,
+        final_attempt=job["attempts"] >= job["max_attempts"]
+    )
+
+async def fail_content_generation(payload: Dict[str, Any], job: Dict[str, Any]):
+    """Mark the task of a generation job dead-lettered mid-run (its worker died) as failed"""
+    task = await load_task(payload["task_id"])
+    if task["status"] in TERMINAL_STATUSES:
+        return
+
+    await update_task(payload["task_id"], {
+        "status": "failed",
+        "error": job.get("error") or "Generation stopped before finishing and ran out of attempts"
+    })
+
+# Job type -> handler
+HANDLERS: Dict[str, JobHandler] = {
+    "content_generation": handle_content_generation
+}
+
+# Job type -> cleanup for jobs the queue dead-lettered without a handler finishing them
+DEAD_LETTER_HANDLERS: Dict[str, JobHandler] = {
+    "content_generation": fail_content_generation
+}
+
+async def run_dead_letter(job: Dict[str, Any]):
+    """Let a dead-lettered job's type clean up after it"""
+    handler = DEAD_LETTER_HANDLERS.get(job["type"])
+    if handler is None:
+        return
+
+    try:
+        await handler(job["payload"], job)
+    except Exception as e:
+        print(f"Dead-letter cleanup for job {job['id']} ({job['type']}) failed: {str(e)}")
+
+async def run_job(job: Dict[str, Any]):
+    """Run one reserved job, keeping it invisible to other workers while it runs"""
+    queue = get_job_queue()
+    handler = HANDLERS.get(job["type"])
+
+    if handler is None:
+        await queue.fail({**job, "attempts": job["max_attempts"]}, f"No handler for job type: {job['type']}")
+        return
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(settings.JOB_VISIBILITY_TIMEOUT / 3)
+            await queue.extend(job, settings.JOB_VISIBILITY_TIMEOUT)
+
+    keepalive = asyncio.create_task(heartbeat())
+    try:
+        await handler(job["payload"], job)
+    except Exception as e:
+        print(f"Job {job['id']} ({job['type']}) failed on attempt {job['attempts']}: {str(e)}")
+        traceback.print_exc()
+        # Back off exponentially between attempts
+        await queue.fail(job, str(e), retry_delay=settings.JOB_RETRY_BACKOFF * 2 ** (job["attempts"] - 1))
+    else:
+        await queue.ack(job)
+    finally:
+        keepalive.cancel()
+
+async def worker_loop(stopping: asyncio.Event):
+    """Reserve and run jobs one at a time until asked to stop"""
+    queue = get_job_queue()
+
+    while not stopping.is_set():
+        try:
+            job = await queue.reserve(settings.JOB_VISIBILITY_TIMEOUT)
+        except Exception as e:
+            print(f"Error reserving job: {str(e)}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        if job.get("dead"):
+            await run_dead_letter(job)
+            continue
+
+        await run_job(job)
+
+async def run_worker(concurrency: int = None):
+    """Run worker loops until SIGINT/SIGTERM, then let in-flight jobs finish"""
+    concurrency = concurrency or settings.WORKER_CONCURRENCY
+    stopping = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    print(f"Worker started with concurrency {concurrency}")
+    try:
+        await asyncio.gather(*[worker_loop(stopping) for _ in range(concurrency)])
+    finally:
+        await clients.close_all()
+    print("Worker stopped")
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
@@ -1,152 +1,205 @@
 from app.agents.agent_definitions import create_ideation_agent, create_research_agent, create_content_agent, create_editor_agent
-from app.utils.vector_store import search_similar_documents
-from app.utils.supabase_client import supabase
-from typing import Dict, Any, List, Optional
+from app.utils.vector_store import search_similar_documents_multi
+from app.utils.db import db
+from app.utils.context_builder import rank_snippets, build_agent_context, fit_to_budget
+from app.core.config import settings
+from app.workflows.dag import Workflow, WorkflowError
+from typing import Dict, Any, List, Optional, Callable, Awaitable
 import json
-
-async def run_content_generation(params: Dict[str, Any]) -> Dict[str, Any]:
-    """Run the full content generation workflow
-
-    Args:
-        params: Dictionary containing content parameters
-            - topic: Content topic
-            - content_type: Type of content (blog, social_post, etc.)
-            - tone: Desired tone
-            - target_audience: Target audience
-            - key_points: Optional key points to include
-            - brand_profile: Optional brand guidelines
-            - workspace_id: Workspace ID
-
-    Returns:
-        Dictionary with the generated content and metadata
+import time
+
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Share of AGENT_CONTEXT_TOKEN_BUDGET each agent gets; the editor works mostly from the draft
+CONTEXT_BUDGET_SHARES = {
+    "ideation": 1.0,
+    "research": 1.0,
+    "content_creation": 1.0,
+    "editing": 0.5
+}
+
+async def run_agent_step(
+    step: str,
+    agent,
+    prompt: str,
+    on_event: Optional[EventCallback] = None,
+    prompt_tokens: Optional[int] = None
+) -> str:
+    """Run one agent step, streaming progress events if a callback is given
+
+    Emits step_started (with the prompt token count, if given), one token
+    event per streamed piece of output, and step_finished with the step
+    duration and the provider-reported token usage.
     """
-    try:
-        # Extract parameters
-        topic = params.get("topic")
-        content_type = params.get("content_type")
-        tone = params.get("tone")
-        target_audience = params.get("target_audience")
-        key_points = params.get("key_points", "")
-        brand_profile = params.get("brand_profile")
-        workspace_id = params.get("workspace_id")
-
-        if not topic or not content_type or not target_audience or not tone:
-            return {
-                "success": False,
-                "error": "Missing required parameters: topic, content_type, target_audience, and tone are required"
-            }
+    if on_event is None:
+        return await agent.run(prompt)
+
+    started_at = time.monotonic()
+    await on_event({"type": "step_started", "step": step, "prompt_tokens": prompt_tokens})
+
+    parts = []
+    async for token in agent.run_stream(prompt):
+        parts.append(token)
+        await on_event({"type": "token", "step": step, "content": token})
+
+    await on_event({
+        "type": "step_finished",
+        "step": step,
+        "duration_ms": round((time.monotonic() - started_at) * 1000),
+        "usage": agent.last_usage
+    })
+    return "".join(parts)
+
+async def fetch_brand_profile(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Use the brand profile from the params, or load the workspace's one"""
+    if state.get("brand_profile_override") is not None or not state.get("workspace_id"):
+        return state.get("brand_profile_override")
+
+    response = await db.table("brand_profiles").select("*").eq("workspace_id", state["workspace_id"]).limit(1).execute()
+    return response.data[0] if response.data else None
+
+def knowledge_queries(state: Dict[str, Any]) -> List[str]:
+    """Retrieval queries for a generation: the topic, then each key point and the audience"""
+    key_points = state.get("key_points") or []
+    if isinstance(key_points, str):
+        key_points = key_points.splitlines()
+
+    queries = [state["topic"], *[str(point) for point in key_points], state.get("target_audience") or ""]
+    queries = dict.fromkeys(query.strip() for query in queries if query.strip())
+    return list(queries)[:settings.AGENT_KNOWLEDGE_MAX_QUERIES]
+
+async def retrieve_knowledge(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Retrieve relevant knowledge snippets from the vector store, best first
+
+    The topic, key points and audience are searched together; matches for
+    the topic count fully, the others at AGENT_KNOWLEDGE_SECONDARY_WEIGHT.
+    """
+    if not state.get("workspace_id"):
+        return []
+
+    queries = knowledge_queries(state)
+    relevant_docs = await search_similar_documents_multi(
+        queries,
+        filter={"workspace_id": state["workspace_id"]},
+        top_k=settings.AGENT_KNOWLEDGE_TOP_K,
+        weights=[1.0] + [settings.AGENT_KNOWLEDGE_SECONDARY_WEIGHT] * (len(queries) - 1)
+    )
+
+    return rank_snippets([
+        {"text": doc["metadata"]["text"], "score": doc.get("score")}
+        for doc in relevant_docs
+        if "text" in doc["metadata"]
+    ])
+
+async def build_context(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Collect the brand context and knowledge snippets each agent's context is assembled from"""
+    brand_profile = state.get("brand_profile")
+    brand_context = ""
+    if brand_profile:
+        brand_context = f"""
+        Brand Name: {brand_profile.get('name', '')}
+        Brand Voice: {brand_profile.get('voice', '')}
+        """
 
-        # Step 1: Retrieve relevant knowledge from vector store
-        knowledge_context = ""
-        if workspace_id:
-            # Convert workspace_id to string if it's not already
-            if not isinstance(workspace_id, str):
-                workspace_id = str(workspace_id)
-
-            relevant_docs = await search_similar_documents(
-                query=topic,
-                filter={"workspace_id": workspace_id},
-                top_k=3
-            )
-
-            if relevant_docs:
-                knowledge_context = "Relevant information from knowledge base:\n\n"
-                for i, doc in enumerate(relevant_docs):
-                    if "metadata" in doc and "text" in doc.metadata:
-                        knowledge_context += f"Document {i+1}:\n{doc.metadata['text']}\n\n"
-
-        # Step 2: Prepare brand context
-        brand_context = ""
-        if brand_profile:
-            brand_context = f"""
-            Brand Name: {brand_profile.get('name', '')}
-            Brand Voice: {brand_profile.get('voice', '')}
-            """
-
-            if "guidelines" in brand_profile and brand_profile["guidelines"]:
-                # Parse JSON string if needed
-                guidelines = brand_profile["guidelines"]
-                if isinstance(guidelines, str):
-                    try:
-                        guidelines = json.loads(guidelines)
-                    except:
-                        guidelines = {"raw": guidelines}
-
-                if isinstance(guidelines, dict):
-                    if "keyMessages" in guidelines:
-                        brand_context += f"Key Messages: {guidelines['keyMessages']}\n"
-                    if "toneGuidelines" in guidelines:
-                        brand_context += f"Tone Guidelines: {guidelines['toneGuidelines']}\n"
-
-        # Step 3: Combine contexts
-        full_context = f"{knowledge_context}\n{brand_context}".strip()
-
-        # Step 4: Run ideation agent
-        ideation_agent = create_ideation_agent()
-        if full_context:
-            ideation_agent.add_knowledge_context(full_context)
-
-        ideation_prompt = f"""
-        Create content ideas for a {content_type} about "{topic}" targeting {target_audience}.
-        The tone should be {tone}.
+        if "guidelines" in brand_profile and brand_profile["guidelines"]:
+            # Parse JSON string if needed
+            guidelines = brand_profile["guidelines"]
+            if isinstance(guidelines, str):
+                try:
+                    guidelines = json.loads(guidelines)
+                except:
+                    guidelines = {"raw": guidelines}
+
+            if isinstance(guidelines, dict):
+                if "keyMessages" in guidelines:
+                    brand_context += f"Key Messages: {guidelines['keyMessages']}\n"
+                if "toneGuidelines" in guidelines:
+                    brand_context += f"Tone Guidelines: {guidelines['toneGuidelines']}\n"
+
+    return {"brand": brand_context, "snippets": state.get("knowledge") or []}
+
+def step_input(state: Dict[str, Any], step: str, model: str) -> str:
+    """An earlier step's output, trimmed to the per-step input budget"""
+    return fit_to_budget(state.get(step) or "", settings.AGENT_STEP_INPUT_TOKEN_BUDGET, model)
+
+def agent_node(step: str, create_agent, build_prompt: Callable[[Dict[str, Any], str], str], budget_step: Optional[str] = None):
+    """Make a workflow node that runs an agent on a prompt built from the state
+
+    The agent gets its own token-budgeted slice of the shared context, sized
+    by CONTEXT_BUDGET_SHARES[budget_step or step], and its prompt token count
+    is recorded in state["prompt_tokens"] and the provider-reported usage
+    (including prefix-cached tokens) in state["token_usage"].
+    """
+    async def run(state: Dict[str, Any]) -> str:
+        agent = create_agent(state.get("workspace_id"))
+        context = state.get("context")
+        if context:
+            budget = int(settings.AGENT_CONTEXT_TOKEN_BUDGET * CONTEXT_BUDGET_SHARES.get(budget_step or step, 1.0))
+            agent.add_knowledge_context(build_agent_context(context["brand"], context["snippets"], budget, agent.model))
+
+        prompt = build_prompt(state, agent.model)
+        prompt_tokens = agent.count_prompt_tokens(prompt)
+        if state.get("prompt_tokens") is not None:
+            state["prompt_tokens"][step] = prompt_tokens
+
+        output = await run_agent_step(step, agent, prompt, state.get("on_event"), prompt_tokens)
+        if state.get("token_usage") is not None:
+            state["token_usage"][step] = agent.last_usage
+        return output
+
+    return run
+
+def ideation_prompt(variant: int = 0, variants: int = 1):
+    def build(state: Dict[str, Any], model: str) -> str:
+        key_points = state.get("key_points")
+        angle = f"This is approach set {variant} of {variants}; favour angles the other sets are unlikely to take." if variants > 1 else ""
+        return f"""
+        Create content ideas for a {state["content_type"]} about "{state["topic"]}" targeting {state["target_audience"]}.
+        The tone should be {state["tone"]}.
         {f"Include these key points: {key_points}" if key_points else ""}
 
         Provide 3-5 creative approaches to this topic.
+        {angle}
         """
 
-        ideas = await ideation_agent.run(ideation_prompt)
+    return build
 
-        # Step 5: Run research agent
-        research_agent = create_research_agent()
-        if full_context:
-            research_agent.add_knowledge_context(full_context)
-
-        research_prompt = f"""
-        Research the topic: "{topic}" for a {content_type} targeting {target_audience}.
+def research_prompt(state: Dict[str, Any], model: str) -> str:
+    return f"""
+        Research the topic: "{state["topic"]}" for a {state["content_type"]} targeting {state["target_audience"]}.
 
         Use these content ideas as a guide:
-        {ideas}
+        {step_input(state, "ideation", model)}
 
         Provide key facts, statistics, insights, and analysis that would support creating
         compelling content on this topic.
         """
 
-        research = await research_agent.run(research_prompt)
-
-        # Step 6: Run content creation agent
-        content_agent = create_content_agent()
-        if full_context:
-            content_agent.add_knowledge_context(full_context)
-
-        content_prompt = f"""
-        Create a {content_type} about "{topic}" for {target_audience} with a {tone} tone.
+def content_prompt(state: Dict[str, Any], model: str) -> str:
+    key_points = state.get("key_points")
+    research = step_input(state, "research", model)
+    return f"""
+        Create a {state["content_type"]} about "{state["topic"]}" for {state["target_audience"]} with a {state["tone"]} tone.
 
         Use these ideas as inspiration:
-        {ideas}
+        {step_input(state, "ideation", model)}
 
-        And incorporate this research:
-        {research}
+        {f"And incorporate this research:{chr(10)}{research}" if research else ""}
 
         {f"Make sure to include these key points: {key_points}" if key_points else ""}
 
-        Format the content appropriately for a {content_type}, including headlines, subheadings,
+        Format the content appropriately for a {state["content_type"]}, including headlines, subheadings,
         and proper structure. Use HTML formatting for the structure.
         """
 
-        draft_content = await content_agent.run(content_prompt)
-
-        # Step 7: Run editor agent
-        editor_agent = create_editor_agent()
-        if full_context:
-            editor_agent.add_knowledge_context(full_context)
-
-        editor_prompt = f"""
-        Review and improve this {content_type} content:
+def editor_prompt(state: Dict[str, Any], model: str) -> str:
+    return f"""
+        Review and improve this {state["content_type"]} content:
 
-        {draft_content}
+        {state["content_creation"]}
 
         Make sure it:
-        - Has a {tone} tone appropriate for {target_audience}
+        - Has a {state["tone"]} tone appropriate for {state["target_audience"]}
         - Is well-structured and engaging
         - Has a strong headline and clear subheadings
         - Includes all necessary key points
@@ -154,18 +207,122 @@ async def run_content_generation(params: Dict[str, Any]) -> Dict[str, Any]:
         - Maintains HTML formatting
         """
 
-        final_content = await editor_agent.run(editor_prompt)
+def build_content_workflow(name: str = "content", ideation_variants: int = 1) -> Workflow:
+    """Build the content generation graph
+
+    brand_profile and knowledge run concurrently and feed context. With more
+    than one ideation variant, the variants run concurrently and their ideas
+    are merged into the ideation output.
+    """
+    workflow = Workflow(name)
+    workflow.add("brand_profile", fetch_brand_profile)
+    workflow.add("knowledge", retrieve_knowledge)
+    workflow.add("context", build_context, depends_on=["brand_profile", "knowledge"])
+
+    if ideation_variants > 1:
+        variants = [f"ideation_{i}" for i in range(1, ideation_variants + 1)]
+        for i, variant in enumerate(variants, start=1):
+            workflow.add(variant, agent_node(variant, create_ideation_agent, ideation_prompt(i, ideation_variants), budget_step="ideation"), depends_on=["context"])
+
+        async def merge_ideas(state: Dict[str, Any]) -> str:
+            return "\n\n".join(f"Idea set {i}:\n{state[variant]}" for i, variant in enumerate(variants, start=1))
+
+        workflow.add("ideation", merge_ideas, depends_on=variants)
+    else:
+        workflow.add("ideation", agent_node("ideation", create_ideation_agent, ideation_prompt()), depends_on=["context"])
+
+    workflow.add("research", agent_node("research", create_research_agent, research_prompt), depends_on=["ideation"])
+    workflow.add("content_creation", agent_node("content_creation", create_content_agent, content_prompt), depends_on=["ideation", "research"])
+    workflow.add("editing", agent_node("editing", create_editor_agent, editor_prompt), depends_on=["content_creation"])
+    return workflow
+
+# Default graph, used for every content type unless one is mapped to a variant
+CONTENT_WORKFLOW = build_content_workflow()
+# Variant that skips the research pass, for content short enough not to need it
+CONTENT_WORKFLOW_WITHOUT_RESEARCH = CONTENT_WORKFLOW.without("content_without_research", "research")
+# Per content type overrides, e.g. {"social_post": CONTENT_WORKFLOW_WITHOUT_RESEARCH}
+CONTENT_TYPE_WORKFLOWS: Dict[str, Workflow] = {}
+
+# Upper bound on concurrent ideation passes; also bounds the step names seen by metrics
+MAX_IDEATION_VARIANTS = 5
+
+def get_content_workflow(content_type: str, ideation_variants: int = 1) -> Workflow:
+    """Pick the workflow for a content type"""
+    workflow = CONTENT_TYPE_WORKFLOWS.get(content_type, CONTENT_WORKFLOW)
+    ideation_variants = min(ideation_variants, MAX_IDEATION_VARIANTS)
+    if ideation_variants > 1:
+        variants = build_content_workflow(workflow.name, ideation_variants)
+        # Drop the same nodes the content type's workflow skips
+        removed = [node for node in CONTENT_WORKFLOW.nodes if node not in workflow.nodes]
+        workflow = variants.without(workflow.name, *removed) if removed else variants
+    return workflow
+
+async def run_content_generation(params: Dict[str, Any], on_event: Optional[EventCallback] = None) -> Dict[str, Any]:
+    """Run the full content generation workflow
+
+    Args:
+        params: Dictionary containing content parameters
+            - topic: Content topic
+            - content_type: Type of content (blog, social_post, etc.)
+            - tone: Desired tone
+            - target_audience: Target audience
+            - key_points: Optional key points to include
+            - brand_profile: Optional brand guidelines; loaded from the workspace if omitted
+            - workspace_id: Workspace ID
+            - ideation_variants: Optional number of ideation passes to run concurrently
+        on_event: Optional coroutine called with step and token events as the workflow runs
+
+    Returns:
+        Dictionary with the generated content, metadata and per-step timings
+    """
+    try:
+        content_type = params.get("content_type")
+        if hasattr(content_type, "value"):
+            content_type = content_type.value
+
+        if not params.get("topic") or not content_type or not params.get("target_audience") or not params.get("tone"):
+            return {
+                "success": False,
+                "error": "Missing required parameters: topic, content_type, target_audience, and tone are required"
+            }
+
+        workspace_id = params.get("workspace_id")
+        workflow = get_content_workflow(content_type, int(params.get("ideation_variants") or 1))
+        result = await workflow.run({
+            "topic": params.get("topic"),
+            "content_type": content_type,
+            "tone": params.get("tone"),
+            "target_audience": params.get("target_audience"),
+            "key_points": params.get("key_points") or "",
+            "brand_profile_override": params.get("brand_profile"),
+            "workspace_id": str(workspace_id) if workspace_id else None,
+            "on_event": on_event,
+            "prompt_tokens": {},
+            "token_usage": {}
+        })
+        state = result["state"]
 
         return {
             "success": True,
-            "content": final_content,
-            "ideas": ideas,
-            "research": research,
-            "workflow_steps": ["ideation", "research", "content_creation", "editing"]
+            "content": state["editing"],
+            "ideas": state["ideation"],
+            "research": state.get("research"),
+            "workflow": workflow.name,
+            "workflow_steps": sorted(result["timings"], key=lambda node: result["timings"][node]["started_ms"]),
+            "step_timings": result["timings"],
+            "prompt_tokens": state["prompt_tokens"],
+            "token_usage": state["token_usage"],
+            "duration_ms": result["duration_ms"]
         }
 
+    except WorkflowError as e:
+        return {
+            "success": False,
+            "error": str(e),
+            "failed_step": e.node
+        }
     except Exception as e:
         return {
             "success": False,
             "error": str(e)
-        } 
\ No newline at end of file
+        }
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from app.utils.metrics import WORKFLOW_STEP_DURATION, WORKFLOW_STEPS_IN_FLIGHT
+
+# A node receives the workflow state (input params plus the outputs of every
+# finished node, keyed by node name) and returns its own output
+NodeFunction = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+class WorkflowError(Exception):
+    """Raised when a workflow node fails; carries the failing node's name"""
+
+    def __init__(self, node: str, error: Exception):
+        super().__init__(f"Step '{node}' failed: {str(error)}")
+        self.node = node
+        self.error = error
+
+class Workflow:
+    """A directed acyclic graph of async steps
+
+    Every node starts as soon as all of its dependencies have finished, so
+    independent nodes run concurrently. Workflows are built by chaining
+    add() calls and can be copied and edited with without()/replace() to
+    declare variants.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, name: str, func: NodeFunction, depends_on: Optional[List[str]] = None) -> "Workflow":
+        """Add a node
+
+        Args:
+            name: Unique node name, also the key of its output in the state
+            func: Coroutine function taking the state and returning the node output
+            depends_on: Names of nodes that must finish first
+
+        Returns:
+            The workflow, for chaining
+        """
+        if name in self.nodes:
+            raise ValueError(f"Workflow '{self.name}' already has a node named '{name}'")
+
+        for dependency in depends_on or []:
+            if dependency not in self.nodes:
+                raise ValueError(f"Node '{name}' depends on unknown node '{dependency}'")
+
+        self.nodes[name] = {"func": func, "depends_on": list(depends_on or [])}
+        return self
+
+    def copy(self, name: str) -> "Workflow":
+        """Copy the workflow under a new name"""
+        workflow = Workflow(name)
+        workflow.nodes = {node: {**spec, "depends_on": list(spec["depends_on"])} for node, spec in self.nodes.items()}
+        return workflow
+
+    def without(self, name: str, *nodes: str) -> "Workflow":
+        """Copy the workflow without the given nodes
+
+        Dependents of a removed node inherit its dependencies, and read None
+        for its output.
+        """
+        workflow = self.copy(name)
+        for node in nodes:
+            removed = workflow.nodes.pop(node)
+            for spec in workflow.nodes.values():
+                if node in spec["depends_on"]:
+                    spec["depends_on"].remove(node)
+                    spec["depends_on"] += [d for d in removed["depends_on"] if d not in spec["depends_on"]]
+        return workflow
+
+    def replace(self, name: str, node: str, func: NodeFunction) -> "Workflow":
+        """Copy the workflow with one node's function swapped out"""
+        workflow = self.copy(name)
+        workflow.nodes[node]["func"] = func
+        return workflow
+
+    async def run(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the workflow to completion
+
+        Args:
+            params: Initial state visible to every node
+
+        Returns:
+            Dictionary with the final state and per-node timings
+            ({"started_ms", "duration_ms"} relative to the workflow start)
+
+        Raises:
+            WorkflowError: If any node fails; nodes still running are cancelled
+        """
+        state = dict(params)
+        for node in self.nodes:
+            state.setdefault(node, None)
+
+        timings: Dict[str, Dict[str, int]] = {}
+        remaining = dict(self.nodes)
+        done = set()
+        running: Dict[asyncio.Task, str] = {}
+        started_at = time.monotonic()
+
+        async def run_node(node: str):
+            node_started = time.monotonic()
+            outcome = "error"
+            WORKFLOW_STEPS_IN_FLIGHT.labels(node).inc()
+            try:
+                state[node] = await self.nodes[node]["func"](state)
+                outcome = "ok"
+            finally:
+                elapsed = time.monotonic() - node_started
+                WORKFLOW_STEPS_IN_FLIGHT.labels(node).dec()
+                WORKFLOW_STEP_DURATION.labels(self.name, node, outcome).observe(elapsed)
+                timings[node] = {
+                    "started_ms": round((node_started - started_at) * 1000),
+                    "duration_ms": round(elapsed * 1000)
+                }
+
+        try:
+            while remaining or running:
+                for node, spec in list(remaining.items()):
+                    if all(dependency in done for dependency in spec["depends_on"]):
+                        running[asyncio.create_task(run_node(node))] = node
+                        del remaining[node]
+
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    node = running.pop(task)
+                    if task.exception() is not None:
+                        raise WorkflowError(node, task.exception())
+                    done.add(node)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return {
+            "state": state,
+            "timings": timings,
+            "duration_ms": round((time.monotonic() - started_at) * 1000)
+        }
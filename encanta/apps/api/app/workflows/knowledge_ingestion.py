@@ -0,0 +1,258 @@
+from app.core.config import settings
+from app.utils.storage import split_storage_path, download_to_file
+from app.utils.text_extraction import extract_text
+from app.utils.embedding_cache import text_hash
+from app.utils.vector_store import get_embeddings, build_vector, upsert_vectors, delete_vectors, index_lexical
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+import asyncio
+import tempfile
+import time
+
+# Marks the end of a stage's output
+_DONE = object()
+
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class TextChunker:
+    """Incrementally split streamed text into overlapping chunks
+
+    Only the text that has not been emitted yet (plus the overlap) is kept,
+    so memory stays bounded by the chunk size regardless of document size.
+    """
+
+    def __init__(self, chunk_size: int = 1000, overlap: int = 150):
+        self.chunk_size = chunk_size
+        self.overlap = min(overlap, chunk_size // 2)
+        self.buffer = ""
+
+    def _split_point(self) -> int:
+        """Find where to cut the buffer, preferring paragraph, line and word breaks"""
+        window = self.buffer[:self.chunk_size]
+        for separator in ("\n\n", "\n", ". ", " "):
+            cut = window.rfind(separator)
+            if cut > self.chunk_size // 2:
+                return cut + len(separator)
+        return self.chunk_size
+
+    def feed(self, text: str) -> List[str]:
+        """Add text and return any chunks that are now complete"""
+        self.buffer += text
+        chunks = []
+
+        while len(self.buffer) >= self.chunk_size:
+            cut = self._split_point()
+            chunk = self.buffer[:cut].strip()
+            if chunk:
+                chunks.append(chunk)
+            self.buffer = self.buffer[max(cut - self.overlap, 1):]
+
+        return chunks
+
+    def flush(self) -> List[str]:
+        """Return the remaining text as a final chunk"""
+        chunk = self.buffer.strip()
+        self.buffer = ""
+        return [chunk] if chunk else []
+
+async def _extract_stage(path: str, file_type: str, out_queue: asyncio.Queue, stats: Dict[str, Any]):
+    """Extract text page by page (in the extraction process pool) and feed it into the queue"""
+    async for piece in extract_text(path, file_type, stats):
+        # Waits while the queue is full, which also pauses extraction
+        await out_queue.put(piece)
+        stats["characters_extracted"] += len(piece)
+
+    await out_queue.put(_DONE)
+
+def chunk_vector_id(file_id: str, chunk_hash: str) -> str:
+    """Vector ID of a chunk; derived from its content so unchanged chunks keep their vectors"""
+    return f"{file_id}:{chunk_hash[:32]}"
+
+def previous_vector_ids(file_record: Dict[str, Any]) -> List[str]:
+    """IDs of the vectors stored by the file's last successful ingestion"""
+    manifest = file_record.get("chunk_manifest")
+    if manifest is not None:
+        return [chunk_vector_id(file_record["id"], chunk_hash) for chunk_hash in manifest]
+
+    # Files ingested before manifests existed used positional IDs
+    chunks = (file_record.get("processing_stats") or {}).get("chunks_created") or 0
+    return [f"{file_record['id']}:{index}" for index in range(chunks)]
+
+async def _chunk_stage(file_record: Dict[str, Any], in_queue: asyncio.Queue, out_queue: asyncio.Queue, stats: Dict[str, Any], manifest: List[str]):
+    """Split extracted text into chunks and group the new ones into embedding batches
+
+    Every chunk's hash is appended to manifest. Chunks whose hash was in the
+    previous manifest already have a vector and are not embedded again, but
+    are still written to the lexical index (which may have been enabled
+    since, or lost). Repeats within the file are skipped.
+    """
+    chunker = TextChunker(settings.INGEST_CHUNK_SIZE, settings.INGEST_CHUNK_OVERLAP)
+    previous = set(file_record.get("chunk_manifest") or [])
+    seen = set()
+    batch = []
+    unchanged = []
+
+    async def emit(texts: List[str]):
+        nonlocal batch, unchanged
+        for text in texts:
+            chunk_hash = text_hash(text)
+            stats["chunks_created"] += 1
+            if chunk_hash in seen:
+                continue
+            seen.add(chunk_hash)
+            manifest.append(chunk_hash)
+
+            chunk = {
+                "text": text,
+                "metadata": {
+                    "id": chunk_vector_id(file_record["id"], chunk_hash),
+                    "workspace_id": str(file_record["workspace_id"]),
+                    "file_id": str(file_record["id"]),
+                    "chunk_index": stats["chunks_created"] - 1
+                }
+            }
+
+            if chunk_hash in previous:
+                stats["chunks_unchanged"] += 1
+                unchanged.append(build_vector(text, [], chunk["metadata"]))
+                if len(unchanged) >= settings.INGEST_EMBED_BATCH_SIZE:
+                    await index_lexical(unchanged)
+                    unchanged = []
+                continue
+
+            batch.append(chunk)
+            if len(batch) >= settings.INGEST_EMBED_BATCH_SIZE:
+                await out_queue.put(batch)
+                batch = []
+
+    while True:
+        piece = await in_queue.get()
+        if piece is _DONE:
+            break
+        await emit(chunker.feed(piece))
+
+    await emit(chunker.flush())
+    await index_lexical(unchanged)
+    if batch:
+        await out_queue.put(batch)
+    await out_queue.put(_DONE)
+
+async def _embed_stage(in_queue: asyncio.Queue, out_queue: asyncio.Queue, stats: Dict[str, Any]):
+    """Embed each chunk batch with a single request"""
+    while True:
+        batch = await in_queue.get()
+        if batch is _DONE:
+            break
+
+        embeddings = await get_embeddings([chunk["text"] for chunk in batch])
+        vectors = [
+            build_vector(chunk["text"], embedding, chunk["metadata"])
+            for chunk, embedding in zip(batch, embeddings)
+        ]
+        stats["chunks_embedded"] += len(vectors)
+        await out_queue.put(vectors)
+
+    await out_queue.put(_DONE)
+
+async def _upsert_stage(in_queue: asyncio.Queue, stats: Dict[str, Any], report: Callable[[bool], Awaitable[None]]):
+    """Upsert embedded batches into the vector store and report progress"""
+    while True:
+        vectors = await in_queue.get()
+        if vectors is _DONE:
+            break
+
+        result = await upsert_vectors(vectors)
+        if result["status"] == "error":
+            raise RuntimeError(f"Failed to store vectors: {result['reason']}")
+
+        stats["vectors_upserted"] += len(vectors)
+        await report(False)
+
+async def run_knowledge_ingestion(file_record: Dict[str, Any], on_progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """Download, extract, chunk, embed and store a knowledge file
+
+    The stages run concurrently and are connected by bounded queues, so only a
+    few pages of text and a few batches of embeddings are in memory at once.
+
+    Re-ingestion is incremental: chunks listed in the record's chunk_manifest
+    keep their vectors (and are only rewritten to the lexical index), only
+    new or changed chunks are embedded and upserted, and vectors of chunks
+    that disappeared are deleted once the new ones are stored. The caller
+    saves the returned manifest for the next run.
+
+    Args:
+        file_record: The knowledge_files row to ingest
+        on_progress: Optional coroutine called with throughput stats as batches are stored
+
+    Returns:
+        {"stats": final ingestion stats, "chunk_manifest": hashes of the file's distinct chunks in order}
+    """
+    started_at = time.monotonic()
+    last_report = 0.0
+    stats = {
+        "bytes_downloaded": 0,
+        "characters_extracted": 0,
+        "chunks_created": 0,
+        "chunks_unchanged": 0,
+        "chunks_embedded": 0,
+        "vectors_upserted": 0,
+        "vectors_deleted": 0,
+        "pages_extracted": 0,
+        "extraction_seconds": 0.0,
+        "elapsed_seconds": 0.0,
+        "chunks_per_second": 0.0,
+        "pages_per_second": 0.0,
+        "extraction_bytes_per_second": 0.0
+    }
+
+    async def report(final: bool):
+        nonlocal last_report
+        elapsed = time.monotonic() - started_at
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        stats["chunks_per_second"] = round(stats["vectors_upserted"] / elapsed, 2) if elapsed else 0.0
+        # Extraction throughput over the time spent extracting, not waiting on later stages
+        extraction_seconds = stats["extraction_seconds"]
+        stats["pages_per_second"] = round(stats["pages_extracted"] / extraction_seconds, 2) if extraction_seconds else 0.0
+        stats["extraction_bytes_per_second"] = round(stats["bytes_downloaded"] / extraction_seconds) if extraction_seconds else 0.0
+
+        # Throttle progress writes so large files don't hammer the database
+        if on_progress and (final or elapsed - last_report >= settings.INGEST_PROGRESS_INTERVAL):
+            last_report = elapsed
+            await on_progress(dict(stats))
+
+    bucket, path = split_storage_path(file_record["storage_path"])
+    manifest: List[str] = []
+
+    with tempfile.NamedTemporaryFile(suffix=f"-{file_record['id']}") as tmp:
+        # Stage 1: stream the file to disk rather than holding it in memory
+        stats["bytes_downloaded"] = await download_to_file(bucket, path, tmp)
+        tmp.flush()
+
+        text_queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        chunk_queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+        vector_queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_SIZE)
+
+        tasks = [
+            asyncio.create_task(_extract_stage(tmp.name, file_record["file_type"], text_queue, stats)),
+            asyncio.create_task(_chunk_stage(file_record, text_queue, chunk_queue, stats, manifest)),
+            asyncio.create_task(_embed_stage(chunk_queue, vector_queue, stats)),
+            asyncio.create_task(_upsert_stage(vector_queue, stats, report))
+        ]
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # On failure, cancel the remaining stages (extraction included)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Only now that every current chunk is stored, drop the vectors of chunks that are gone
+    current_ids = {chunk_vector_id(file_record["id"], chunk_hash) for chunk_hash in manifest}
+    removed_ids = [vector_id for vector_id in previous_vector_ids(file_record) if vector_id not in current_ids]
+    result = await delete_vectors(removed_ids, str(file_record["workspace_id"]))
+    if result["status"] == "error":
+        raise RuntimeError(f"Failed to delete stale vectors: {result['reason']}")
+    stats["vectors_deleted"] = len(removed_ids)
+
+    await report(True)
+    return {"stats": stats, "chunk_manifest": manifest}
@@ -0,0 +1,333 @@
+"""In-process stand-ins for OpenAI, PostgREST and the vector index
+
+They implement just enough of each service for the API's hot paths, with
+configurable latency, so load tests measure our own code instead of paid
+services and the network. Nothing here is used by the app itself.
+"""
+import asyncio
+import hashlib
+import json
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional, Callable
+import httpx
+import numpy as np
+from app.utils.db import PooledPostgrestClient
+from app.utils.local_vector_store import _matches_filter
+from app.utils.metrics import InstrumentedTransport
+from app.utils.vector_store import VectorStore
+
+FILLER_WORDS = "the quick brown fox jumps over a lazy dog while our brand voice stays clear".split()
+
+class FakeOpenAI:
+    """Async OpenAI client stand-in for chat completions and embeddings
+
+    Chat responses arrive after latency seconds and then at tokens_per_second
+    (streamed or not); embeddings are deterministic unit vectors derived
+    from the text, so identical text always embeds identically.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        tokens_per_second: float = 1000,
+        completion_tokens: int = 50,
+        embedding_latency: float = 0.01,
+        dimension: int = 1536
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.embedding_latency = embedding_latency
+        self.dimension = dimension
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+        self.embeddings = SimpleNamespace(create=self._create_embeddings)
+
+    def _usage(self, messages: List[Dict[str, Any]]):
+        # Roughly four characters per token, like the real tokenizer on English text
+        prompt_tokens = sum(len(message.get("content") or "") for message in messages) // 4
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=0)
+        )
+
+    def _tokens(self) -> List[str]:
+        return [FILLER_WORDS[i % len(FILLER_WORDS)] + " " for i in range(self.completion_tokens)]
+
+    async def _create_completion(self, model: str, messages: List[Dict[str, Any]], stream: bool = False, **kwargs):
+        await asyncio.sleep(self.latency)
+
+        if not stream:
+            await asyncio.sleep(self.completion_tokens / self.tokens_per_second)
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content="".join(self._tokens())))],
+                usage=self._usage(messages)
+            )
+
+        async def chunks():
+            for token in self._tokens():
+                await asyncio.sleep(1 / self.tokens_per_second)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))], usage=None)
+            # Like the real API with include_usage, the last chunk has usage and no choices
+            yield SimpleNamespace(choices=[], usage=self._usage(messages))
+
+        return chunks()
+
+    def embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    async def _create_embeddings(self, model: str, input: List[str], **kwargs):
+        await asyncio.sleep(self.embedding_latency)
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=self.embed(text)) for i, text in enumerate(input)
+        ])
+
+    async def close(self):
+        pass
+
+class InMemoryVectorStore(VectorStore):
+    """Brute-force cosine index held in a list, with Pinecone-style metadata filters"""
+
+    def __init__(self):
+        self.vectors: Dict[str, Dict[str, Any]] = {}
+
+    async def upsert(self, vectors: List[Dict[str, Any]]):
+        for vector in vectors:
+            values = np.asarray(vector["values"], dtype=np.float32)
+            self.vectors[vector["id"]] = {**vector, "values": values / (np.linalg.norm(values) or 1)}
+
+    async def query(self, vector: List[float], top_k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        candidates = [item for item in self.vectors.values() if _matches_filter(item["metadata"], filter)]
+        if not candidates:
+            return []
+
+        query = np.asarray(vector, dtype=np.float32)
+        scores = np.stack([item["values"] for item in candidates]) @ (query / (np.linalg.norm(query) or 1))
+        best = np.argsort(-scores)[:top_k]
+        return [
+            {"id": candidates[i]["id"], "score": float(scores[i]), "metadata": candidates[i]["metadata"]}
+            for i in best
+        ]
+
+    async def delete(self, ids: List[str], workspace_id: Optional[str] = None):
+        for id_ in ids:
+            self.vectors.pop(id_, None)
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, quoted, current = [], 0, False, []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and quoted and i + 1 < len(text):
+            current.append(text[i:i + 2])
+            i += 2
+            continue
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current).strip())
+            current = []
+            i += 1
+            continue
+        current.append(char)
+        i += 1
+    if current:
+        parts.append("".join(current).strip())
+    return parts
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+def _compare(row_value: Any, operator: str, value: str) -> bool:
+    if operator == "is":
+        return (row_value is None) if value == "null" else str(row_value).lower() == value
+    if row_value is None:
+        return False
+    if operator == "in":
+        return str(row_value) in [_unquote(item) for item in _split_top_level(value.strip("()"))]
+    if isinstance(row_value, bool):
+        row_value = "true" if row_value else "false"
+    if isinstance(row_value, (int, float)) and not isinstance(row_value, bool):
+        value = float(value)
+    else:
+        row_value = str(row_value)
+    return {
+        "eq": lambda: row_value == value,
+        "neq": lambda: row_value != value,
+        "gt": lambda: row_value > value,
+        "gte": lambda: row_value >= value,
+        "lt": lambda: row_value < value,
+        "lte": lambda: row_value <= value,
+    }[operator]()
+
+def _parse_condition(condition: str) -> Callable[[Dict[str, Any]], bool]:
+    """Parse one "column.operator.value" term or an and(...)/or(...) group"""
+    negate = condition.startswith("not.")
+    if negate:
+        condition = condition[len("not."):]
+
+    for group, combine in (("and(", all), ("or(", any)):
+        if condition.startswith(group):
+            terms = [_parse_condition(term) for term in _split_top_level(condition[len(group):-1])]
+            predicate = lambda row, terms=terms, combine=combine: combine(term(row) for term in terms)
+            break
+    else:
+        column, operator, value = condition.split(".", 2)
+        value = _unquote(value)
+        predicate = lambda row: _compare(row.get(column), operator, value)
+
+    return (lambda row: not predicate(row)) if negate else predicate
+
+class FakePostgREST(httpx.AsyncBaseTransport):
+    """httpx transport serving a PostgREST-compatible subset from in-memory tables
+
+    Supports select lists with one level of embedding (many-to-one through
+    <table>_id, one-to-many otherwise), eq/neq/gt/gte/lt/lte/in/is filters,
+    or/and logic trees, order, limit/offset, single-object responses, and
+    insert (with upsert), update and delete with return=representation.
+    """
+
+    def __init__(self, latency: float = 0.002):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+
+    def insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Add rows directly, filling in id and timestamps like the real schema's defaults"""
+        now = datetime.now(timezone.utc).isoformat()
+        stored = [{"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **row} for row in rows]
+        self.tables.setdefault(table, []).extend(stored)
+        return stored
+
+    def _filters(self, params: httpx.QueryParams) -> List[Callable[[Dict[str, Any]], bool]]:
+        filters = []
+        for key, value in params.multi_items():
+            if key in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            if key in ("or", "and"):
+                filters.append(_parse_condition(f"{key}{value}"))
+            else:
+                filters.append(_parse_condition(f"{key}.{value}"))
+        return filters
+
+    def _project(self, table: str, row: Dict[str, Any], select: str) -> Dict[str, Any]:
+        projected = {}
+        for item in _split_top_level(select or "*"):
+            if item == "*":
+                projected.update(row)
+            elif "(" in item:
+                embedded, columns = item[:-1].split("(", 1)
+                foreign_key = f"{embedded.rstrip('s')}_id"
+                if foreign_key in row:
+                    match = next((other for other in self.tables.get(embedded, []) if other.get("id") == row[foreign_key]), None)
+                    projected[embedded] = self._project(embedded, match, columns) if match else None
+                else:
+                    back_key = f"{table.rstrip('s')}_id"
+                    projected[embedded] = [
+                        self._project(embedded, other, columns)
+                        for other in self.tables.get(embedded, []) if other.get(back_key) == row.get("id")
+                    ]
+            else:
+                projected[item] = row.get(item)
+        return projected
+
+    def _select(self, table: str, params: httpx.QueryParams) -> List[Dict[str, Any]]:
+        filters = self._filters(params)
+        rows = [row for row in self.tables.get(table, []) if all(match(row) for match in filters)]
+
+        order = params.get("order")
+        if order:
+            # Sort by the last key first so earlier keys take precedence
+            for term in reversed(order.split(",")):
+                column, _, direction = term.partition(".")
+                rows.sort(key=lambda row: (row.get(column) is None, row.get(column) or ""), reverse=direction.startswith("desc"))
+
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        return rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+
+    def _respond(self, request: httpx.Request, status: int, rows: List[Dict[str, Any]]) -> httpx.Response:
+        if request.headers.get("accept", "").startswith("application/vnd.pgrst.object+json"):
+            if len(rows) != 1:
+                return httpx.Response(406, json={
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "details": f"Results contain {len(rows)} rows",
+                    "hint": None
+                })
+            return httpx.Response(status, json=rows[0])
+        return httpx.Response(status, json=rows)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        table = request.url.path.rstrip("/").rsplit("/", 1)[-1]
+        params = request.url.params
+        prefer = request.headers.get("prefer", "")
+        representation = "return=representation" in prefer
+        body = json.loads(request.content) if request.content else None
+
+        if request.method in ("GET", "HEAD"):
+            rows = [self._project(table, row, params.get("select")) for row in self._select(table, params)]
+            return self._respond(request, 200, rows)
+
+        if request.method == "POST":
+            rows = body if isinstance(body, list) else [body]
+            stored = []
+            existing = {row["id"]: row for row in self.tables.get(table, []) if "id" in row}
+            for row in rows:
+                if "merge-duplicates" in prefer and row.get("id") in existing:
+                    existing[row["id"]].update(row)
+                    stored.append(existing[row["id"]])
+                else:
+                    stored.extend(self.insert(table, [row]))
+            return self._respond(request, 201, stored if representation else [])
+
+        filters = self._filters(params)
+        matched = [row for row in self.tables.get(table, []) if all(match(row) for match in filters)]
+
+        if request.method == "PATCH":
+            for row in matched:
+                row.update(body or {})
+            return self._respond(request, 200, matched if representation else [])
+
+        if request.method == "DELETE":
+            ids = {id(row) for row in matched}
+            self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in ids]
+            return self._respond(request, 200, matched if representation else [])
+
+        return httpx.Response(405, json={"message": f"Unsupported method {request.method}"})
+
+class FakePostgrestClient(PooledPostgrestClient):
+    """The app's PostgREST client, talking to a FakePostgREST instead of the network"""
+
+    def __init__(self, backend: FakePostgREST, base_url: str = "http://fake-postgrest/rest/v1"):
+        self.backend = backend
+        super().__init__(base_url)
+
+    def create_session(self, base_url, headers, timeout) -> httpx.AsyncClient:
+        # Keep the metrics wrapper so /metrics reflects the fake's traffic too
+        return httpx.AsyncClient(base_url=base_url, headers=headers, timeout=timeout, transport=InstrumentedTransport(self.backend))
+
+def install_fakes(openai: FakeOpenAI, postgrest: FakePostgREST, vector_store: InMemoryVectorStore):
+    """Point the app's client registry at the fakes
+
+    Must run before the clients are first used; the registry builds each
+    client lazily, so re-registering the factories is enough.
+    """
+    from app.utils.clients import clients
+
+    clients.register("openai", lambda: openai, close=lambda client: client.close())
+    clients.register("db", lambda: FakePostgrestClient(postgrest), close=lambda client: client.aclose())
+    clients.register("vector_store", lambda: vector_store)
@@ -0,0 +1,274 @@
+"""Load-test the API's hot paths against in-process fakes
+
+Drives the workspace, content, knowledge and generation routes at a fixed
+concurrency through the ASGI app directly (no sockets), with OpenAI,
+PostgREST and the vector index replaced by the stand-ins in
+benchmarks/fakes.py, and reports latency percentiles and throughput for
+each scenario. Nothing leaves the process, so it costs nothing to run.
+
+Usage:
+    python benchmarks/load.py [--scenarios content_list,generate_stream] [--concurrency 16] [--requests 200]
+        [--openai-latency 0.05] [--tokens-per-second 1000] [--db-latency 0.002] [--p95-budget-ms 0]
+        [--stream-p95-budget-ms 0] [--json]
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Dict, Any, Callable
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Settings applied before the app is imported: no Redis, no response or
+# retrieval cache (every generation should do the full work), no embedding
+# cache or knowledge generations on disk, an in-memory job queue and
+# unverified tokens (the lexical index goes to a temporary directory, set in main)
+BENCHMARK_ENV = {
+    "SUPABASE_URL": "http://fake-supabase",
+    "SUPABASE_KEY": "benchmark",
+    "OPENAI_API_KEY": "benchmark",
+    "POSTGREST_URL": "",
+    "REDIS_URL": "",
+    "AGENT_CACHE_ENABLED": "False",
+    "AGENT_SEMANTIC_CACHE_ENABLED": "False",
+    "RETRIEVAL_CACHE_ENABLED": "False",
+    "EMBEDDING_CACHE_PATH": "",
+    "JOB_QUEUE_BACKEND": "sqlite",
+    "JOB_QUEUE_SQLITE_PATH": ":memory:",
+    "KNOWLEDGE_GENERATION_PATH": ":memory:",
+    "AUTH_VERIFY_SIGNATURE": "False",
+}
+
+USER_ID = "user_benchmark"
+
+# Scenarios timed until their last event, so their latency includes every
+# completion the fake model streams; they get their own budget
+STREAMING_SCENARIOS = ("generate_stream",)
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+def seed(postgrest, vector_store, openai, content_items: int, knowledge_chunks: int) -> Dict[str, Any]:
+    """Fill the fakes with one workspace the benchmark user administers"""
+    workspace = postgrest.insert("workspaces", [{
+        "name": "Benchmark Workspace",
+        "description": "Seeded by benchmarks/load.py",
+        "industry": "Software"
+    }])[0]
+    workspace_id = workspace["id"]
+
+    postgrest.insert("workspace_members", [{"workspace_id": workspace_id, "user_id": USER_ID, "role": "admin"}])
+    postgrest.insert("brand_profiles", [{"workspace_id": workspace_id, "name": "Encanta", "voice": "Friendly and precise"}])
+
+    content = postgrest.insert("content", [
+        {
+            "workspace_id": workspace_id,
+            "title": f"Post {i}",
+            "content_type": "blog",
+            "content": {"text": f"Body of post {i}"},
+            "status": "draft",
+            "created_by": USER_ID
+        }
+        for i in range(content_items)
+    ])
+
+    postgrest.insert("knowledge_files", [
+        {
+            "workspace_id": workspace_id,
+            "name": f"Guide {i}",
+            "original_filename": f"guide-{i}.md",
+            "storage_path": f"knowledge-files/{USER_ID}/guide-{i}.md",
+            "file_type": "text/markdown",
+            "file_size": 4096,
+            "is_processed": True,
+            "created_by": USER_ID
+        }
+        for i in range(20)
+    ])
+
+    from app.utils.lexical_index import get_lexical_index
+
+    texts = [f"Knowledge snippet {i} about content marketing and brand voice" for i in range(knowledge_chunks)]
+    vectors = [
+        {"id": f"chunk-{i}", "values": openai.embed(text), "metadata": {"workspace_id": workspace_id, "text": text}}
+        for i, text in enumerate(texts)
+    ]
+    asyncio.run(vector_store.upsert(vectors))
+    lexical_index = get_lexical_index()
+    if lexical_index is not None:
+        lexical_index.upsert(vectors)
+
+    return {"workspace_id": workspace_id, "content_ids": [item["id"] for item in content]}
+
+def build_scenarios(prefix: str, data: Dict[str, Any]) -> Dict[str, Callable[[int], Dict[str, Any]]]:
+    """Scenario name -> function building the i-th request's httpx arguments"""
+    workspace_id = data["workspace_id"]
+    content_ids = data["content_ids"]
+
+    def generation(i: int) -> Dict[str, Any]:
+        # A distinct topic per request so no layer can serve a cached answer
+        return {
+            "workspace_id": workspace_id,
+            "topic": f"Benchmark topic {i} {random.random()}",
+            "content_type": "blog",
+            "tone": "professional",
+            "target_audience": "marketers",
+            "key_points": ["speed", "quality"]
+        }
+
+    return {
+        "workspaces": lambda i: {"method": "GET", "url": f"{prefix}/workspaces/"},
+        "workspace": lambda i: {"method": "GET", "url": f"{prefix}/workspaces/{workspace_id}"},
+        "content_list": lambda i: {"method": "GET", "url": f"{prefix}/content/workspace/{workspace_id}", "params": {"limit": 50}},
+        "content_get": lambda i: {"method": "GET", "url": f"{prefix}/content/{random.choice(content_ids)}"},
+        "content_create": lambda i: {"method": "POST", "url": f"{prefix}/content/", "json": {
+            "workspace_id": workspace_id,
+            "title": f"Load test post {i}",
+            "content_type": "blog",
+            "content": {"text": "Created by the load test"}
+        }},
+        "knowledge_list": lambda i: {"method": "GET", "url": f"{prefix}/knowledge/workspace/{workspace_id}"},
+        "generate": lambda i: {"method": "POST", "url": f"{prefix}/content/generate", "json": generation(i)},
+        "generate_stream": lambda i: {"method": "POST", "url": f"{prefix}/content/generate/stream", "json": generation(i)},
+    }
+
+async def run_scenario(client, build_request: Callable[[int], Dict[str, Any]], concurrency: int, requests: int) -> Dict[str, Any]:
+    """Send requests with a fixed number of concurrent callers and summarize latency"""
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def caller():
+        nonlocal errors
+        for i in counter:
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(**build_request(i))
+                # Streaming generations report failure in-band
+                failed = response.status_code >= 400 or b"event: failed" in response.content
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - started_at)
+            errors += failed
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[caller() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0
+    }
+
+async def run(app, scenarios: Dict[str, Callable[[int], Dict[str, Any]]], names: List[str], args) -> Dict[str, Dict[str, Any]]:
+    import httpx
+    from jose import jwt
+    from app.utils.clients import clients
+
+    # Tokens aren't verified in the benchmark, only decoded
+    token = jwt.encode({"sub": USER_ID, "exp": int(time.time()) + 3600}, "benchmark", algorithm="HS256")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", headers=headers, timeout=None) as client:
+        for name in names:
+            # Warm-up: creates clients and fills per-process caches before measuring
+            await run_scenario(client, scenarios[name], min(args.concurrency, 4), args.warmup)
+            results[name] = await run_scenario(client, scenarios[name], args.concurrency, args.requests)
+
+    await clients.close_all()
+    return results
+
+def print_table(results: Dict[str, Dict[str, Any]]):
+    columns = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    width = max(len(name) for name in results)
+    print(f"{'scenario':<{width}}  " + "  ".join(f"{column:>8}" for column in columns))
+    for name, result in results.items():
+        print(f"{name:<{width}}  " + "  ".join(f"{result[column]:>8}" for column in columns))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="main:app", help="ASGI app to load, as module:attribute (default: main:app)")
+    parser.add_argument("--scenarios", default="", help="Comma-separated scenarios to run (default: all)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent callers per scenario")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=8, help="Unmeasured requests before each scenario")
+    parser.add_argument("--openai-latency", type=float, default=0.05, help="Seconds before a completion's first token")
+    parser.add_argument("--tokens-per-second", type=float, default=1000, help="Completion token rate")
+    parser.add_argument("--completion-tokens", type=int, default=50, help="Tokens per completion")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="Seconds added to every PostgREST request")
+    parser.add_argument("--content-items", type=int, default=500, help="Seeded content rows")
+    parser.add_argument("--knowledge-chunks", type=int, default=200, help="Seeded vector index entries")
+    parser.add_argument("--p95-budget-ms", type=float, default=0, help="Fail when a request/response scenario's p95 exceeds this (0 disables)")
+    parser.add_argument("--stream-p95-budget-ms", type=float, default=0, help="Fail when a streaming scenario's p95 exceeds this (0 disables)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    os.environ.update(BENCHMARK_ENV)
+    # A fresh BM25 index per run, so hybrid retrieval searches only the seeded chunks
+    os.environ["LEXICAL_INDEX_PATH"] = tempfile.mkdtemp(prefix="encanta-lexical-")
+    sys.path.insert(0, API_DIR)
+
+    from benchmarks.fakes import FakeOpenAI, FakePostgREST, InMemoryVectorStore, install_fakes
+    from app.core.config import settings
+
+    openai = FakeOpenAI(
+        latency=args.openai_latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens
+    )
+    postgrest = FakePostgREST(latency=args.db_latency)
+    vector_store = InMemoryVectorStore()
+    install_fakes(openai, postgrest, vector_store)
+
+    module_name, _, attribute = args.app.partition(":")
+    try:
+        app = getattr(importlib.import_module(module_name), attribute or "app")
+    except Exception as e:
+        print(f"Loading {args.app} failed: {str(e)}")
+        sys.exit(2)
+
+    scenarios = build_scenarios(settings.API_PREFIX, seed(postgrest, vector_store, openai, args.content_items, args.knowledge_chunks))
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()] or list(scenarios)
+    unknown = [name for name in names if name not in scenarios]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)} (available: {', '.join(scenarios)})")
+        sys.exit(2)
+
+    results = asyncio.run(run(app, scenarios, names, args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+    over_budget = []
+    for name, result in results.items():
+        budget = args.stream_p95_budget_ms if name in STREAMING_SCENARIOS else args.p95_budget_ms
+        if budget and result["p95_ms"] > budget:
+            over_budget.append(f"{name} ({result['p95_ms']}ms > {budget}ms)")
+    failed = [name for name, result in results.items() if result["errors"]]
+    if failed:
+        print(f"FAIL: errors in {', '.join(failed)}")
+    if over_budget:
+        print(f"FAIL: p95 over budget in {', '.join(over_budget)}")
+    if failed or over_budget:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Measure API cold start and fail when it exceeds a time budget
+
+Each run imports the app module in a fresh interpreter, the same work
+uvicorn does on start and on every --reload cycle. No client should touch
+the network while importing, so this also runs offline.
+
+Usage:
+    python benchmarks/startup.py [--module main] [--runs 5] [--budget 3.0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def time_import(module: str) -> float:
+    """Import a module in a fresh interpreter and return the wall time in seconds"""
+    started_at = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", f"import {module}"],
+        cwd=API_DIR,
+        capture_output=True,
+        text=True
+    )
+    elapsed = time.perf_counter() - started_at
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.strip()}")
+
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--runs", type=int, default=5, help="Number of measured runs")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=float(os.getenv("STARTUP_BUDGET_SECONDS", "3.0")),
+        help="Maximum allowed median start-up time in seconds"
+    )
+    args = parser.parse_args()
+
+    try:
+        # Warm-up run so bytecode compilation isn't counted
+        time_import(args.module)
+        timings = [time_import(args.module) for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(str(e))
+        sys.exit(2)
+
+    median = statistics.median(timings)
+    print(f"{args.module}: median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s over {args.runs} runs")
+    print(f"Budget: {args.budget:.3f}s")
+
+    if median > args.budget:
+        print("FAIL: start-up time is over budget")
+        sys.exit(1)
+
+    print("OK")
+
+if __name__ == "__main__":
+    main()
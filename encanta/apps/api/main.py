@@ -1,18 +1,25 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+import asyncio
 import uvicorn
-from dotenv import load_dotenv
-import os
 
-# Import our routes
+# Import our routes (app.core.config loads the .env file)
 from app.api.routes import api_router
 from app.core.config import settings
+from app.utils.clients import clients
+from app.utils.metrics import MetricsMiddleware, render_metrics
 
-# Load environment variables from .env file
-load_dotenv()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Clients are created lazily on first use; close whichever were created on shutdown"""
+    yield
+    await clients.close_all()
 
 # Create FastAPI app with metadata
 app = FastAPI(
+    lifespan=lifespan,
     title="Encanta API",
     description="API for Encanta AI content platform",
     version="1.0.0",
@@ -27,8 +34,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor"],  # Pagination cursor for list endpoints
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
@@ -49,6 +60,37 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/health/ready")
+async def readiness_check(probe: bool = Query(False, description="Run the health checks of clients that have one")):
+    """Readiness check reporting which backend clients are warm
+
+    Without probe this never touches the network. With probe, the clients
+    with a cheap health check are created if needed and checked (PostgREST
+    query, Redis ping), and the response is 503 if any check fails. Others
+    (vector store, extraction pool, OpenAI) are never created by the probe.
+    """
+    if not probe:
+        return {"status": "ready", "clients": clients.status()}
+
+    names = list(clients.status())
+    results = await asyncio.gather(*[clients.check(name) for name in names])
+    report = clients.status()
+    for name, result in zip(names, results):
+        report[name].update(result)
+
+    ready = all(result["ok"] for result in results)
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "unavailable", "clients": report}
+    )
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """Prometheus metrics in the text exposition format"""
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
+
 # Run the app when executing this file directly
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=3001, reload=True) 
\ No newline at end of file
@@ -1,4 +1,12 @@
+import subprocess
+import sys
 import uvicorn
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=3003, reload=True) 
\ No newline at end of file
+    # Content generation is queued; a worker process runs it
+    worker = subprocess.Popen([sys.executable, "-m", "app.worker"])
+    try:
+        uvicorn.run("app.main:app", host="0.0.0.0", port=3003, reload=True)
+    finally:
+        worker.terminate()
+        worker.wait()
@@ -5,6 +5,12 @@ echo "Starting Encanta FastAPI backend..."
 echo "Press Ctrl+C to stop the server"
 echo ""
 
+# Content generation is queued; start a worker to run it, and stop it with the server
+echo "Starting the job worker..."
+python -m app.worker &
+WORKER_PID=$!
+trap 'kill $WORKER_PID 2>/dev/null; wait $WORKER_PID 2>/dev/null' EXIT
+
 # Try different methods to start the server, using port 3004
 if [ -f "run.py" ]; then
     echo "Starting using run.py with port 3004..."
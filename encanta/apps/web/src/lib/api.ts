@@ -101,6 +101,7 @@ export const api = {
             const query = queryParams.toString() ? `?${queryParams.toString()}` : ''
             return fetchWithAuth(`/api/content/workspace/${workspaceId}${query}`)
         },
+        getById: (id: string) => fetchWithAuth(`/api/content/${id}`),
         create: (data: any) => fetchWithAuth('/api/content', {
             method: 'POST',
             body: JSON.stringify(data),